@@ -0,0 +1,86 @@
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+# Libraries that must only be loaded by the commands that need them
+HEAVY_MODULES = ["moviepy", "pydub", "sounddevice", "openai", "numpy"]
+
+# Root of the project so main.py can be imported
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module_name="main"):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    :param str module_name: The module to import
+
+    :return float: Cumulative import time of the module in milliseconds
+    :return List[str]: Every module that was imported along the way
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    # Lines look like "import time:   self [us] |   cumulative | imported package"
+    pattern = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)$')
+
+    cumulative_us = None
+    imported = []
+    for line in result.stderr.splitlines():
+        match = pattern.match(line)
+        if not match:
+            continue
+
+        name = match.group(4)
+        imported.append(name)
+
+        # The top level module has a single space of indentation
+        if name == module_name and len(match.group(3)) == 1:
+            cumulative_us = int(match.group(2))
+
+    return cumulative_us / 1000, imported
+
+
+def main():
+    """
+    Checks that starting Noter stays within the startup budget and doesn't load heavy libraries.
+
+    :return int: 0 if the budget is met otherwise 1
+    """
+    parser = argparse.ArgumentParser(description="Measures how long it takes to import main.py.")
+    parser.add_argument("--budget-ms", type=float, default=150, help="Most milliseconds importing main.py may take")
+    parser.add_argument("--runs", type=int, default=5, help="How many times to measure, the fastest run is used")
+    parsed = parser.parse_args()
+
+    timings = []
+    imported = []
+    for _ in range(parsed.runs):
+        milliseconds, imported = measure_import()
+        timings.append(milliseconds)
+
+    fastest = min(timings)
+    print(f"Importing main.py took {fastest:.1f} ms (fastest of {parsed.runs}, budget {parsed.budget_ms:.0f} ms)")
+
+    heavy_loaded = sorted({
+        name.split(".")[0] for name in imported if name.split(".")[0] in HEAVY_MODULES
+    })
+    if heavy_loaded:
+        print(f"Heavy libraries loaded at startup: {', '.join(heavy_loaded)}")
+
+    if fastest > parsed.budget_ms or heavy_loaded:
+        print("Startup budget failed")
+        return 1
+
+    print("Startup budget met")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import argparse
+
+# Root of the project so helpers can be imported
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from helpers.timestamps import (
+    add_time_to_timestamps,
+    get_transcript_end_time,
+    remove_timestamps,
+    iter_segments,
+    format_timestamp
+)
+
+
+def make_transcript(megabytes):
+    """
+    Builds a timestamped transcript about the size of a semester of lectures for one course.
+
+    :param float megabytes: Roughly how big the transcript should be
+
+    :return str: The timestamped transcript
+    """
+    text = "and that is why the running time of this algorithm is n log n in the average case"
+    lines = []
+    size = 0
+    start = 0
+    while size < megabytes * 1024 * 1024:
+        line = f"{format_timestamp(start, start + 4200)}   {text}\n"
+        lines.append(line)
+        size += len(line)
+        start += 4200
+
+    return "".join(lines)
+
+
+def time_operation(operation, runs):
+    """
+    Times an operation, keeping the fastest run so other programs running don't skew it.
+
+    :param Callable operation: The operation to time
+    :param int runs: How many times to run it
+
+    :return float: The fastest run in milliseconds
+    """
+    timings = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - start_time) * 1000)
+
+    return min(timings)
+
+
+def main():
+    """
+    Checks that shifting, stripping and reading the timestamps of a large transcript each stay within their budget.
+
+    :return int: 0 if every operation is within budget otherwise 1
+    """
+    parser = argparse.ArgumentParser(description="Measures timestamp processing on a large transcript.")
+    parser.add_argument("--megabytes", type=float, default=5, help="Size of the generated transcript")
+    parser.add_argument(
+        "--budget-ms", type=float, default=100,
+        help="Most milliseconds reading the end time or stripping the timestamps may take"
+    )
+    parser.add_argument(
+        "--parse-budget-ms", type=float, default=400,
+        help="Most milliseconds shifting the timestamps or parsing every segment may take"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="How many times to measure, the fastest run is used")
+    parsed = parser.parse_args()
+
+    transcript = make_transcript(megabytes=parsed.megabytes)
+    lines = transcript.splitlines()
+    print(f"Transcript is {len(transcript) / 1024 / 1024:.1f} MB with {len(lines)} lines")
+
+    # Operations that parse every timestamp get a bigger budget than the ones that only scan the text
+    operations = [
+        (
+            "add_time_to_timestamps",
+            lambda: add_time_to_timestamps(transcript, time_to_add=3725.5),
+            parsed.parse_budget_ms
+        ),
+        ("get_transcript_end_time", lambda: get_transcript_end_time(transcript), parsed.budget_ms),
+        ("remove_timestamps", lambda: remove_timestamps(transcript), parsed.budget_ms),
+        ("iter_segments", lambda: sum(1 for _ in iter_segments(lines)), parsed.parse_budget_ms)
+    ]
+
+    failed = False
+    for name, operation, budget_ms in operations:
+        milliseconds = time_operation(operation=operation, runs=parsed.runs)
+        print(f"{name}: {milliseconds:.1f} ms (budget {budget_ms:.0f} ms)")
+        if milliseconds > budget_ms:
+            print(f"{name} is over budget")
+            failed = True
+
+    if failed:
+        print("Timestamp budget failed")
+        return 1
+
+    print("Timestamp budget met")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
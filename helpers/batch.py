@@ -0,0 +1,192 @@
+import os
+import glob
+import queue
+import threading
+from natsort import natsorted
+from helpers.fancy_prints import print_green, print_red
+from helpers.file_handler import convert_to_wav_16khz, get_lecture_num
+from helpers.input_safety import SUPPORTED_FILE_EXTENSIONS
+from helpers.process_audio import move_wav_to_lectures
+from helpers.pipeline import start_pipeline, run_stage
+
+
+def find_lecture_files(path):
+    """
+    Finds every supported audio or video file in a directory or matching a glob pattern.
+
+    :param str path: A directory or a glob pattern such as recordings/*.mp4
+
+    :return List[str]: Paths of the lecture files in natural order
+    """
+    if os.path.isdir(path):
+        candidates = [os.path.join(path, filename) for filename in os.listdir(path)]
+    else:
+        candidates = glob.glob(path)
+
+    lecture_files = [
+        candidate for candidate in candidates
+        if os.path.isfile(candidate) and os.path.splitext(candidate)[1].lower() in SUPPORTED_FILE_EXTENSIONS
+    ]
+
+    return natsorted(lecture_files)
+
+
+def run_pipeline(items, stages):
+    """
+    Runs every item through a list of stages where each stage has its own thread.
+    While one stage works on an item the next stage works on the item before it.
+    Items that fail a stage are reported and skipped by the stages after it.
+
+    :param List items: The items to process in order
+    :param List[Tuple[str, Callable]] stages: The name of each stage and a function taking and returning an item
+
+    :return List: The items that made it through every stage
+    """
+    # Each stage only gets one item ahead of the next so files aren't all converted at once
+    queues = [queue.Queue(maxsize=1) for _ in range(len(stages) + 1)]
+    finished = []
+
+    def work(stage_name, stage, in_queue, out_queue):
+        """
+        Takes items from in_queue, runs the stage on them and passes the results on to out_queue.
+
+        :param str stage_name: Name of the stage shown in errors
+        :param Callable stage: The function run on every item
+        :param queue.Queue in_queue: Where items come from
+        :param queue.Queue out_queue: Where finished items go
+
+        :return: None
+        """
+        while True:
+            item = in_queue.get()
+
+            # Passes the signal to stop on to the next stage
+            if item is None:
+                out_queue.put(None)
+                return
+
+            try:
+                out_queue.put(stage(item))
+            except Exception as e:
+                print_red(f"Error during {stage_name} of {item}: {e}")
+
+    threads = [
+        threading.Thread(target=work, args=(stage_name, stage, queues[i], queues[i + 1]))
+        for i, (stage_name, stage) in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+
+    def collect():
+        """
+        Collects the items that come out of the last stage.
+
+        :return: None
+        """
+        while True:
+            item = queues[-1].get()
+            if item is None:
+                return
+            finished.append(item)
+
+    collector = threading.Thread(target=collect)
+    collector.start()
+
+    for item in items:
+        queues[0].put(item)
+    queues[0].put(None)
+
+    for thread in threads:
+        thread.join()
+    collector.join()
+
+    return finished
+
+
+def batch_ingest(file_paths, course_code, model_name="medium.en"):
+    """
+    Converts, transcribes, compresses and summarizes many lecture recordings without any prompts.
+    Each file is given the next lecture number in order and the stages of different files overlap.
+
+    :param List[str] file_paths: Paths of the lecture recordings in lecture order
+    :param str course_code: Code of the lecture class
+    :param str model_name: Name of the whisper model to use
+
+    :return List[int]: The lecture numbers that were fully processed
+    """
+    first_lecture_num = get_lecture_num(course_code)
+    lectures = [(first_lecture_num + i, file_path) for i, file_path in enumerate(file_paths)]
+
+    def convert(lecture):
+        """
+        Converts a recording to a .wav file at 16khz and moves it to the lectures folder.
+
+        :param Tuple[int, str] lecture: The lecture number and path of its recording
+
+        :return int: The lecture number
+        """
+        lecture_num, file_path = lecture
+        wav_path = convert_to_wav_16khz(file_path=file_path)
+        move_wav_to_lectures(original_path=wav_path, course_code=course_code, current_lecture_num=lecture_num)
+
+        # Saves the lecture's progress so it can be resumed if the batch stops before it's done
+        start_pipeline(
+            course_code=course_code,
+            lecture_num=lecture_num,
+            stage="transcribe",
+            model_name=model_name,
+            parallel=True
+        )
+
+        return lecture_num
+
+    def transcribe(lecture_num):
+        """
+        Transcribes a lecture that is in the lectures folder.
+
+        :param int lecture_num: The lecture number
+
+        :return int: The lecture number
+        """
+        run_stage(course_code=course_code, lecture_num=lecture_num, stage="transcribe")
+
+        return lecture_num
+
+    def compress(lecture_num):
+        """
+        Queues a transcribed lecture's .wav file to be compressed in the background.
+
+        :param int lecture_num: The lecture number
+
+        :return int: The lecture number
+        """
+        run_stage(course_code=course_code, lecture_num=lecture_num, stage="merge")
+        run_stage(course_code=course_code, lecture_num=lecture_num, stage="compress")
+
+        return lecture_num
+
+    def summarize(lecture_num):
+        """
+        Creates a summary sheet for a transcribed lecture.
+
+        :param int lecture_num: The lecture number
+
+        :return int: The lecture number
+        """
+        run_stage(course_code=course_code, lecture_num=lecture_num, stage="summarize")
+
+        return lecture_num
+
+    print_green(f"\nProcessing {len(lectures)} lectures for {course_code}...")
+    finished = run_pipeline(
+        items=lectures,
+        stages=[
+            ("conversion", convert),
+            ("transcription", transcribe),
+            ("compression", compress),
+            ("summarization", summarize)
+        ]
+    )
+    print_green(f"\nProcessed {len(finished)} of {len(lectures)} lectures for {course_code}")
+
+    return finished
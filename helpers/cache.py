@@ -0,0 +1,122 @@
+import os
+import hashlib
+import threading
+from helpers.file_output import write_atomic
+
+
+def make_cache_key(*parts):
+    """
+    Creates a key that only matches when every part is exactly the same.
+
+    :param str parts: Everything that affects the cached result
+
+    :return str: A hex sha256 of the parts
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = str(part).encode('utf-8')
+
+        # The length stops different splits of the same text making the same key
+        digest.update(f"{len(encoded)}:".encode('utf-8'))
+        digest.update(encoded)
+
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    A class to store text results on disk by key and evict the least recently used ones once it gets too big.
+    """
+    def __init__(self, directory, max_bytes):
+        """
+        Initializes the DiskCache. Its directory is only created once something is cached.
+
+        :param str directory: The folder the cached results are saved in
+        :param int max_bytes: Most space the cache may use on disk
+
+        :return: None
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+
+    def _path(self, key):
+        """
+        Gets the path a key is saved at.
+
+        :param str key: The cache key
+
+        :return str: Path of the cached file
+        """
+        return os.path.join(self.directory, f"{key}.txt")
+
+
+    def get(self, key):
+        """
+        Returns the cached result for a key and marks it as recently used.
+
+        :param str key: The cache key
+
+        :return str: The cached result or None if it isn't cached
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                value = file.read()
+        except FileNotFoundError:
+            return None
+
+        # The modified time is used as the last time it was used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return value
+
+
+    def set(self, key, value):
+        """
+        Saves a result for a key then evicts the least recently used results if the cache is too big.
+
+        :param str key: The cache key
+        :param str value: The result to cache
+
+        :return: None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+
+        # A crash never leaves a half written result, results can be made again so they're only synced when
+        # FSYNC_POLICY is always
+        write_atomic(path, value, finished=False)
+
+        self.evict()
+
+
+    def evict(self):
+        """
+        Deletes the least recently used results until the cache fits in max_bytes.
+
+        :return: None
+        """
+        with self._lock:
+            entries = []
+            total_size = 0
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".txt"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+
+            # Oldest first
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
@@ -0,0 +1,390 @@
+import os
+import re
+import sqlite3
+from helpers.fancy_prints import print_red
+
+# Catalog of every course and the files in it so nothing has to list folders to find them
+CATALOG_PATH = "notes/.catalog.db"
+
+# Raised whenever the tables change so older catalogs are rebuilt from the notes
+CATALOG_SCHEMA_VERSION = 1
+
+# Folders every course has
+MEDIA_TYPES = ["transcripts", "summaries", "timestamped", "lectures"]
+
+# Paths look like notes/COURSE or notes/archived_classes/COURSE followed by /MEDIA/FILE for files
+COURSE_PATH_PATTERN = re.compile(r'^notes/(archived_classes/)?([^/]+)$')
+FILE_PATH_PATTERN = re.compile(r'^notes/(archived_classes/)?([^/]+)/(transcripts|summaries|timestamped|lectures)/([^/]+)$')
+LECTURE_NUM_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)')
+CUT_PATTERN = re.compile(r'-_-CUT_(\d+)-_-\.wav$')
+
+
+def normalize_path(path):
+    """
+    Writes a path the same way every time so it can be looked up, such as notes/CLASS101/lectures/1.wav.
+
+    :param str path: The path
+
+    :return str: The path with / separators and without ./ or doubled separators
+    """
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def parse_file_path(path):
+    """
+    Works out which course, lecture and cut a file in notes belongs to from its path.
+
+    :param str path: Path to the file
+
+    :return dict: The file's details or None if the file isn't in a course folder
+    """
+    path = normalize_path(path)
+    match = FILE_PATH_PATTERN.match(path)
+    if not match or match.group(2) == "archived_classes" or match.group(4).startswith("."):
+        return None
+
+    name = match.group(4)
+    lecture_match = LECTURE_NUM_PATTERN.match(name)
+    cut_match = CUT_PATTERN.search(name)
+
+    return {
+        "path": path,
+        "course": match.group(2),
+        "archived": int(match.group(1) is not None),
+        "media_type": match.group(3),
+        "name": name,
+        "lecture": float(lecture_match.group(1)) if lecture_match else None,
+        "cut": int(cut_match.group(1)) if cut_match else None
+    }
+
+
+def connect():
+    """
+    Opens the catalog, creating it from what's in the notes folder the first time.
+
+    :return sqlite3.Connection: Connection to the catalog or None if there is no notes folder yet
+    """
+    if not os.path.isdir(os.path.dirname(CATALOG_PATH)):
+        return None
+
+    # Compression runs in other processes so writers wait for each other instead of failing
+    connection = sqlite3.connect(CATALOG_PATH, timeout=30)
+    if connection.execute("PRAGMA user_version").fetchone()[0] < CATALOG_SCHEMA_VERSION:
+        with connection:
+            connection.executescript(
+                """
+                DROP VIEW IF EXISTS lectures;
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS courses;
+                CREATE TABLE courses (
+                    code TEXT NOT NULL,
+                    archived INTEGER NOT NULL,
+                    PRIMARY KEY (code, archived)
+                );
+                CREATE TABLE files (
+                    path TEXT PRIMARY KEY,
+                    course TEXT NOT NULL,
+                    archived INTEGER NOT NULL,
+                    media_type TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    lecture REAL,
+                    cut INTEGER
+                );
+                CREATE INDEX files_by_folder ON files (course, archived, media_type, lecture);
+
+                -- What has been done for every lecture, audio is the recording once its cuts are merged
+                CREATE VIEW lectures AS
+                SELECT
+                    course,
+                    archived,
+                    lecture,
+                    COUNT(cut) AS cuts,
+                    MAX(media_type = 'timestamped') AS transcribed,
+                    MAX(media_type = 'summaries') AS summarized,
+                    MAX(CASE WHEN media_type = 'lectures' AND cut IS NULL THEN name END) AS audio
+                FROM files
+                WHERE lecture IS NOT NULL
+                GROUP BY course, archived, lecture;
+                """
+            )
+            fill_catalog(connection=connection)
+            connection.execute(f"PRAGMA user_version = {CATALOG_SCHEMA_VERSION}")
+
+    return connection
+
+
+def fill_catalog(connection, root_directory="notes"):
+    """
+    Adds every course and file in the notes folder to the catalog.
+    Only needed when the catalog is first created or rebuilt.
+
+    :param sqlite3.Connection connection: Connection to the catalog
+    :param str root_directory: The notes folder
+
+    :return: None
+    """
+    for parent, archived in [(root_directory, 0), (f"{root_directory}/archived_classes", 1)]:
+        if not os.path.isdir(parent):
+            continue
+
+        for course in os.listdir(parent):
+            course_directory = f"{parent}/{course}"
+            if course == "archived_classes" or course.startswith(".") or not os.path.isdir(course_directory):
+                continue
+
+            connection.execute("INSERT OR IGNORE INTO courses (code, archived) VALUES (?, ?)", (course, archived))
+            for media_type in MEDIA_TYPES:
+                media_directory = f"{course_directory}/{media_type}"
+                if not os.path.isdir(media_directory):
+                    continue
+                for entry in os.scandir(media_directory):
+                    if entry.is_file():
+                        insert_file(connection=connection, path=f"{media_directory}/{entry.name}")
+
+
+def rebuild_catalog():
+    """
+    Throws away the catalog and builds it again from the notes folder, for when files were changed by hand.
+
+    :return int: How many files are in the catalog
+    """
+    connection = connect()
+    if connection is None:
+        return 0
+
+    try:
+        with connection:
+            connection.execute("DELETE FROM files")
+            connection.execute("DELETE FROM courses")
+            fill_catalog(connection=connection)
+
+        return connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def insert_file(connection, path):
+    """
+    Adds a file to the catalog or updates it if it's already there.
+
+    :param sqlite3.Connection connection: Connection to the catalog
+    :param str path: Path to the file
+
+    :return: None
+    """
+    details = parse_file_path(path)
+    if details is None:
+        return
+
+    connection.execute(
+        "INSERT OR REPLACE INTO files (path, course, archived, media_type, name, lecture, cut) "
+        "VALUES (:path, :course, :archived, :media_type, :name, :lecture, :cut)",
+        details
+    )
+
+
+def update_files(added=(), removed=()):
+    """
+    Adds and removes files from the catalog in one transaction so it's never left half updated.
+    Files outside of a course folder are ignored.
+
+    :param List[str] added: Paths of files that were created
+    :param List[str] removed: Paths of files that were deleted or moved away
+
+    :return: None
+    """
+    connection = connect()
+    if connection is None:
+        return
+
+    try:
+        with connection:
+            for path in removed:
+                connection.execute("DELETE FROM files WHERE path = ?", (normalize_path(path),))
+            for path in added:
+                insert_file(connection=connection, path=path)
+
+    # The file was still written so a catalog that couldn't be updated isn't a reason to stop
+    except sqlite3.Error as e:
+        print_red(f"Couldn't update the catalog, run 'python main.py catalog' to rebuild it: {e}")
+    finally:
+        connection.close()
+
+
+def add_file(path):
+    """
+    Adds a file that was just written to the catalog.
+
+    :param str path: Path to the file
+
+    :return: None
+    """
+    update_files(added=[path])
+
+
+def move_file(original_path, new_path):
+    """
+    Records that a file was moved or renamed.
+
+    :param str original_path: Where the file was
+    :param str new_path: Where the file is now
+
+    :return: None
+    """
+    update_files(added=[new_path], removed=[original_path])
+
+
+def add_course(course_code):
+    """
+    Adds a new course to the catalog.
+
+    :param str course_code: Code of the course
+
+    :return: None
+    """
+    connection = connect()
+    if connection is None:
+        return
+
+    try:
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO courses (code, archived) VALUES (?, 0)", (course_code,))
+    finally:
+        connection.close()
+
+
+def move_course(original_path, new_path):
+    """
+    Records that a course folder was archived, restored or renamed along with every file in it.
+
+    :param str original_path: Where the course folder was such as notes/CLASS101
+    :param str new_path: Where the course folder is now such as notes/archived_classes/CLASS101
+
+    :return: None
+    """
+    original_match = COURSE_PATH_PATTERN.match(normalize_path(original_path))
+    new_match = COURSE_PATH_PATTERN.match(normalize_path(new_path))
+    if original_match is None or new_match is None:
+        return
+
+    connection = connect()
+    if connection is None:
+        return
+
+    original_code, original_archived = original_match.group(2), int(original_match.group(1) is not None)
+    new_code, new_archived = new_match.group(2), int(new_match.group(1) is not None)
+    original_prefix = normalize_path(original_path) + "/"
+    new_prefix = normalize_path(new_path) + "/"
+
+    try:
+        with connection:
+            connection.execute(
+                "DELETE FROM courses WHERE code = ? AND archived = ?",
+                (original_code, original_archived)
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO courses (code, archived) VALUES (?, ?)",
+                (new_code, new_archived)
+            )
+            connection.execute(
+                "UPDATE files SET path = ? || substr(path, ?), course = ?, archived = ? "
+                "WHERE course = ? AND archived = ?",
+                (new_prefix, len(original_prefix) + 1, new_code, new_archived, original_code, original_archived)
+            )
+    finally:
+        connection.close()
+
+
+def get_courses(archived=False):
+    """
+    Gets the code of every course.
+
+    :param bool archived: Weather to get archived courses instead of current ones
+
+    :return List[str]: Course codes or None if there is no notes folder yet
+    """
+    connection = connect()
+    if connection is None:
+        return None
+
+    try:
+        rows = connection.execute(
+            "SELECT code FROM courses WHERE archived = ? ORDER BY code",
+            (int(archived),)
+        ).fetchall()
+    finally:
+        connection.close()
+
+    return [code for code, in rows]
+
+
+def get_filenames(directory_path):
+    """
+    Gets the name of every file in one of a course's folders.
+
+    :param str directory_path: The folder such as notes/CLASS101/summaries
+
+    :return List[str]: The filenames or None if the folder isn't a course folder
+    """
+    details = parse_file_path(f"{directory_path}/_")
+    connection = connect() if details is not None else None
+    if connection is None:
+        return None
+
+    try:
+        rows = connection.execute(
+            "SELECT name FROM files WHERE course = ? AND archived = ? AND media_type = ?",
+            (details["course"], details["archived"], details["media_type"])
+        ).fetchall()
+    finally:
+        connection.close()
+
+    return [name for name, in rows]
+
+
+def get_latest_lecture(course_code):
+    """
+    Gets the highest lecture number that has a timestamped transcript or a recording,
+    so a lecture that was recorded but not transcribed yet isn't given to the next lecture.
+
+    :param str course_code: Code of the course
+
+    :return float: The highest lecture number or None if there are no lectures
+    """
+    connection = connect()
+    if connection is None:
+        return None
+
+    try:
+        return connection.execute(
+            "SELECT MAX(lecture) FROM files WHERE course = ? AND archived = 0 "
+            "AND media_type IN ('timestamped', 'lectures')",
+            (course_code,)
+        ).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def get_cut_paths(course_code, lecture_num):
+    """
+    Gets the .wav files of every cut of a lecture.
+
+    :param str course_code: Code of the course
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return List[str]: Paths of the cuts in order
+    """
+    connection = connect()
+    if connection is None:
+        return []
+
+    try:
+        rows = connection.execute(
+            "SELECT path FROM files WHERE course = ? AND archived = 0 AND media_type = 'lectures' "
+            "AND lecture = ? AND cut IS NOT NULL ORDER BY cut",
+            (course_code, float(lecture_num))
+        ).fetchall()
+    finally:
+        connection.close()
+
+    return [path for path, in rows]
@@ -0,0 +1,218 @@
+import os
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import dotenv_values
+from helpers.file_handler import compress_wav, format_size, ARCHIVE_PROFILES
+from helpers.file_output import write_atomic
+from helpers.scheduler import scheduler
+
+# Load the .env file into a dictionary
+config = dotenv_values(".env")
+
+# Compression jobs that haven't finished are saved here so they survive restarts
+JOBS_PATH = "notes/compression_jobs.json"
+
+# How lectures are archived unless ARCHIVE_PROFILE is set in .env
+DEFAULT_ARCHIVE_PROFILE = "opus"
+
+
+def compress_job(wav_file_path, profile):
+    """
+    Compresses a .wav file in a worker process of the compression pool.
+
+    :param str wav_file_path: Path to the .wav file
+    :param str profile: Name of the archive profile to encode with
+
+    :return str: Path to the compressed file
+    """
+    return compress_wav(wav_file_path=wav_file_path, profile=profile)
+
+
+def get_archive_profile():
+    """
+    Gets the archive profile lectures are compressed with.
+
+    :return str: ARCHIVE_PROFILE from .env or the default profile
+    """
+    return config.get("ARCHIVE_PROFILE") or DEFAULT_ARCHIVE_PROFILE
+
+
+class CompressionQueue:
+    """
+    A class to compress lecture recordings in a background process pool.
+    Jobs are saved to disk as they are queued and removed once they are done so unfinished jobs can be resumed.
+    """
+    def __init__(self, jobs_path=JOBS_PATH, max_workers=None):
+        """
+        Initializes the CompressionQueue. Worker processes are only started once a job is queued.
+
+        :param str jobs_path: Where unfinished jobs are saved
+        :param int max_workers: How many lectures can be compressed at once, defaults to the number of CPUs
+
+        :return: None
+        """
+        self.jobs_path = jobs_path
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._futures = {}
+
+
+    def _load_jobs(self):
+        """
+        Reads the unfinished jobs from disk.
+
+        :return dict: Archive profile and original size of every unfinished job by .wav path
+        """
+        try:
+            with open(self.jobs_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+
+    def _save_jobs(self, jobs):
+        """
+        Writes the unfinished jobs to disk without ever leaving a half written file.
+
+        :param dict jobs: Archive profile and original size of every unfinished job by .wav path
+
+        :return: None
+        """
+        write_atomic(self.jobs_path, json.dumps(jobs, indent=2))
+
+
+    def submit(self, wav_file_path, profile=None):
+        """
+        Queues a .wav file to be compressed in the background and returns straight away.
+
+        :param str wav_file_path: Path to the .wav file
+        :param str profile: Name of the archive profile to encode with, defaults to ARCHIVE_PROFILE in .env
+
+        :return: None
+        """
+        if profile is None:
+            profile = get_archive_profile()
+        if not wav_file_path.lower().endswith(".wav"):
+            raise ValueError("The provided file is not a .wav file.")
+        if profile not in ARCHIVE_PROFILES:
+            raise ValueError(f"Unknown archive profile {profile}, use one of: {', '.join(ARCHIVE_PROFILES)}")
+
+        with self._lock:
+
+            # The same .wav can't be encoded twice at once since both would write the same file
+            if wav_file_path in self._futures:
+                return
+
+            jobs = self._load_jobs()
+            jobs[wav_file_path] = {"profile": profile, "original_size": os.path.getsize(wav_file_path)}
+            self._save_jobs(jobs)
+
+            # Workers are spawned fresh rather than forked so they don't inherit the threads and locks
+            # of the recorder and background jobs
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+
+            future = self._executor.submit(compress_job, wav_file_path, profile)
+            self._futures[wav_file_path] = future
+
+        # Shown as a background job so finishing is reported by the menu instead of printed over it
+        scheduler.track(
+            name=f"Compress {wav_file_path}",
+            future=future,
+            on_done=lambda done: self._finish(wav_file_path, done)
+        )
+        print(f"Compressing {wav_file_path} in the background")
+
+
+    def _finish(self, wav_file_path, future):
+        """
+        Removes a job from disk once it's done. Failed jobs stay saved so they are retried next time.
+        Runs as the job tracked by the scheduler so what it prints is saved to that job.
+
+        :param str wav_file_path: Path to the .wav file
+        :param concurrent.futures.Future future: The finished job
+
+        :return str: Path to the compressed file
+
+        :raises: The job's exception if it failed
+        """
+        with self._lock:
+            self._futures.pop(wav_file_path, None)
+            if future.exception() is not None:
+                raise future.exception()
+
+            jobs = self._load_jobs()
+            job = jobs.pop(wav_file_path, None)
+            self._save_jobs(jobs)
+
+        compressed_path = future.result()
+        print(f"Compressed {compressed_path}")
+        if job is not None:
+            original_size = job["original_size"]
+            compressed_size = os.path.getsize(compressed_path)
+            print(
+                f"{format_size(original_size)} -> {format_size(compressed_size)}, "
+                f"saved {(original_size - compressed_size) / original_size * 100:.1f}% space"
+            )
+
+        return compressed_path
+
+
+    def resume(self):
+        """
+        Queues every job that was saved but didn't finish, for example because the program was closed.
+
+        :return int: How many jobs were resumed
+        """
+        jobs = self._load_jobs()
+        resumed = 0
+        for wav_file_path, job in jobs.items():
+            if wav_file_path in self._futures:
+                continue
+
+            if os.path.exists(wav_file_path):
+
+                # Jobs queued before archive profiles existed only saved a bit-rate
+                profile = job["profile"] if isinstance(job, dict) else None
+                self.submit(wav_file_path=wav_file_path, profile=profile)
+                resumed += 1
+            else:
+
+                # The .wav is already gone so the job finished before it could be removed
+                with self._lock:
+                    saved_jobs = self._load_jobs()
+                    saved_jobs.pop(wav_file_path, None)
+                    self._save_jobs(saved_jobs)
+
+        return resumed
+
+
+    def is_busy(self):
+        """
+        Checks if any lecture is still being compressed.
+
+        :return bool: Weather or not a job hasn't finished yet
+        """
+        with self._lock:
+            return any(not future.done() for future in self._futures.values())
+
+
+    def wait(self):
+        """
+        Blocks until every queued job is done.
+
+        :return: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# One queue shared by the whole program
+compression_queue = CompressionQueue()
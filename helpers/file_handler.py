@@ -1,12 +1,41 @@
 import os
 import shutil
-import re
-from pydub import AudioSegment
-from helpers.fancy_prints import print_green
+import wave
+import hashlib
+import subprocess
 from helpers.input_safety import get_int, get_filename
-from datetime import timedelta
-from natsort import natsorted
-from moviepy.editor import VideoFileClip
+from helpers.search_index import index_append, index_file, move_course_index
+from helpers.file_output import write_atomic, append_to_file
+from helpers.catalog import (
+    add_file,
+    add_course,
+    move_file,
+    move_course,
+    update_files,
+    get_courses,
+    get_filenames,
+    get_latest_lecture,
+    get_cut_paths
+)
+
+# Sample rate Whisper reads
+WHISPER_SAMPLE_RATE = 16000
+
+# Most decoded audio held in memory at once when a file is streamed to the transcriber
+DECODE_BLOCK_BYTES = 1024 * 1024
+
+# Frames copied at a time when merging cut .wav files
+MERGE_BLOCK_FRAMES = 1024 * 1024
+
+# How lectures can be archived, each is the file extension and the ffmpeg encoder settings
+ARCHIVE_PROFILES = {
+
+    # Opus built for speech, roughly 20x smaller than the .wav and still clear for playback
+    "opus": (".opus", ["-c:a", "libopus", "-b:a", "24k", "-application", "voip"]),
+    "mp3-64k": (".mp3", ["-c:a", "libmp3lame", "-b:a", "64k"]),
+    "mp3-128k": (".mp3", ["-c:a", "libmp3lame", "-b:a", "128k"]),
+    "flac": (".flac", ["-c:a", "flac", "-compression_level", "8"])
+}
 
 
 def write_to_file(file_path, content):
@@ -19,8 +48,28 @@ def write_to_file(file_path, content):
 
     :return: None
     """
-    with open(file_path, 'a', encoding='utf-8') as file:
-        file.write(content)
+    append_to_file(file_path, content)
+
+    # Keeps the catalog and search index up to date with transcripts and summary sheets as they're written
+    add_file(file_path)
+    index_append(file_path=file_path, content=content)
+
+
+def save_to_file(file_path, content):
+    """
+    Saves the given text to a file with the specified file_path, replacing the whole file at once
+    so a crash never leaves it half written.
+
+    :param str file_path: The name of the file to write to (including the extension) with its location (ie a path)
+    :param str content: The text the file should contain
+
+    :return: None
+    """
+    write_atomic(file_path, content)
+
+    # Keeps the catalog and search index up to date with transcripts and summary sheets as they're written
+    add_file(file_path)
+    index_file(file_path=file_path)
 
 
 def create_class_folders(prompt):
@@ -47,6 +96,7 @@ def create_class_folders(prompt):
         create_folder(f"notes/{course_codes[i]}/summaries")
         create_folder(f"notes/{course_codes[i]}/timestamped")
         create_folder(f"notes/{course_codes[i]}/lectures")
+        add_course(course_codes[i])
 
     return course_codes
 
@@ -72,12 +122,18 @@ def create_folder(path):
 def get_course_codes(root_directory, ignore_directories=None):
     """
     Returns a list of folder names in the root directory.
+    Current and archived classes are read from the catalog instead of listing the folders.
 
     :param List[str] ignore_directories: A list of folders to ignore
     :param str root_directory: The directory to search
 
     :return List[str]: List of folder names aka course_codes
     """
+    if ignore_directories is None and root_directory in ["notes", "notes/archived_classes"]:
+        course_codes = get_courses(archived=root_directory == "notes/archived_classes")
+        if course_codes is not None:
+            return course_codes
+
     if ignore_directories is None:
         ignore_directories = [f"{root_directory}/archived_classes"]
 
@@ -98,40 +154,17 @@ def get_course_codes(root_directory, ignore_directories=None):
 
 def get_lecture_num(course_code):
     """
-    Goes into the timestamped folder for course_code and finds the next lecture number.
+    Finds the next lecture number from the lectures of course_code that have been transcribed or recorded.
 
     :param str course_code: Directory name in /notes
 
     :return str: Next lecture number
     """
+    latest_lecture = get_latest_lecture(course_code)
 
-    # Get a list of files in the timestamped directory
-    timestamped_folder = f"notes/{course_code}/timestamped"
-
-    files = [f for f in os.listdir(timestamped_folder) if
-             os.path.isfile(os.path.join(timestamped_folder, f)) and f[0].isdigit()]
-
-    # Create a list of numeric prefixes from the files
-    nums = []
-    for f in files:
-
-        # Extract the numeric prefix
-        prefix = ''
-        for char in f:
-            if char.isdigit():
-                prefix += char
-            else:
-
-                # Stop at the first non-digit character
-                break
-
-        # If there's a numeric prefix, convert to integer and add to the list
-        if prefix:
-            nums.append(int(prefix))
-
-    # Return the highest number + 1, or 0 if the list is empty
-    if nums:
-        return max(nums) + 1
+    # Return the highest number + 1, or 0 if there are no lectures yet
+    if latest_lecture is not None:
+        return int(latest_lecture) + 1
     else:
         return 0
 
@@ -169,6 +202,7 @@ def move_and_rename_file(original_path, new_directory, new_filename):
 
     # Move and rename the file
     shutil.move(original_path, new_path)
+    move_file(original_path=original_path, new_path=new_path)
 
     return new_path
 
@@ -199,42 +233,52 @@ def merge_cut_audio_files(course_code, lecture_num):
     :return str: The audio file path or None if no files exist
     """
 
-    # Define the regex pattern to match {i}-_-CUT_{n}-_-.wav files
-    pattern = re.compile(rf'^{lecture_num}-_-CUT_(\d+)-_-.wav$')
-
-    # Dictionary to hold cut .wav files
-    files_to_merge = []
-
-    # Iterate over files in the directory
-    directory = f"notes/{course_code}/lectures"
-    for filename in os.listdir(directory):
-        match = pattern.match(filename)
-        if match:
-            cut_number = int(match.group(1))
-            files_to_merge.append((cut_number, filename))
+    # The catalog has the cut .wav files in order of their cut number (n)
+    files_to_merge = get_cut_paths(course_code=course_code, lecture_num=lecture_num)
 
     # Check if there are files to merge
     if files_to_merge:
-
-        # Sort the files by the cut number (n)
-        files_to_merge.sort(key=lambda x: x[0])
-
-        # Load and concatenate audio files
-        combined = AudioSegment.empty()
-        for _, filename in files_to_merge:
-            file_path = os.path.join(directory, filename)
-            audio = AudioSegment.from_wav(file_path)
-            combined += audio
-
-        # Export the combined audio to a single file
+        directory = f"notes/{course_code}/lectures"
         output_path = os.path.join(directory, f"{lecture_num}.wav")
-        combined.export(output_path, format="wav")
+
+        # The cuts are merged into a temporary file so a merge that stops partway never looks finished
+        temp_path = f"{output_path}.merging.wav"
+
+        # A single cut only needs renaming
+        if len(files_to_merge) == 1:
+            os.rename(files_to_merge[0], output_path)
+            move_file(original_path=files_to_merge[0], new_path=output_path)
+            print(f"Merged files into {output_path}")
+            return output_path
+
+        # Streams the audio of every cut into the output in blocks so memory use stays the same for any length
+        with wave.open(temp_path, 'wb') as output_file:
+            output_params = None
+            for file_path in files_to_merge:
+                filename = os.path.basename(file_path)
+                with wave.open(file_path, 'rb') as cut_file:
+                    params = cut_file.getparams()
+
+                    # Every cut has to have the same format to be joined without decoding
+                    if output_params is None:
+                        output_params = params
+                        output_file.setparams(params)
+                    elif params[:3] != output_params[:3]:
+                        raise ValueError(f"{filename} has a different format from the other cuts")
+
+                    while True:
+                        data = cut_file.readframes(MERGE_BLOCK_FRAMES)
+                        if not data:
+                            break
+                        output_file.writeframes(data)
+
+        os.replace(temp_path, output_path)
         print(f"Merged files into {output_path}")
 
         # Delete the original cut files
-        for _, filename in files_to_merge:
-            file_path = os.path.join(directory, filename)
+        for file_path in files_to_merge:
             os.remove(file_path)
+        update_files(added=[output_path], removed=files_to_merge)
 
         return output_path
     else:
@@ -242,80 +286,176 @@ def merge_cut_audio_files(course_code, lecture_num):
         return None
 
 
-def add_time_to_timestamps(timestamped_transcript, time_to_add):
-    """
-    Adds a constant amount of time to all timestamps in the format [hh:mm:ss.sss --> hh:mm:ss.sss] within a str.
+def split_wav_at_silence(wav_path, chunk_count, search_seconds=30, frame_seconds=0.1):
+    """
+    Splits a .wav file into chunks, cutting at the quietest point near each evenly spaced boundary
+    so words aren't cut in half. Chunks are saved beside the original as {name}-_-CHUNK_{n}-_-.wav.
 
-    :param str timestamped_transcript: The input string containing the timestamps and dialogue
-    :param float time_to_add: The amount of time in seconds to add to each timestamp
+    :param str wav_path: Path to the .wav file
+    :param int chunk_count: How many chunks to split the file into
+    :param float search_seconds: How far either side of each even boundary to look for silence
+    :param float frame_seconds: Length of the frames loudness is measured over
 
-    :return str: The modified string with updated timestamps
+    :return List[Tuple[str, float]]: The path of every chunk and its start time in seconds in the original file
     """
+    # Imported here so the menu starts without loading heavy audio libraries
+    import numpy as np
 
-    # Regular expression pattern to match timestamps [hh:mm:ss.sss --> hh:mm:ss.sss]
-    pattern = r'\[(\d{2}):(\d{2}):(\d{2}\.\d{3})\s*-->\s*(\d{2}):(\d{2}):(\d{2}\.\d{3})\]'
+    with wave.open(wav_path, 'rb') as wav_file:
+        params = wav_file.getparams()
+        frame_size = max(1, int(params.framerate * frame_seconds))
 
-    def add_time(match):
-        """
-        Adds time to the matched timestamp and returns the new timestamp.
+        # Measures the loudness of every frame without holding the whole file in memory
+        loudness = []
+        if params.sampwidth == 2:
+            while True:
+                data = wav_file.readframes(frame_size)
+                if not data:
+                    break
+                samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+                loudness.append(np.sqrt(np.mean(samples ** 2)))
 
-        :param re.Match match: The matched timestamp
+    # Finds the quietest frame near every even boundary
+    cut_points = [0]
+    for i in range(1, chunk_count):
+        boundary = params.nframes * i // chunk_count
+        if loudness:
+            centre = boundary // frame_size
+            search = int(search_seconds / frame_seconds)
+            low = max(centre - search, cut_points[-1] // frame_size + 1)
+            high = min(centre + search, len(loudness) - 1)
+            if low <= high:
+                boundary = (low + int(np.argmin(loudness[low:high + 1]))) * frame_size
+        cut_points.append(boundary)
+    cut_points.append(params.nframes)
 
-        :return str: Updated timestamp
-        """
+    # Writes every chunk to its own file
+    base_path = os.path.splitext(wav_path)[0]
+    chunks = []
+    with wave.open(wav_path, 'rb') as wav_file:
+        for i in range(chunk_count):
+            start, end = cut_points[i], cut_points[i + 1]
+            chunk_path = f"{base_path}-_-CHUNK_{i}-_-.wav"
+            wav_file.setpos(start)
 
-        # Parse start time
-        start_hour, start_minute, start_second = int(match.group(1)), int(match.group(2)), float(match.group(3))
-        start_time = timedelta(hours=start_hour, minutes=start_minute, seconds=start_second)
+            with wave.open(chunk_path, 'wb') as chunk_file:
+                chunk_file.setparams(params)
+                remaining = end - start
+                while remaining > 0:
+                    data = wav_file.readframes(min(remaining, params.framerate * 10))
+                    if not data:
+                        break
+                    chunk_file.writeframes(data)
+                    remaining -= len(data) // (params.sampwidth * params.nchannels)
 
-        # Parse end time
-        end_hour, end_minute, end_second = int(match.group(4)), int(match.group(5)), float(match.group(6))
-        end_time = timedelta(hours=end_hour, minutes=end_minute, seconds=end_second)
+            chunks.append((chunk_path, start / params.framerate))
 
-        # Add time to both start and end times
-        new_start_time = start_time + timedelta(seconds=time_to_add)
-        new_end_time = end_time + timedelta(seconds=time_to_add)
+    return chunks
 
-        # Format the new times back to [hh:mm:ss.sss]
-        new_start_str = f"{str(int(new_start_time.total_seconds() // 3600)).zfill(2)}:" \
-                        f"{str(int((new_start_time.total_seconds() % 3600) // 60)).zfill(2)}:" \
-                        f"{'{:06.3f}'.format(new_start_time.total_seconds() % 60)}"
 
-        new_end_str = f"{str(int(new_end_time.total_seconds() // 3600)).zfill(2)}:" \
-                      f"{str(int((new_end_time.total_seconds() % 3600) // 60)).zfill(2)}:" \
-                      f"{'{:06.3f}'.format(new_end_time.total_seconds() % 60)}"
+def trim_wav_start(wav_path, start_seconds):
+    """
+    Copies the audio of a .wav file after a point in time to a new file beside it,
+    saved as {name}-_-FROM_{seconds}-_-.wav.
 
-        return f"[{new_start_str} --> {new_end_str}]"
+    :param str wav_path: Path to the .wav file
+    :param float start_seconds: Where the copy starts in seconds from the start of the file
 
-    # Replace the timestamps in the text
-    modified_text = re.sub(pattern, add_time, timestamped_transcript)
+    :return str: Path to the copy or None if there is no audio after start_seconds
+    """
+    trimmed_path = f"{os.path.splitext(wav_path)[0]}-_-FROM_{int(start_seconds)}-_-.wav"
+    with wave.open(wav_path, 'rb') as wav_file:
+        params = wav_file.getparams()
+        start = min(int(start_seconds * params.framerate), params.nframes)
+        if start >= params.nframes:
+            return None
+
+        wav_file.setpos(start)
+        with wave.open(trimmed_path, 'wb') as trimmed_file:
+            trimmed_file.setparams(params)
+            while True:
+                data = wav_file.readframes(params.framerate * 10)
+                if not data:
+                    break
+                trimmed_file.writeframes(data)
 
-    return modified_text
+    return trimmed_path
 
 
-def get_transcript_end_time(transcript_raw):
+def get_audio_fingerprint(wav_path):
     """
-    Extracts the latest end time from a timestamped transcript.
+    Hashes the audio in a .wav file so the same recording matches even if it's been moved or renamed.
+    Only the format and the audio frames are hashed, not the file name or the rest of the header.
+
+    :param Union[str, BinaryIO] wav_path: Path to the .wav file or an open .wav file
+
+    :return str: A hex sha256 of the audio
+    """
+    digest = hashlib.sha256()
+    with wave.open(wav_path, 'rb') as wav_file:
+        digest.update(f"{wav_file.getnchannels()}:{wav_file.getsampwidth()}:{wav_file.getframerate()}:".encode('utf-8'))
+
+        # Reads the audio in blocks so long lectures aren't held in memory
+        while True:
+            data = wav_file.readframes(1024 * 1024)
+            if not data:
+                break
+            digest.update(data)
 
-    :param str transcript_raw: The input string containing the timestamps and dialogue
+    return digest.hexdigest()
 
-    :return float: The latest end time in timedelta
+
+def get_file_fingerprint(file_path):
+    """
+    Hashes everything in a file, used for audio and video files that aren't decoded to a .wav first.
+
+    :param str file_path: Path to the file
+
+    :return str: A hex sha256 of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+
+        # Reads the file in blocks so long lectures aren't held in memory
+        while True:
+            data = file.read(1024 * 1024)
+            if not data:
+                break
+            digest.update(data)
+
+    return digest.hexdigest()
+
+
+def repair_wav_header(wav_path):
     """
-    pattern = r'\[(\d{2}):(\d{2}):(\d{2}\.\d{3})\s*-->\s*(\d{2}):(\d{2}):(\d{2}\.\d{3})\]'
+    Fixes the sizes in the header of a .wav file that was still being recorded when the program stopped,
+    otherwise the audio in it can't be read. Only plain 44 byte headers like the ones the recorder writes are fixed.
 
-    latest_end_time = timedelta()
+    :param str wav_path: Path to the .wav file
 
-    for match in re.finditer(pattern, transcript_raw):
+    :return bool: Weather or not the header had to be fixed
+    """
+    file_size = os.path.getsize(wav_path)
+    if file_size < 44:
+        return False
 
-        # Parse end time
-        end_hour, end_minute, end_second = int(match.group(4)), int(match.group(5)), float(match.group(6))
-        end_time = timedelta(hours=end_hour, minutes=end_minute, seconds=end_second)
+    with open(wav_path, 'r+b') as wav_file:
+        header = wav_file.read(44)
+        if header[0:4] != b'RIFF' or header[8:12] != b'WAVE' or header[36:40] != b'data':
+            return False
 
-        # Update the latest end time if this one is later
-        if end_time > latest_end_time:
-            latest_end_time = end_time
+        # The sizes are only written when the recording is closed properly
+        riff_size = (file_size - 8).to_bytes(4, 'little')
+        data_size = (file_size - 44).to_bytes(4, 'little')
+        if header[4:8] == riff_size and header[40:44] == data_size:
+            return False
 
-    return latest_end_time.total_seconds()
+        wav_file.seek(4)
+        wav_file.write(riff_size)
+        wav_file.seek(40)
+        wav_file.write(data_size)
+
+    return True
 
 
 def rename_wav_file(original_path, new_name):
@@ -340,103 +480,316 @@ def rename_wav_file(original_path, new_name):
 
     # Rename the file
     os.rename(original_path, new_path)
+    move_file(original_path=original_path, new_path=new_path)
 
     return new_path
 
 
-def compress_wav_to_mp3(wav_file_path, bit_rate="128k"):
+def get_wav_duration(file_path):
     """
-    Compresses a .wav file by converting it to a .mp3 file, prints the percentage of compression,
-    and then deletes the original .wav file.
+    Gets the duration of a .wav file from its header.
 
-    :param str wav_file_path: Path to the .wav file
-    :param str bit_rate: Bit-rate for the .mp3 file (default is 192k)
+    :param str file_path: Path to the .wav file
 
-    :return str: Path to the compressed .mp3 file
+    :return float: Duration in seconds
     """
-    print_green("\nCompressing...")
+    with wave.open(file_path, 'rb') as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
 
-    # Ensure the file is a .wav file
-    print("Checking .wav")
+
+def get_audio_duration(file_path):
+    """
+    Gets the duration of an audio file using ffprobe.
+
+    :param str file_path: Path to the audio file
+
+    :return float: Duration in seconds or None if the file can't be read
+    """
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def compress_wav(wav_file_path, profile="opus"):
+    """
+    Compresses a .wav file with one of the ARCHIVE_PROFILES, checks the compressed file is complete
+    and only then deletes the original .wav file.
+
+    :param str wav_file_path: Path to the .wav file
+    :param str profile: Name of the archive profile to encode with
+
+    :return str: Path to the compressed file
+
+    :raises: Exception if encoding fails or the compressed file doesn't match the .wav
+    """
     if not wav_file_path.lower().endswith(".wav"):
         raise ValueError("The provided file is not a .wav file.")
+    if profile not in ARCHIVE_PROFILES:
+        raise ValueError(f"Unknown archive profile {profile}, use one of: {', '.join(ARCHIVE_PROFILES)}")
+
+    extension, codec_args = ARCHIVE_PROFILES[profile]
+    compressed_path = f"{os.path.splitext(wav_file_path)[0]}{extension}"
+    temp_path = f"{compressed_path}.encoding{extension}"
+
+    # ffmpeg streams the .wav through the encoder instead of decoding it all into memory first
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-i", wav_file_path, "-vn"]
+        + codec_args + [temp_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise Exception(f"Error compressing {wav_file_path}: {result.stderr.strip()}")
+
+    # The compressed file must play for as long as the .wav before the .wav can be deleted
+    with wave.open(wav_file_path, 'rb') as wav_file:
+        wav_duration = wav_file.getnframes() / wav_file.getframerate()
+    compressed_duration = get_audio_duration(temp_path)
+    if compressed_duration is None or abs(compressed_duration - wav_duration) > 1:
+        os.remove(temp_path)
+        raise Exception(f"Compressed {wav_file_path} doesn't match the original, the .wav was kept")
+
+    os.replace(temp_path, compressed_path)
+    os.remove(wav_file_path)
+    update_files(added=[compressed_path], removed=[wav_file_path])
 
-    # Get the size of the original .wav file
-    original_size = os.path.getsize(wav_file_path)
+    return compressed_path
 
-    # Load the .wav file
-    audio = AudioSegment.from_wav(wav_file_path)
 
-    # Define the output .mp3 file path
-    mp3_file_path = wav_file_path.replace(".wav", ".mp3")
+def get_archive_savings(lectures_directory):
+    """
+    Measures how much space compressing a class' lectures saved compared to keeping them as 16 kHz .wav files.
 
-    # Export the audio as an .mp3 file
-    audio.export(mp3_file_path, format="mp3", bitrate=bit_rate)
-    print("Converted to .mp3")
+    :param str lectures_directory: Path to the class' lectures folder
 
-    # Get the size of the compressed .mp3 file
-    compressed_size = os.path.getsize(mp3_file_path)
+    :return int: Number of compressed lectures
+    :return int: Bytes the compressed lectures take up
+    :return int: Bytes the lectures would take up as .wav files
+    """
+    archive_extensions = {extension for extension, _ in ARCHIVE_PROFILES.values()}
 
-    # Calculate the percentage of compression
-    compression_percentage = ((original_size - compressed_size) / original_size) * 100
+    count = 0
+    archived_bytes = 0
+    wav_bytes = 0
+    for filename in os.listdir(lectures_directory):
+        file_path = os.path.join(lectures_directory, filename)
+        if os.path.splitext(filename)[1].lower() not in archive_extensions or ".encoding" in filename:
+            continue
 
-    # Print the percentage of compression
-    print(f"Compression saved {compression_percentage:.2f}% space")
+        duration = get_audio_duration(file_path)
+        if duration is None:
+            continue
 
-    # Delete the original .wav file
-    os.remove(wav_file_path)
+        count += 1
+        archived_bytes += os.path.getsize(file_path)
+
+        # Every lecture is recorded as 16-bit mono so its .wav size only depends on its length
+        wav_bytes += int(duration * WHISPER_SAMPLE_RATE) * 2 + 44
+
+    return count, archived_bytes, wav_bytes
+
+
+def format_size(num_bytes):
+    """
+    Formats a number of bytes for people to read.
+
+    :param int num_bytes: The number of bytes
+
+    :return str: The size such as 1.2 GB
+    """
+    size = float(num_bytes)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} TB"
+
+
+def ffmpeg_decode_command(file_path, output_path, output_format, sample_count=None):
+    """
+    Builds an ffmpeg command that decodes the audio of any audio or video file straight to 16 kHz mono PCM.
+
+    :param str file_path: Path to the input audio or video file
+    :param str output_path: Where ffmpeg writes the audio, - for stdout
+    :param str output_format: The ffmpeg output format, wav for a file or s16le for raw samples
+    :param int sample_count: Pads or trims the audio to exactly this many samples if given
+
+    :return List[str]: The command
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", file_path,
+        "-vn",
+        "-ac", "1",
+        "-ar", str(WHISPER_SAMPLE_RATE)
+    ]
+    if sample_count is not None:
+        command += ["-af", f"apad=whole_len={sample_count},atrim=end_sample={sample_count}"]
+
+    return command + [
+        "-c:a", "pcm_s16le",
+        "-f", output_format,
+        output_path
+    ]
 
-    print_green("\nCompression successful!")
 
-    return mp3_file_path
+def get_media_duration(file_path):
+    """
+    Gets how long the audio in any audio or video file is without decoding it.
+
+    :param str file_path: Path to the audio or video file
+
+    :return float: The duration in seconds
+
+    :raises: ValueError if ffprobe can't read the file
+    """
+    process = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            file_path
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        return float(process.stdout.decode('utf-8').strip())
+    except ValueError:
+        raise ValueError(f"Could not read the length of {file_path}: {process.stderr.decode('utf-8').strip()}")
+
+
+def make_wav_header(sample_count):
+    """
+    Builds the 44 byte header of a 16 kHz mono 16 bit .wav file.
+
+    :param int sample_count: How many samples follow the header
+
+    :return bytes: The header
+    """
+    data_size = sample_count * 2
+
+    return (
+        b'RIFF' + (data_size + 36).to_bytes(4, 'little') + b'WAVE'
+        + b'fmt ' + (16).to_bytes(4, 'little')
+        + (1).to_bytes(2, 'little')
+        + (1).to_bytes(2, 'little')
+        + WHISPER_SAMPLE_RATE.to_bytes(4, 'little')
+        + (WHISPER_SAMPLE_RATE * 2).to_bytes(4, 'little')
+        + (2).to_bytes(2, 'little')
+        + (16).to_bytes(2, 'little')
+        + b'data' + data_size.to_bytes(4, 'little')
+    )
+
+
+def stream_wav_16khz(file_path, block_size=DECODE_BLOCK_BYTES):
+    """
+    Decodes any audio or video file to a 16 kHz mono .wav through an ffmpeg pipe, handing it over in blocks
+    so only one block is ever held in memory and nothing is written to disk.
+    The length is read first and ffmpeg pads or trims to it, so the .wav header can be sent before the audio
+    since ffmpeg can't go back and fill in the sizes of a header on a pipe.
+
+    :param str file_path: Path to the input audio or video file
+    :param int block_size: Most bytes read from ffmpeg at a time
+
+    :return int: Size of the whole .wav in bytes
+    :return Iterator[bytes]: The header then the audio in blocks, raises ValueError if ffmpeg can't decode the file
+
+    :raises: ValueError if the file doesn't exist or its length can't be read
+    """
+    if not os.path.exists(file_path):
+        raise ValueError("The provided file path does not exist.")
+
+    sample_count = round(get_media_duration(file_path=file_path) * WHISPER_SAMPLE_RATE)
+    header = make_wav_header(sample_count=sample_count)
+
+    def blocks():
+        process = subprocess.Popen(
+            ffmpeg_decode_command(
+                file_path=file_path,
+                output_path="-",
+                output_format="s16le",
+                sample_count=sample_count
+            ),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        try:
+            yield header
+            while True:
+                block = process.stdout.read(block_size)
+                if not block:
+                    break
+                yield block
+
+            error = process.stderr.read()
+            if process.wait() != 0:
+                raise ValueError(f"Could not decode {file_path}: {error.decode('utf-8').strip()}")
+
+        # Stops ffmpeg if whoever was reading the blocks gave up partway
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    return len(header) + sample_count * 2, blocks()
 
 
 def convert_to_wav_16khz(file_path):
     """
-    Converts any audio or video file to a .wav file at a 16 kHz sample rate.
+    Converts any audio or video file to a mono .wav file at a 16 kHz sample rate in a single ffmpeg pass.
     Deletes the original file after conversion if it's an audio file, but keeps the original file if it's a video.
     Supports: .mp3, .wav, .flac, .ogg, .acc, .m4a, .wma, .aiff, .opus, .mp4, .mkv, .avi, .mov, .wmv, .flv and .webm
 
     :param str file_path: Path to the input audio or video file (e.g., .mp3, .mp4, .flac)
 
     :return str: Path to the converted .wav file
+
+    :raises: ValueError if the file doesn't exist or ffmpeg can't decode it
     """
     if not os.path.exists(file_path):
         raise ValueError("The provided file path does not exist.")
 
     # Determine the file extension
     file_ext = os.path.splitext(file_path)[1].lower()
-
-    is_video = False
-
-    if file_ext in ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm']:
-        is_video = True
-
-        # Extract audio from video file using moviepy
-        with VideoFileClip(file_path) as video:
-            audio = video.audio
-
-            # Save the extracted audio as a temporary file
-            temp_audio_path = "temp_audio.mp3"
-            audio.write_audiofile(temp_audio_path)
-            file_path = temp_audio_path
-
-    # Load the audio file (either from video or directly)
-    audio = AudioSegment.from_file(file_path)
+    is_video = file_ext in ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm']
 
     # Set the output file path to be the same as input but with .wav extension
     output_file_path = os.path.splitext(file_path)[0] + ".wav"
 
-    # Export the audio as a .wav file with a 16 kHz sample rate
-    audio.set_frame_rate(16000).export(output_file_path, format="wav")
+    # ffmpeg can't overwrite the file it's reading so .wav files are converted to a temporary file first
+    temp_file_path = f"{output_file_path}.converting.wav"
+
+    # Decodes straight from the source container, video files never go through an intermediate audio file
+    process = subprocess.run(
+        ffmpeg_decode_command(file_path=file_path, output_path=temp_file_path, output_format="wav"),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+    if process.returncode != 0:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise ValueError(f"Could not decode {file_path}: {process.stderr.decode('utf-8').strip()}")
+
+    os.replace(temp_file_path, output_file_path)
 
     # Remove the original audio file if it wasn't a video or a .wav
     if not is_video and file_ext != '.wav':
         os.remove(file_path)
-    else:
-        # Remove the temporary audio file if created
-        if os.path.exists("temp_audio.mp3"):
-            os.remove("temp_audio.mp3")
 
     print("Converted to .wav")
     return output_file_path
@@ -450,13 +803,16 @@ def get_files_in_directory(directory_path):
 
     :return list[str]: A list of filenames in the directory
     """
+    from natsort import natsorted
 
     # Check if the provided path is a valid directory
     if not os.path.isdir(directory_path):
         raise ValueError(f"The provided path '{directory_path}' is not a valid directory.")
 
-    # Get the list of filenames in the directory
-    filenames = os.listdir(directory_path)
+    # Class folders are read from the catalog, any other folder is listed leaving out hidden files such as indexes
+    filenames = get_filenames(directory_path)
+    if filenames is None:
+        filenames = [filename for filename in os.listdir(directory_path) if not filename.startswith(".")]
 
     # Sort the filenames naturally ie numbers in increasing order and then alphabetically
     filenames = natsorted(filenames)
@@ -489,6 +845,8 @@ def move_directory(original_path, new_path):
 
     # Move the directory
     shutil.move(original_path, new_path)
+    move_course(original_path=original_path, new_path=new_path)
+    move_course_index(original_path=original_path, new_path=new_path)
 
     return new_path
 
@@ -0,0 +1,147 @@
+import os
+import uuid
+from dotenv import dotenv_values
+
+# Load the .env file into a dictionary
+config = dotenv_values(".env")
+
+# How hard writes try to reach the disk before moving on, set with FSYNC_POLICY in .env
+#   always: every write is synced, the safest and slowest
+#   lecture: files are synced once they're finished such as a lecture's transcript or a batch of main file appends
+#   never: the operating system decides when to write to disk, files still can't be left half written
+FSYNC_POLICIES = ["always", "lecture", "never"]
+DEFAULT_FSYNC_POLICY = "lecture"
+
+
+def get_fsync_policy():
+    """
+    Gets the fsync policy writes follow.
+
+    :return str: FSYNC_POLICY from .env or the default policy
+    """
+    policy = (config.get("FSYNC_POLICY") or DEFAULT_FSYNC_POLICY).lower()
+    if policy not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy {policy}, use one of: {', '.join(FSYNC_POLICIES)}")
+
+    return policy
+
+
+def should_sync(finished):
+    """
+    Checks if a write has to be synced under the fsync policy.
+
+    :param bool finished: Weather or not the write finishes a file, only these are synced under the lecture policy
+
+    :return bool: Weather or not to sync the write
+    """
+    policy = get_fsync_policy()
+
+    return policy == "always" or (policy == "lecture" and finished)
+
+
+def sync_file(file, finished=True):
+    """
+    Pushes everything written to an open file to the disk if the fsync policy asks for it.
+
+    :param IO file: The open file
+    :param bool finished: Weather or not the write finishes the file
+
+    :return: None
+    """
+    file.flush()
+    if should_sync(finished):
+        os.fsync(file.fileno())
+
+
+def sync_directory(directory, finished=True):
+    """
+    Makes a rename in a directory survive a power cut if the fsync policy asks for it.
+    Windows can't sync directories and doesn't need to.
+
+    :param str directory: The directory the file was renamed in
+    :param bool finished: Weather or not the rename finishes the file
+
+    :return: None
+    """
+    if os.name != "posix" or not should_sync(finished):
+        return
+
+    directory_fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+def write_atomic(file_path, content, finished=True):
+    """
+    Replaces a file with new content all at once by writing a hidden temporary file beside it and renaming it,
+    so a crash leaves either the old file or the new one and never half of it.
+
+    :param str file_path: Path to the file
+    :param Union[str, bytes] content: What the file should contain
+    :param bool finished: Weather or not the file is finished, unfinished files are only synced under the always policy
+
+    :return: None
+    """
+    write_atomic_with(
+        file_path=file_path,
+        write=lambda file: file.write(content),
+        binary=isinstance(content, bytes),
+        finished=finished
+    )
+
+
+def write_atomic_with(file_path, write, binary=True, finished=True):
+    """
+    Replaces a file all at once like write_atomic but lets the caller write the new content itself,
+    for content that is streamed in rather than held in memory.
+
+    :param str file_path: Path to the file
+    :param Callable write: Called with the open temporary file and writes the new content to it
+    :param bool binary: Weather or not the temporary file is opened in binary mode, otherwise as utf-8 text
+    :param bool finished: Weather or not the file is finished, unfinished files are only synced under the always policy
+
+    :return: Whatever write returns
+    """
+    directory, filename = os.path.split(file_path)
+    temp_path = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.tmp")
+
+    try:
+        if binary:
+            with open(temp_path, 'wb') as file:
+                result = write(file)
+                sync_file(file, finished=finished)
+        else:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                result = write(file)
+                sync_file(file, finished=finished)
+
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    sync_directory(directory, finished=finished)
+
+    return result
+
+
+def append_to_file(file_path, content, finished=False):
+    """
+    Appends to a file in a single write.
+
+    :param str file_path: Path to the file
+    :param Union[str, bytes] content: What to append
+    :param bool finished: Weather or not this append finishes the file
+
+    :return int: The offset in bytes the content was written at
+    """
+    data = content if isinstance(content, bytes) else content.encode('utf-8')
+    with open(file_path, 'ab') as file:
+        offset = file.tell()
+        file.write(data)
+        sync_file(file, finished=finished)
+
+    return offset
@@ -1,6 +1,17 @@
 import re
 import os
 
+# Audio and video files that can be transcribed
+SUPPORTED_FILE_EXTENSIONS = [
+    # Audio formats
+    '.mp3', '.wav', '.flac', '.ogg', '.aac',
+    '.m4a', '.wma', '.aiff', '.opus',
+
+    # Video formats
+    '.mp4', '.mkv', '.avi', '.mov',
+    '.wmv', '.flv', '.webm'
+]
+
 
 def get_int(prompt, lowest_valid=None, highest_valid=None):
     """
@@ -125,23 +136,6 @@ def get_path(prompt):
                   "separators (/, \\).")
 
 
-def remove_timestamps(transcript):
-    """
-    Takes a transcript with timestamps and removes them.
-
-    :param str transcript: The transcript with timestamps
-
-    :return str: The transcript without the timestamps
-    """
-
-    # Define the regex pattern for the timestamp
-    timestamp_pattern = r"\[\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}\]\s*"
-
-    # Replace all matches of the timestamp pattern with an empty string
-    cleaned_text = re.sub(timestamp_pattern, '', transcript)
-
-    return cleaned_text
-
 def snake_to_title(snake_str):
     """
     Converts a snake_case word to Title Case.
@@ -0,0 +1,199 @@
+import os
+import queue
+import threading
+import wave
+import numpy as np
+from helpers.fancy_prints import print_red
+from helpers.file_handler import write_to_file
+from helpers.timestamps import add_time_to_timestamps, get_segment_times
+from helpers.process_audio import transcribe_audio
+from helpers.pipeline import mark_live_transcribed
+
+# Whisper expects 16 kHz mono audio
+WHISPER_SAMPLE_RATE = 16000
+
+
+class StreamingTranscriber:
+    """
+    A class that transcribes a live recording in fixed-size overlapping windows on a background thread.
+    The timestamped transcript of the lecture grows while the lecture is still being recorded.
+    """
+    def __init__(self, course_code, lecture_num, samplerate, model_name="medium.en", window_seconds=20,
+                 overlap_seconds=2):
+        """
+        Initializes the StreamingTranscriber and starts its background worker.
+
+        :param str course_code: Code of the lecture class
+        :param int lecture_num: The nth lecture
+        :param int samplerate: The sample rate of the audio that will be fed in
+        :param str model_name: Name of the whisper model to use
+        :param float window_seconds: Length of each window sent to Whisper
+        :param float overlap_seconds: How much each window overlaps the previous one so words on the edge aren't cut
+
+        :return: None
+        """
+        self.course_code = course_code
+        self.lecture_num = lecture_num
+        self.samplerate = samplerate
+        self.model_name = model_name
+        self.window_size = int(window_seconds * samplerate)
+        self.overlap_size = int(overlap_seconds * samplerate)
+        self.timestamped_path = f"notes/{course_code}/timestamped/{lecture_num}.txt"
+        self.window_path = f"notes/{course_code}/lectures/{lecture_num}-_-WINDOW-_-.wav"
+
+        # Audio that has been fed but not yet sent off as a window
+        self._blocks = []
+        self._buffered = 0
+
+        # Start of the next window in seconds from the start of the recording
+        self._window_start = 0.0
+
+        # End of the last segment written to the transcript, used to drop repeats from the overlap
+        self._committed_end = 0.0
+
+        # Once a window fails the saved progress stops moving so resuming transcribes the missing audio
+        self._failed = False
+
+        self._windows = queue.Queue()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+
+    def feed(self, block):
+        """
+        Adds a block of recorded audio and queues a window for transcription once enough audio is buffered.
+
+        :param numpy.ndarray block: int16 audio samples captured from the mic
+
+        :return: None
+        """
+        self._blocks.append(block.reshape(-1))
+        self._buffered += len(self._blocks[-1])
+
+        if self._buffered >= self.window_size:
+            audio = np.concatenate(self._blocks)
+            window = audio[:self.window_size]
+            self._windows.put((self._window_start, window, False))
+
+            # Keep the overlap and anything past the window for the next window
+            remaining = audio[self.window_size - self.overlap_size:]
+            self._blocks = [remaining]
+            self._buffered = len(remaining)
+            self._window_start += (self.window_size - self.overlap_size) / self.samplerate
+
+
+    def finish(self):
+        """
+        Sends the remaining audio off for transcription and waits for every window to be written.
+
+        :return bool: Weather or not every window was transcribed, if not the audio after the last
+        window that was is left to be transcribed again from the recording
+        """
+        if self._buffered > 0:
+            self._windows.put((self._window_start, np.concatenate(self._blocks), True))
+            self._blocks = []
+            self._buffered = 0
+
+        # Signals the worker to stop once the queue is empty
+        self._windows.put(None)
+        self._worker.join()
+
+        return not self._failed
+
+
+    def _work(self):
+        """
+        Background worker that transcribes queued windows in order and appends them to the timestamped transcript.
+
+        :return: None
+        """
+        while True:
+            item = self._windows.get()
+            if item is None:
+                return
+
+            # Once a window fails the rest of the recording is transcribed again after it's stopped
+            # so nothing is written past the gap
+            if self._failed:
+                continue
+
+            window_start, samples, is_final = item
+            try:
+                self._transcribe_window(window_start=window_start, samples=samples, is_final=is_final)
+            except Exception as e:
+                self._failed = True
+                print_red(f"Error transcribing live audio: {e}")
+
+
+    def _transcribe_window(self, window_start, samples, is_final):
+        """
+        Transcribes a single window and appends the new segments to the timestamped transcript.
+
+        :param float window_start: Start of the window in seconds from the start of the recording
+        :param numpy.ndarray samples: int16 audio samples of the window
+        :param bool is_final: Weather or not this is the last window of the recording
+
+        :return: None
+        """
+        write_wav_16khz(file_path=self.window_path, samples=samples, samplerate=self.samplerate)
+        try:
+            transcript_raw = transcribe_audio(
+                wav_path=self.window_path,
+                model_name=self.model_name,
+                timed=False,
+                use_cache=False
+            )
+        finally:
+            os.remove(self.window_path)
+
+        # Segments starting in the overlap are left for the next window which hears them in full
+        window_end = window_start + len(samples) / self.samplerate
+        commit_end = window_end if is_final else window_end - self.overlap_size / self.samplerate
+
+        new_lines = []
+        for line in add_time_to_timestamps(transcript_raw, time_to_add=window_start).splitlines():
+            start, end = get_segment_times(line)
+            if start is None:
+                continue
+
+            # Already transcribed by the previous window or belongs to the next window
+            if start < self._committed_end or (start >= commit_end and not is_final):
+                continue
+
+            new_lines.append(line)
+            self._committed_end = max(self._committed_end, end)
+
+        if new_lines:
+            write_to_file(file_path=self.timestamped_path, content="\n".join(new_lines) + "\n")
+
+        # Everything before the end of the window or the last segment written is in the transcript now
+        # so resuming after a crash only has to transcribe what's after it
+        mark_live_transcribed(
+            course_code=self.course_code,
+            lecture_num=self.lecture_num,
+            seconds=max(commit_end, self._committed_end)
+        )
+
+
+def write_wav_16khz(file_path, samples, samplerate):
+    """
+    Resamples int16 mono audio to 16 kHz and writes it to a .wav file.
+
+    :param str file_path: Path of the .wav file to write
+    :param numpy.ndarray samples: int16 audio samples
+    :param int samplerate: The sample rate of the samples
+
+    :return: None
+    """
+    if samplerate != WHISPER_SAMPLE_RATE and len(samples) > 0:
+        duration = len(samples) / samplerate
+        new_length = int(duration * WHISPER_SAMPLE_RATE)
+        old_times = np.arange(len(samples)) / samplerate
+        new_times = np.arange(new_length) / WHISPER_SAMPLE_RATE
+        samples = np.interp(new_times, old_times, samples).astype(np.int16)
+
+    with wave.open(file_path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(WHISPER_SAMPLE_RATE)
+        wav_file.writeframes(samples.astype(np.int16).tobytes())
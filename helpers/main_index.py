@@ -0,0 +1,307 @@
+import os
+import re
+import json
+import atexit
+import threading
+from helpers.catalog import add_file
+from helpers.file_output import write_atomic, write_atomic_with, append_to_file
+
+# Lecture headers written at the start of every lecture in main.txt and main.md
+TRANSCRIPT_HEADER_PATTERN = re.compile(rb'^Course: .*\r?\nLecture (\S+)\r?\n', re.MULTILINE)
+SUMMARY_HEADER_PATTERN = re.compile(rb'^## .*\r?\n\r?\n### Lecture: .*-(\S+)\r?\n', re.MULTILINE)
+
+# Only one thread appends to a main file at a time so offsets stay correct
+_append_lock = threading.Lock()
+
+# Lectures waiting to be appended to each main file, they're written together by flush_appends
+_pending_appends = {}
+
+
+def get_index_path(main_path):
+    """
+    Gets the path of the index beside a main.txt or main.md file. It starts with a . so it's hidden.
+
+    :param str main_path: Path to the main file
+
+    :return str: Path to the index
+    """
+    directory, filename = os.path.split(main_path)
+
+    return os.path.join(directory, f".{filename}.index")
+
+
+def parse_lecture_num(text):
+    """
+    Parses a lecture number from a header keeping whole numbers as ints.
+
+    :param str text: The lecture number as written in the header
+
+    :return Union[int, float, str]: The lecture number, or the text if it isn't a number
+    """
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+
+    return int(number) if number.is_integer() else number
+
+
+def build_index(main_path):
+    """
+    Builds the index of a main file by finding every lecture header in it.
+    Only needed for main files written before they had an index or that were edited by hand.
+
+    :param str main_path: Path to the main file
+
+    :return List[dict]: The lecture number, byte offset and byte length of every lecture in order
+    """
+    with open(main_path, 'rb') as main_file:
+        data = main_file.read()
+
+    pattern = SUMMARY_HEADER_PATTERN if main_path.endswith(".md") else TRANSCRIPT_HEADER_PATTERN
+    matches = list(pattern.finditer(data))
+
+    entries = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(data)
+        entries.append({
+            "lecture": parse_lecture_num(match.group(1).decode('utf-8')),
+            "offset": match.start(),
+            "length": end - match.start()
+        })
+
+    return entries
+
+
+def write_index(main_path, entries):
+    """
+    Replaces the index of a main file.
+
+    :param str main_path: Path to the main file
+    :param List[dict] entries: The lecture number, byte offset and byte length of every lecture in order
+
+    :return: None
+    """
+    write_atomic(get_index_path(main_path), "".join(json.dumps(entry) + "\n" for entry in entries))
+
+
+def read_index(main_path):
+    """
+    Reads the index of a main file, rebuilding it if it's missing or doesn't match the main file.
+
+    :param str main_path: Path to the main file
+
+    :return List[dict]: The lecture number, byte offset and byte length of every lecture in order
+    """
+    if not os.path.exists(main_path):
+        return []
+
+    try:
+        with open(get_index_path(main_path), 'r', encoding='utf-8') as index_file:
+            entries = [json.loads(line) for line in index_file if line.strip()]
+        indexed_size = entries[-1]["offset"] + entries[-1]["length"] if entries else 0
+    except (FileNotFoundError, json.JSONDecodeError):
+        entries = None
+        indexed_size = None
+
+    # The index must end exactly where the main file ends otherwise the main file was changed without it
+    if entries is None or indexed_size != os.path.getsize(main_path):
+        entries = build_index(main_path)
+        write_index(main_path, entries)
+
+    return entries
+
+
+def append_lecture(main_path, lecture_num, content):
+    """
+    Queues a lecture to be appended to a main file. Queued lectures are written by flush_appends
+    so each main file is only opened and synced once no matter how many lectures are added.
+
+    :param str main_path: Path to the main file
+    :param Union[int, float] lecture_num: The nth lecture
+    :param str content: The lecture's text including its header
+
+    :return: None
+    """
+    with _append_lock:
+        _pending_appends.setdefault(main_path, []).append((lecture_num, content.encode('utf-8')))
+
+
+def flush_appends(main_path=None):
+    """
+    Appends every queued lecture to its main file in one write and records where each was written in the index.
+
+    :param str main_path: Only write the lectures queued for this main file if given, otherwise every main file
+
+    :return: None
+    """
+    with _append_lock:
+        if main_path is None:
+            main_paths = list(_pending_appends)
+        else:
+            main_paths = [main_path] if main_path in _pending_appends else []
+
+        for path in main_paths:
+            lectures = _pending_appends.pop(path)
+
+            # Makes sure the index covers everything already in the main file before adding to it
+            read_index(path)
+
+            offset = append_to_file(path, b"".join(data for _, data in lectures), finished=True)
+
+            # The index is written after the lectures so anything past its end was never fully appended
+            index_lines = []
+            for lecture_num, data in lectures:
+                index_lines.append(json.dumps({"lecture": lecture_num, "offset": offset, "length": len(data)}) + "\n")
+                offset += len(data)
+            append_to_file(get_index_path(path), "".join(index_lines), finished=True)
+
+    for path in main_paths:
+        add_file(path)
+
+
+# Lectures still queued when the program exits are written instead of lost
+atexit.register(flush_appends)
+
+
+def read_lecture(main_path, lecture_num):
+    """
+    Reads one lecture out of a main file by seeking straight to it.
+    If the lecture was added more than once the latest one is returned.
+
+    :param str main_path: Path to the main file
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return str: The lecture's text including its header or None if it isn't in the main file
+    """
+    flush_appends(main_path)
+    matching = [entry for entry in read_index(main_path) if entry["lecture"] == lecture_num]
+    if not matching:
+        return None
+
+    with open(main_path, 'rb') as main_file:
+        main_file.seek(matching[-1]["offset"])
+        return main_file.read(matching[-1]["length"]).decode('utf-8')
+
+
+def copy_lectures(main_path, entries):
+    """
+    Replaces a main file with only the given lectures by copying each lecture's bytes straight from the old file.
+    Must be called while holding _append_lock.
+
+    :param str main_path: Path to the main file
+    :param List[dict] entries: The index entries of the lectures to keep in the order they should be written
+
+    :return List[dict]: The index of the new main file
+    """
+    def copy(new_file):
+        """
+        Copies each lecture into the new main file.
+
+        :param BinaryIO new_file: The new main file
+
+        :return List[dict]: The index of the new main file
+        """
+        new_entries = []
+        with open(main_path, 'rb') as old_file:
+            for entry in entries:
+                old_file.seek(entry["offset"])
+                new_entries.append({"lecture": entry["lecture"], "offset": new_file.tell(), "length": entry["length"]})
+                new_file.write(old_file.read(entry["length"]))
+
+        return new_entries
+
+    new_entries = write_atomic_with(file_path=main_path, write=copy)
+    write_index(main_path, new_entries)
+
+    return new_entries
+
+
+def rewrite_main(main_path, dedupe=True, reorder=True):
+    """
+    Rewrites a main file by copying each lecture's bytes straight from the old file.
+
+    :param str main_path: Path to the main file
+    :param bool dedupe: Weather or not to only keep the latest copy of lectures that were added more than once
+    :param bool reorder: Weather or not to sort the lectures by lecture number
+
+    :return int: How many lectures are in the rewritten file
+    """
+    flush_appends(main_path)
+    with _append_lock:
+        entries = read_index(main_path)
+
+        if dedupe:
+            latest = {}
+            for entry in entries:
+                latest[entry["lecture"]] = entry
+            entries = [entry for entry in entries if latest[entry["lecture"]] is entry]
+
+        if reorder:
+
+            # Lecture numbers that aren't numbers go last
+            entries = sorted(entries, key=lambda entry: (
+                not isinstance(entry["lecture"], (int, float)),
+                entry["lecture"] if isinstance(entry["lecture"], (int, float)) else 0
+            ))
+
+        new_entries = copy_lectures(main_path=main_path, entries=entries)
+
+    return len(new_entries)
+
+
+def count_lecture_copies(main_path, lecture_num):
+    """
+    Counts how many times a lecture has been added to a main file.
+
+    :param str main_path: Path to the main file
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return int: How many copies of the lecture are in the main file
+    """
+    flush_appends(main_path)
+
+    return sum(1 for entry in read_index(main_path) if entry["lecture"] == lecture_num)
+
+
+def restore_lecture_copies(main_path, lecture_num, copies):
+    """
+    Undoes appends of a lecture that didn't finish, cutting off a lecture that was only partly written
+    and dropping copies of the lecture added after the first ones.
+
+    :param str main_path: Path to the main file
+    :param Union[int, float] lecture_num: The nth lecture
+    :param int copies: How many copies of the lecture to keep
+
+    :return: None
+    """
+    flush_appends(main_path)
+    if not os.path.exists(main_path):
+        return
+
+    with _append_lock:
+
+        # The index is written after the lecture so anything past its end was only partly appended
+        try:
+            with open(get_index_path(main_path), 'r', encoding='utf-8') as index_file:
+                entries = [json.loads(line) for line in index_file if line.strip()]
+            indexed_size = entries[-1]["offset"] + entries[-1]["length"] if entries else 0
+            if indexed_size < os.path.getsize(main_path):
+                os.truncate(main_path, indexed_size)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        entries = read_index(main_path)
+        kept = []
+        seen = 0
+        for entry in entries:
+            if entry["lecture"] == lecture_num:
+                seen += 1
+                if seen > copies:
+                    continue
+            kept.append(entry)
+
+        if len(kept) == len(entries):
+            return
+
+        copy_lectures(main_path=main_path, entries=kept)
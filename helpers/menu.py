@@ -1,10 +1,12 @@
 from helpers.input_safety import get_int, get_char
 
 
-def main():
+def main(unfinished_jobs=0):
     """
     Renders the main menu for the user and returns a clean user choice.
 
+    :param int unfinished_jobs: How many background jobs are queued or running
+
     :return int: Menu choice
     """
     print("1. Record now")
@@ -12,9 +14,13 @@ def main():
     print("3. Summarize from transcript")
     print("4. View summaries/transcripts/lecture recordings")
     print("5. Edit classes")
-    print("6. Quit")
+    if unfinished_jobs > 0:
+        print(f"6. Background jobs ({unfinished_jobs} running)")
+    else:
+        print("6. Background jobs")
+    print("7. Quit")
 
-    return get_int(lowest_valid=1, highest_valid=6, prompt="")
+    return get_int(lowest_valid=1, highest_valid=7, prompt="")
 
 
 def choose_class(course_codes, archived_codes=None):
@@ -58,15 +64,41 @@ def choose_class(course_codes, archived_codes=None):
     return course_codes[choice - 1], False
 
 
-def manage_live_recording():
+def choose_recording_mode():
+    """
+    Get user to select how a live recording should be transcribed.
+
+    :return str: The recording mode
+    """
+    print("\nSelect recording mode:")
+    print("1. Stream (transcribe continuously while recording)")
+    print("2. Cuts (transcribe only when you ask)")
+
+    choice = get_int(lowest_valid=1, highest_valid=2, prompt="")
+
+    match choice:
+        case 1:
+            return "stream"
+        case 2:
+            return "cuts"
+
+
+def manage_live_recording(allow_cuts=True):
     """
     Get user to select menu option for live recording.
 
+    :param bool allow_cuts: Weather or not to offer cutting the recording to transcribe it
+
     :return str: User's (single character) choice
     """
-    print("\nc - to transcribe the recording till this point (does not stop recording)")
+    valid_chars = "s"
+    if allow_cuts:
+        print("\nc - to transcribe the recording till this point (does not stop recording)")
+        valid_chars += "c"
+    else:
+        print("\nTranscribing live...")
     print("s - to stop recording")
-    choice = get_char(valid_chars="sc", prompt="")
+    choice = get_char(valid_chars=valid_chars, prompt="")
 
     return choice
 
@@ -117,3 +149,36 @@ def edit_class_options():
         case 4:
             return "restore_from_archive"
 
+
+
+def view_jobs(jobs):
+    """
+    Renders every background job with its status and progress and lets the user pick one to see its output.
+
+    :param List[Job] jobs: The jobs to show
+
+    :return int: The number of the job to see the output of or 0 to go back
+    """
+    if not jobs:
+        print("\nNo background jobs yet")
+        return 0
+
+    print("\nBackground jobs:")
+    for job in jobs:
+        match job.status:
+            case "queued":
+                details = "waiting"
+            case "running":
+                details = job.progress or (job.output[-1] if job.output else "starting")
+            case "finished":
+                details = f"done in {job.get_elapsed():.0f}s"
+            case _:
+                details = job.error
+
+        print(f"{job.id}. [{job.status}] {job.name} - {details}")
+
+    return get_int(
+        lowest_valid=0,
+        highest_valid=jobs[-1].id,
+        prompt="\nNumber of a job to see its output or 0 to go back: "
+    )
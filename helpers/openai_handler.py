@@ -1,50 +1,52 @@
-from openai import OpenAI
+import random
+import asyncio
 from dotenv import dotenv_values
+from helpers.cache import DiskCache, make_cache_key
+from helpers.fancy_prints import print_red
+from helpers.request_pool import request_pool
 
 # Load the .env file into a dictionary
 config = dotenv_values(".env")
 
-# Set api_key for openai
-client = OpenAI(api_key=config["OPENAI_API_KEY"])
+# Model used for every request
+GPT_MODEL = "gpt-4o"
 
+# Past responses are reused when the exact same request is made again
+gpt_cache = DiskCache(
+    directory=".cache/gpt",
+    max_bytes=int(config.get("GPT_CACHE_MAX_MB") or 50) * 1024 * 1024
+)
 
-def ask_gpt(system_prompt, user_prompt):
-    """
-    Sends a request to gpt4-o with custom system and user prompt.
+# Roughly how many characters of English make up one token
+CHARS_PER_TOKEN = 4
 
-    :param str system_prompt: Used to give instructions of the task
-    :param str user_prompt: Used to give context for the task
+# Transcripts longer than this are summarized in parallel chunks then merged
+SINGLE_REQUEST_TOKENS = 16000
 
-    :return str: Response from gpt4-o
-    """
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system",
-                "content": system_prompt
-            },
-            {
-                "role": "user",
-                "content": user_prompt
-            }
-        ]
-    )
+# Size of each chunk when a transcript is split
+CHUNK_TOKENS = 8000
 
-    return completion.choices[0].message.content
+# How much of the transcript is read to come up with a title
+TITLE_TOKENS = 4000
 
+# Tokens a response is expected to use, reserved from the budget until the real count is known
+RESPONSE_TOKENS = 4000
 
-def summary_sheet_gpt(transcript):
-    """
-    Creates summary sheet based on a lecture transcript
+# Seconds a request can take before it's sent again unless OPENAI_TIMEOUT is set in .env
+DEFAULT_REQUEST_TIMEOUT = 180
 
-    :param str transcript: Transcript of a lecture
+# How many times a failed request is sent again unless OPENAI_MAX_RETRIES is set in .env
+DEFAULT_MAX_RETRIES = 6
 
-    :return str: A (.md compatible) summary sheet
-    :return str: A title for the summary sheet
-    """
+# Waits between retries double from the first up to the longest
+FIRST_RETRY_SECONDS = 1
+LONGEST_RETRY_SECONDS = 60
+
+# Statuses that mean the request may work if it's sent again
+RETRY_STATUSES = [408, 409, 429, 500, 502, 503, 504]
 
-    note_template = """
+# Markdown template every summary sheet follows
+NOTE_TEMPLATE = """
     <!-- Add every definition given in the lecture unlimited -->
     ## Definitions 👩🏻‍🏫
 
@@ -188,21 +190,218 @@ def summary_sheet_gpt(transcript):
     A summary of everything covered about or touched upon in the entire lecture in chronological order
     """
 
-    # Gets the summary and title from gpt
-    summary_sheet = ask_gpt(
-        system_prompt=f"You are a student that writes notes from a lecture based on a transcript. "
-                      f"The user will provide you with the transcript. Make sure you only include things from the "
-                      f"transcript in the summary. "
-                      f"Strictly follow this Markdown template to format the note:\n\n{note_template}",
-        user_prompt=transcript
-    )
 
-    sheet_title = ask_gpt(
-        system_prompt=("Your a student that needs to write a brief one or two word title for a summary sheet in "
-                       "snake_case. Make it specific to the topic covered in the sheet. The user will provide you with "
-                       "the summary sheet"),
-        user_prompt=summary_sheet
-    )
+async def ask_gpt(client, system_prompt, user_prompt, regenerate=False):
+    """
+    Sends a request to gpt4-o with custom system and user prompt.
+    Awaiting several of these with asyncio.gather sends the requests at the same time, as many as the
+    request pool allows. Requests that time out or are rate limited are sent again after a growing wait.
+    If the exact same request was made before the cached response is returned instantly.
+
+    :param AsyncOpenAI client: The client to send the request with
+    :param str system_prompt: Used to give instructions of the task
+    :param str user_prompt: Used to give context for the task
+    :param bool regenerate: Weather or not to ignore the cache and get a new response
+
+    :return str: Response from gpt4-o
+    """
+    cache_key = make_cache_key(GPT_MODEL, system_prompt, user_prompt)
+    if not regenerate:
+        cached_response = gpt_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    # Imported here so the menu starts without loading the OpenAI library
+    from openai import APIConnectionError, APIStatusError
+
+    max_retries = int(config.get("OPENAI_MAX_RETRIES") or DEFAULT_MAX_RETRIES)
+    timeout = float(config.get("OPENAI_TIMEOUT") or DEFAULT_REQUEST_TIMEOUT)
+    tokens = estimate_tokens(system_prompt + user_prompt) + RESPONSE_TOKENS
+
+    for attempt in range(max_retries + 1):
+        entry = await request_pool.acquire(tokens=tokens)
+        used_tokens = None
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(
+                model=GPT_MODEL,
+                timeout=timeout,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": system_prompt
+                    },
+                    {
+                        "role": "user",
+                        "content": user_prompt
+                    }
+                ]
+            )
+            request_pool.update_limit(headers=raw_response.headers)
+            completion = raw_response.parse()
+            if completion.usage is not None:
+                used_tokens = completion.usage.total_tokens
+            break
+
+        except (APIConnectionError, APIStatusError) as e:
+            status = getattr(e, "status_code", None)
+            headers = e.response.headers if getattr(e, "response", None) is not None else None
+
+            # Running out of credit or a bad request won't be fixed by waiting
+            if status is not None and status not in RETRY_STATUSES:
+                raise
+            if getattr(e, "code", None) == "insufficient_quota" or attempt == max_retries:
+                raise
+
+            # Full jitter keeps requests that failed together from being retried together
+            wait = random.uniform(0, min(LONGEST_RETRY_SECONDS, FIRST_RETRY_SECONDS * 2 ** attempt))
+            retry_after = get_retry_after(headers=headers)
+            if retry_after is not None:
+                wait = max(wait, retry_after)
+
+            # Every request holds off when the account is rate limited, not just this one
+            if status == 429:
+                request_pool.pause(seconds=wait)
+
+            print_red(f"OpenAI request failed ({status or type(e).__name__}), "
+                      f"retrying in {wait:.1f}s ({attempt + 1}/{max_retries})")
+        finally:
+            request_pool.release(entry=entry, used_tokens=used_tokens)
+
+        await asyncio.sleep(wait)
+
+    response = completion.choices[0].message.content
+    gpt_cache.set(cache_key, response)
+
+    return response
+
+
+def get_retry_after(headers):
+    """
+    Gets how long OpenAI asked for requests to wait before being sent again.
+
+    :param Mapping headers: Headers of the failed response
+
+    :return float: Seconds to wait or None if the response didn't say
+    """
+    if headers is None:
+        return None
+
+    for header, scale in [("retry-after-ms", 1000), ("retry-after", 1)]:
+        try:
+            return float(headers.get(header)) / scale
+        except (TypeError, ValueError):
+            pass
+
+    return None
+
+
+def estimate_tokens(text):
+    """
+    Estimates how many tokens gpt4-o will count for a piece of text.
+
+    :param str text: The text to measure
+
+    :return int: Estimated number of tokens
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_transcript(transcript, max_tokens=CHUNK_TOKENS):
+    """
+    Splits a transcript into chunks that each fit in max_tokens, only cutting between lines or sentences.
+
+    :param str transcript: Transcript of a lecture
+    :param int max_tokens: Most tokens a chunk may have
+
+    :return List[str]: The chunks in order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+
+    # Breaks the transcript into lines and splits any line that is too long on its own at sentence ends
+    pieces = []
+    for line in transcript.splitlines(keepends=True):
+        while len(line) > max_chars:
+            cut = line.rfind(". ", 0, max_chars) + 1 or max_chars
+            pieces.append(line[:cut])
+            line = line[cut:]
+        pieces.append(line)
+
+    # Packs the pieces into as few chunks as possible
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current.strip():
+        chunks.append(current)
+
+    return chunks
+
+
+def transcript_excerpt(transcript, max_tokens=TITLE_TOKENS, parts=4):
+    """
+    Takes evenly spaced pieces of a transcript so a short excerpt still covers the whole lecture.
+
+    :param str transcript: Transcript of a lecture
+    :param int max_tokens: Most tokens the excerpt may have
+    :param int parts: How many pieces the excerpt is made of
+
+    :return str: The excerpt or the whole transcript if it's already short enough
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(transcript) <= max_chars:
+        return transcript
+
+    part_chars = max_chars // parts
+    step = len(transcript) // parts
+
+    return "\n...\n".join(transcript[i * step:i * step + part_chars] for i in range(parts))
+
+
+def summary_sheet_gpt(transcript, regenerate=False):
+    """
+    Creates summary sheet based on a lecture transcript.
+    The sheet and its title are requested at the same time.
+
+    :param str transcript: Transcript of a lecture
+    :param bool regenerate: Weather or not to make a new sheet even if this transcript was summarized before
+
+    :return str: A (.md compatible) summary sheet
+    :return str: A title for the summary sheet
+    """
+    return asyncio.run(summary_sheet_gpt_async(transcript=transcript, regenerate=regenerate))
+
+
+async def summary_sheet_gpt_async(transcript, regenerate=False):
+    """
+    Creates summary sheet and its title based on a lecture transcript with both requests running at once.
+
+    :param str transcript: Transcript of a lecture
+    :param bool regenerate: Weather or not to make a new sheet even if this transcript was summarized before
+
+    :return str: A (.md compatible) summary sheet
+    :return str: A title for the summary sheet
+    """
+
+    # Imported here so the menu starts without loading the OpenAI library
+    from openai import AsyncOpenAI
+
+    # The client is made inside the event loop it's used in since asyncio.run makes a new loop every call
+    # Retries are left to ask_gpt so they go through the request pool
+    async with AsyncOpenAI(api_key=config["OPENAI_API_KEY"], max_retries=0) as client:
+        summary_sheet, sheet_title = await asyncio.gather(
+            summarize_transcript(client=client, transcript=transcript, regenerate=regenerate),
+            ask_gpt(
+                client=client,
+                regenerate=regenerate,
+                system_prompt=("Your a student that needs to write a brief one or two word title for a summary "
+                               "sheet in snake_case. Make it specific to the topic covered in the lecture. The user "
+                               "will provide you with an excerpt of the lecture transcript"),
+                user_prompt=transcript_excerpt(transcript=transcript)
+            )
+        )
 
     # Check if the title response contains multiple lines or is longer than 50 characters
     if '\n' in sheet_title or len(sheet_title) > 50:
@@ -211,3 +410,130 @@ def summary_sheet_gpt(transcript):
 
     return summary_sheet, sheet_title
 
+
+async def summarize_transcript(client, transcript, regenerate=False):
+    """
+    Creates a summary sheet based on a lecture transcript.
+    Transcripts too long for one request are summarized in chunks at the same time and then merged.
+
+    :param AsyncOpenAI client: The client to send the requests with
+    :param str transcript: Transcript of a lecture
+    :param bool regenerate: Weather or not to ignore cached responses
+
+    :return str: A (.md compatible) summary sheet
+    """
+    system_prompt = (f"You are a student that writes notes from a lecture based on a transcript. "
+                     f"The user will provide you with the transcript. Make sure you only include things from the "
+                     f"transcript in the summary. "
+                     f"Strictly follow this Markdown template to format the note:\n\n{NOTE_TEMPLATE}")
+
+    if estimate_tokens(transcript) <= SINGLE_REQUEST_TOKENS:
+        return await ask_gpt(
+            client=client,
+            system_prompt=system_prompt,
+            user_prompt=transcript,
+            regenerate=regenerate
+        )
+
+    chunks = split_transcript(transcript)
+    print(f"Summarizing in {len(chunks)} parallel parts")
+
+    # Map: every part of the lecture is summarized at the same time
+    partial_sheets = await asyncio.gather(*[
+        ask_gpt(
+            client=client,
+            regenerate=regenerate,
+            system_prompt=(f"You are a student that writes notes from part of a lecture based on a "
+                           f"transcript. The user will provide you with one part of the transcript. Make "
+                           f"sure you only include things from the transcript in the notes and keep every "
+                           f"detail as another student will merge your notes with the notes from the other "
+                           f"parts. Strictly follow this Markdown template to format the note:"
+                           f"\n\n{NOTE_TEMPLATE}"),
+            user_prompt=chunk
+        )
+        for chunk in chunks
+    ])
+
+    # Reduce: the partial notes are merged into one sheet section by section
+    return await merge_partial_sheets(client=client, partial_sheets=partial_sheets, regenerate=regenerate)
+
+
+def group_partial_sheets(partial_sheets, max_tokens=SINGLE_REQUEST_TOKENS):
+    """
+    Groups consecutive partial sheets so every group can be merged in one request.
+    Groups have at least two sheets unless only one sheet is left over at the end.
+
+    :param List[str] partial_sheets: The sheets in lecture order
+    :param int max_tokens: Most tokens the sheets of a group may have together
+
+    :return List[List[str]]: The groups in lecture order
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for sheet in partial_sheets:
+        sheet_tokens = estimate_tokens(sheet)
+        if len(current) >= 2 and current_tokens + sheet_tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(sheet)
+        current_tokens += sheet_tokens
+
+    if current:
+        groups.append(current)
+
+    return groups
+
+
+async def merge_partial_sheets(client, partial_sheets, regenerate=False):
+    """
+    Merges notes written from consecutive parts of a lecture into one sheet.
+    When the notes don't fit in one request they're merged in groups at the same time, then the merged
+    groups are merged again until one sheet is left, so even a whole course's transcript can be summarized.
+
+    :param AsyncOpenAI client: The client to send the requests with
+    :param List[str] partial_sheets: The notes of every part in lecture order
+    :param bool regenerate: Weather or not to ignore cached responses
+
+    :return str: A (.md compatible) summary sheet
+    """
+    while len(partial_sheets) > 1:
+        groups = group_partial_sheets(partial_sheets=partial_sheets)
+        final = len(groups) == 1
+        if not final:
+            print(f"Merging {len(partial_sheets)} parts in {len(groups)} groups")
+
+        # A sheet left over on its own is carried into the next round as it is
+        partial_sheets = await asyncio.gather(*[
+            pass_through(group[0]) if len(group) == 1 else ask_gpt(
+                client=client,
+                regenerate=regenerate,
+                system_prompt=(f"You are a student that merges notes written from consecutive parts of the same "
+                               f"lecture into a single note. The user will provide you with the notes in lecture "
+                               f"order. Combine each section of the notes, remove duplicates and keep every detail. "
+                               f"Make sure you only include things from the notes. The detailed summary must cover "
+                               f"{'the entire lecture' if final else 'every part given'} in chronological order. "
+                               + ("" if final else "Another student will merge your notes with notes from the "
+                                                   "other parts so don't leave anything out. ")
+                               + f"Strictly follow this Markdown template to format the note:\n\n{NOTE_TEMPLATE}"),
+                user_prompt="\n\n".join(
+                    f"<!-- Notes from part {i + 1} of {len(group)} -->\n{sheet}"
+                    for i, sheet in enumerate(group)
+                )
+            )
+            for group in groups
+        ])
+
+    return partial_sheets[0]
+
+
+async def pass_through(sheet):
+    """
+    Returns a sheet unchanged so it can be gathered alongside sheets that are being merged.
+
+    :param str sheet: The sheet
+
+    :return str: The same sheet
+    """
+    return sheet
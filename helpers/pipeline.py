@@ -0,0 +1,510 @@
+import os
+import json
+import threading
+from helpers.fancy_prints import print_green, print_red
+from helpers.file_handler import (
+    get_files_in_directory,
+    merge_cut_audio_files,
+    repair_wav_header,
+    txt_file_to_str
+)
+from helpers.catalog import get_cut_paths, update_files
+from helpers.main_index import count_lecture_copies, restore_lecture_copies, flush_appends, read_lecture
+from helpers.file_output import write_atomic
+from helpers.search_index import index_file, remove_from_index
+from helpers.timestamps import remove_timestamps
+from helpers.scheduler import set_progress
+
+# Lectures that haven't made it through every stage are saved here so they can be resumed
+PIPELINES_PATH = "notes/pipelines.json"
+
+# Stages every lecture goes through in order
+STAGES = ["record", "transcribe", "merge", "compress", "summarize"]
+
+# Folders with text files stages write to, put back to how they were at the last checkpoint before a stage is redone
+CHECKPOINT_MEDIA_TYPES = ["timestamped", "transcripts", "summaries"]
+
+# Only one thread changes the saved lectures at a time
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline_key(course_code, lecture_num):
+    """
+    Gets the key a lecture is saved under.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return str: The key such as CLASS101/3
+    """
+    return f"{course_code}/{lecture_num}"
+
+
+def load_pipelines():
+    """
+    Reads every unfinished lecture from disk.
+
+    :return dict: The state of every unfinished lecture by key
+    """
+    try:
+        with open(PIPELINES_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_pipelines(pipelines):
+    """
+    Writes every unfinished lecture to disk without ever leaving a half written file.
+
+    :param dict pipelines: The state of every unfinished lecture by key
+
+    :return: None
+    """
+    write_atomic(PIPELINES_PATH, json.dumps(pipelines, indent=2))
+
+
+def get_pipeline(course_code, lecture_num):
+    """
+    Gets the saved state of a lecture.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return dict: The lecture's state or None if the lecture isn't being processed
+    """
+    return load_pipelines().get(get_pipeline_key(course_code=course_code, lecture_num=lecture_num))
+
+
+def update_pipeline(course_code, lecture_num, **changes):
+    """
+    Saves changes to the state of a lecture.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param changes: The fields of the state to change
+
+    :return dict: The lecture's new state or None if the lecture isn't being processed
+    """
+    key = get_pipeline_key(course_code=course_code, lecture_num=lecture_num)
+    with _pipelines_lock:
+        pipelines = load_pipelines()
+        if key not in pipelines:
+            return None
+
+        pipelines[key].update(changes)
+        save_pipelines(pipelines)
+
+        return pipelines[key]
+
+
+def get_lecture_text_files(course_code, lecture_num):
+    """
+    Finds the transcripts and summary sheets of a single lecture, not including the main files.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return List[str]: Paths of the lecture's files
+    """
+    lecture_files = []
+    for media_type in CHECKPOINT_MEDIA_TYPES:
+        directory = f"notes/{course_code}/{media_type}"
+        if not os.path.isdir(directory):
+            continue
+
+        for filename in get_files_in_directory(directory):
+            if filename == f"{lecture_num}.txt" or (filename.startswith(f"{lecture_num}-") and filename.endswith(".md")):
+                lecture_files.append(f"{directory}/{filename}")
+
+    return lecture_files
+
+
+def get_main_paths(course_code):
+    """
+    Gets the main files lectures are appended to.
+
+    :param str course_code: Code of the lecture class
+
+    :return List[str]: Paths of the main files
+    """
+    return [
+        f"notes/{course_code}/timestamped/main.txt",
+        f"notes/{course_code}/transcripts/main.txt",
+        f"notes/{course_code}/summaries/main.md"
+    ]
+
+
+def take_checkpoint(course_code, lecture_num):
+    """
+    Records how much of a lecture's text has been written so a stage that stops partway can be undone.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return dict: The size of every file of the lecture and how many copies of it are in each main file
+    """
+    return {
+        "files": {
+            path: os.path.getsize(path) for path in get_lecture_text_files(course_code=course_code, lecture_num=lecture_num)
+        },
+        "main": {
+            main_path: count_lecture_copies(main_path=main_path, lecture_num=lecture_num)
+            for main_path in get_main_paths(course_code)
+        }
+    }
+
+
+def restore_checkpoint(course_code, lecture_num, checkpoint):
+    """
+    Undoes everything a stage wrote since the checkpoint so the stage can be run again without repeating text.
+    Only the lecture's own files and its copies in the main files are changed.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param dict checkpoint: The checkpoint taken before the stage started
+
+    :return: None
+    """
+    removed = []
+    for path in get_lecture_text_files(course_code=course_code, lecture_num=lecture_num):
+        if path not in checkpoint["files"]:
+            os.remove(path)
+            removed.append(path)
+        elif os.path.getsize(path) > checkpoint["files"][path]:
+            os.truncate(path, checkpoint["files"][path])
+            index_file(file_path=path)
+    update_files(removed=removed)
+    remove_from_index(file_paths=removed)
+
+    for main_path, copies in checkpoint["main"].items():
+        restore_lecture_copies(main_path=main_path, lecture_num=lecture_num, copies=copies)
+
+
+def start_pipeline(course_code, lecture_num, stage="record", model_name="medium.en", parallel=False,
+                   skip_silence=True, summarize=True):
+    """
+    Saves a new lecture so it can be resumed from its last finished stage if the program stops.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param str stage: The first stage to run, transcribe when the lecture's .wav is already in the lectures folder
+    :param str model_name: Name of the whisper model to use
+    :param bool parallel: Weather or not to split long audio into chunks and transcribe them at the same time
+    :param bool skip_silence: Weather or not to leave long silences out of the audio sent to Whisper
+    :param bool summarize: Weather or not to create a summary sheet
+
+    :return: None
+    """
+    state = {
+        "course": course_code,
+        "lecture": lecture_num,
+        "stage": stage,
+        "model_name": model_name,
+        "parallel": parallel,
+        "skip_silence": skip_silence,
+        "summarize": summarize,
+        "cuts_transcribed": 0,
+        "live_seconds": 0,
+        "checkpoint": take_checkpoint(course_code=course_code, lecture_num=lecture_num)
+    }
+
+    with _pipelines_lock:
+        pipelines = load_pipelines()
+        pipelines[get_pipeline_key(course_code=course_code, lecture_num=lecture_num)] = state
+        save_pipelines(pipelines)
+
+
+def mark_cuts_transcribed(course_code, lecture_num, cut_count):
+    """
+    Records that the first cuts of a lecture have been transcribed so they aren't transcribed again.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param int cut_count: How many cuts have been transcribed
+
+    :return: None
+    """
+    update_pipeline(
+        course_code=course_code,
+        lecture_num=lecture_num,
+        cuts_transcribed=cut_count,
+        checkpoint=take_checkpoint(course_code=course_code, lecture_num=lecture_num)
+    )
+
+
+def mark_live_transcribed(course_code, lecture_num, seconds):
+    """
+    Records how much of a streamed recording the live transcriber has written so if the program stops
+    only the audio after it is transcribed again.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param float seconds: Everything said before this many seconds into the recording is in the transcript
+
+    :return: None
+    """
+    update_pipeline(
+        course_code=course_code,
+        lecture_num=lecture_num,
+        live_seconds=seconds,
+        checkpoint=take_checkpoint(course_code=course_code, lecture_num=lecture_num)
+    )
+
+
+def complete_stage(course_code, lecture_num, stage):
+    """
+    Records that a stage of a lecture is done, forgetting the lecture once every stage is.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param str stage: The stage that's done
+
+    :return: None
+    """
+    key = get_pipeline_key(course_code=course_code, lecture_num=lecture_num)
+    checkpoint = take_checkpoint(course_code=course_code, lecture_num=lecture_num)
+
+    with _pipelines_lock:
+        pipelines = load_pipelines()
+        if key not in pipelines or pipelines[key]["stage"] != stage:
+            return
+
+        next_index = STAGES.index(stage) + 1
+        if next_index == len(STAGES):
+            del pipelines[key]
+        else:
+            pipelines[key]["stage"] = STAGES[next_index]
+            pipelines[key]["checkpoint"] = checkpoint
+        save_pipelines(pipelines)
+
+
+def record_stage(state):
+    """
+    Finishes a recording that was interrupted. The recording can't be continued
+    so the cuts saved so far are fixed up to be transcribed.
+
+    :param dict state: The lecture's state
+
+    :return: None
+    """
+    for cut_path in get_cut_paths(course_code=state["course"], lecture_num=state["lecture"]):
+        if os.path.exists(cut_path) and repair_wav_header(cut_path):
+            print(f"Recovered {cut_path}")
+
+
+def transcribe_cuts(course_code, lecture_num, cut_count):
+    """
+    Transcribes the cuts of a lecture that haven't been transcribed yet, up to cut_count.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param int cut_count: How many cuts should be transcribed once this is done
+
+    :return: None
+    """
+    from helpers.process_audio import transcribe_to_file
+
+    state = get_pipeline(course_code=course_code, lecture_num=lecture_num)
+    for cut_num in range(state["cuts_transcribed"], cut_count):
+        set_progress(f"transcribing cut {cut_num + 1}")
+        transcribe_to_file(
+            course_code=course_code,
+            lecture_num=lecture_num,
+            finalize_transcription=False,
+            cut_path_n=cut_num,
+            parallel=state["parallel"],
+            model_name=state["model_name"],
+            skip_silence=state["skip_silence"],
+
+            # A streamed recording is a single cut whose start may already have been transcribed live
+            start_seconds=state.get("live_seconds", 0) if cut_num == 0 else 0
+        )
+        mark_cuts_transcribed(course_code=course_code, lecture_num=lecture_num, cut_count=cut_num + 1)
+
+
+def transcribe_stage(state):
+    """
+    Transcribes every cut of a lecture that hasn't been transcribed yet then creates the other transcript files.
+
+    :param dict state: The lecture's state
+
+    :return: None
+    """
+    from helpers.process_audio import finish_transcription_to_file
+
+    course_code, lecture_num = state["course"], state["lecture"]
+    cut_paths = [
+        cut_path for cut_path in get_cut_paths(course_code=course_code, lecture_num=lecture_num)
+        if os.path.exists(cut_path)
+    ]
+    if state["cuts_transcribed"] == 0 and not cut_paths:
+        raise Exception(f"The recording of {course_code} lecture {lecture_num} is missing")
+
+    transcribe_cuts(course_code=course_code, lecture_num=lecture_num, cut_count=len(cut_paths))
+    finish_transcription_to_file(course_code=course_code, lecture_num=lecture_num)
+
+
+def merge_stage(state):
+    """
+    Merges the cuts of a lecture into one .wav file. If the merged file was already saved
+    only the cuts that weren't deleted yet are deleted.
+
+    :param dict state: The lecture's state
+
+    :return: None
+    """
+    course_code, lecture_num = state["course"], state["lecture"]
+    cut_paths = [
+        cut_path for cut_path in get_cut_paths(course_code=course_code, lecture_num=lecture_num)
+        if os.path.exists(cut_path)
+    ]
+    if not cut_paths:
+        return
+
+    if os.path.exists(f"notes/{course_code}/lectures/{lecture_num}.wav"):
+        for cut_path in cut_paths:
+            os.remove(cut_path)
+        update_files(removed=cut_paths)
+    else:
+        merge_cut_audio_files(course_code=course_code, lecture_num=lecture_num)
+
+
+def compress_stage(state):
+    """
+    Queues a lecture's .wav file to be compressed in the background unless it's already compressed.
+
+    :param dict state: The lecture's state
+
+    :return: None
+    """
+    from helpers.compression_queue import compression_queue
+
+    wav_path = f"notes/{state['course']}/lectures/{state['lecture']}.wav"
+    if os.path.exists(wav_path):
+        compression_queue.submit(wav_file_path=wav_path)
+
+
+def summarize_stage(state):
+    """
+    Creates a summary sheet for a lecture. Responses are cached so a summary that stopped partway
+    doesn't ask GPT again for the parts it already got. If the lecture's transcript was deleted
+    the lecture is read from the class' main transcript instead.
+
+    :param dict state: The lecture's state
+
+    :return: None
+    """
+    if not state["summarize"]:
+        return
+
+    from helpers.process_audio import summarize_lecture
+
+    course_code, lecture_num = state["course"], state["lecture"]
+    transcript = txt_file_to_str(file_path=f"notes/{course_code}/transcripts/{lecture_num}.txt")
+
+    # The lecture's own transcript was deleted so its copy is read straight out of the main transcript
+    if transcript is None:
+        transcript = read_lecture(main_path=f"notes/{course_code}/transcripts/main.txt", lecture_num=lecture_num)
+    if transcript is None:
+        raise Exception(f"The transcript of {course_code} lecture {lecture_num} is missing")
+
+    summarize_lecture(
+        transcript=remove_timestamps(transcript=transcript),
+        course_code=course_code,
+        lecture_num=lecture_num
+    )
+
+
+# What each stage does
+STAGE_FUNCTIONS = {
+    "record": record_stage,
+    "transcribe": transcribe_stage,
+    "merge": merge_stage,
+    "compress": compress_stage,
+    "summarize": summarize_stage
+}
+
+
+def run_stage(course_code, lecture_num, stage):
+    """
+    Runs one stage of a lecture if it's the lecture's next stage, first undoing anything
+    a previous attempt at the stage wrote.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param str stage: The stage to run
+
+    :return bool: Weather or not the stage was run
+    """
+    state = get_pipeline(course_code=course_code, lecture_num=lecture_num)
+    if state is None or state["stage"] != stage:
+        return False
+
+    set_progress(f"{stage} ({STAGES.index(stage) + 1}/{len(STAGES)})")
+    restore_checkpoint(course_code=course_code, lecture_num=lecture_num, checkpoint=state["checkpoint"])
+    STAGE_FUNCTIONS[stage](state)
+
+    # Everything the stage added to the main files has to be written before the stage counts as done
+    flush_appends()
+    complete_stage(course_code=course_code, lecture_num=lecture_num, stage=stage)
+
+    return True
+
+
+def run_lecture(course_code, lecture_num):
+    """
+    Runs every stage of a lecture that isn't done yet.
+
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return: None
+    """
+    state = get_pipeline(course_code=course_code, lecture_num=lecture_num)
+    if state is None:
+        return
+
+    for stage in STAGES[STAGES.index(state["stage"]):]:
+        run_stage(course_code=course_code, lecture_num=lecture_num, stage=stage)
+
+
+def get_unfinished_lectures(course_code=None):
+    """
+    Gets every lecture that stopped before all of its stages were done.
+
+    :param str course_code: Only get lectures of this course if given
+
+    :return List[dict]: The state of every unfinished lecture in course and lecture order
+    """
+    states = [
+        state for state in load_pipelines().values()
+        if course_code is None or state["course"] == course_code
+    ]
+
+    return sorted(states, key=lambda state: (state["course"], state["lecture"]))
+
+
+def resume_lectures(course_code=None, lecture_num=None):
+    """
+    Picks every unfinished lecture up at the stage it stopped at. A lecture that fails again
+    stays saved and the rest are still resumed.
+
+    :param str course_code: Only resume lectures of this course if given
+    :param Union[int, float] lecture_num: Only resume this lecture if given
+
+    :return int: How many lectures were finished
+    """
+    finished = 0
+    for state in get_unfinished_lectures(course_code=course_code):
+        if lecture_num is not None and state["lecture"] != lecture_num:
+            continue
+
+        print_green(f"\nResuming {state['course']} lecture {state['lecture']} from {state['stage']}...")
+        try:
+            run_lecture(course_code=state["course"], lecture_num=state["lecture"])
+            finished += 1
+        except Exception as e:
+            print_red(f"{state['course']} lecture {state['lecture']} stopped again: {e}")
+
+    return finished
@@ -0,0 +1,118 @@
+import os
+import shutil
+import platform
+import subprocess
+from helpers.file_handler import ARCHIVE_PROFILES
+
+# Where clips are saved when ffplay isn't installed and the clip is opened in the default player instead
+CLIPS_DIRECTORY = ".cache/clips"
+
+
+def find_lecture_audio(course_directory, lecture_num):
+    """
+    Finds a lecture's recording in a class' lectures folder, preferring the archived copy.
+
+    :param str course_directory: Path to the class such as notes/CLASS101
+    :param Union[int, float] lecture_num: The nth lecture
+
+    :return str: Path to the recording or None if the lecture has no recording
+    """
+    lectures_directory = f"{course_directory}/lectures"
+    extensions = [extension for extension, _ in ARCHIVE_PROFILES.values()] + [".wav"]
+
+    for extension in extensions:
+        audio_path = f"{lectures_directory}/{lecture_num}{extension}"
+        if os.path.exists(audio_path):
+            return audio_path
+
+    return None
+
+
+def seek_command(audio_path, start, duration):
+    """
+    Builds the ffmpeg input arguments that seek straight to a time in a recording.
+    Putting -ss before -i makes ffmpeg jump there instead of decoding everything before it.
+
+    :param str audio_path: Path to the recording
+    :param float start: Seconds from the start of the recording
+    :param float duration: How many seconds to play
+
+    :return List[str]: The input arguments
+    """
+    return ["-ss", f"{max(0.0, start):.3f}", "-t", f"{duration:.3f}", "-i", audio_path]
+
+
+def extract_segment(audio_path, start, duration, output_path):
+    """
+    Saves part of a recording to its own file without decoding the rest of the recording.
+
+    :param str audio_path: Path to the recording
+    :param float start: Seconds from the start of the recording
+    :param float duration: How many seconds to keep
+    :param str output_path: Where the clip is saved
+
+    :return str: Path to the clip
+
+    :raises: Exception if ffmpeg fails
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y"]
+        + seek_command(audio_path=audio_path, start=start, duration=duration)
+        + ["-vn", output_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Error extracting clip from {audio_path}: {result.stderr.strip()}")
+
+    return output_path
+
+
+def open_file(file_path):
+    """
+    Opens a file with the default app on any os.
+
+    :param str file_path: Path to the file
+
+    :return: None
+    """
+    system = platform.system()
+
+    if system == "Windows":
+        os.startfile(file_path)
+    elif system == "Darwin":
+        subprocess.run(["open", file_path], check=True)
+    elif system == "Linux":
+        subprocess.run(["xdg-open", file_path], check=True)
+    else:
+        print(f"Unsupported operating system: {system}")
+
+
+def play_segment(audio_path, start, duration=30, lead_in=2):
+    """
+    Plays part of a recording starting a little before the given time.
+    Uses ffplay when it's installed, otherwise saves the part as a clip and opens it in the default player.
+
+    :param str audio_path: Path to the recording
+    :param float start: Seconds from the start of the recording
+    :param float duration: How many seconds to play
+    :param float lead_in: Seconds played before start so the sentence isn't cut off
+
+    :return: None
+    """
+    start = max(0.0, start - lead_in)
+    duration += lead_in
+
+    if shutil.which("ffplay") is not None:
+        subprocess.run(
+            ["ffplay", "-nodisp", "-autoexit", "-hide_banner", "-loglevel", "error"]
+            + seek_command(audio_path=audio_path, start=start, duration=duration)
+        )
+        return
+
+    os.makedirs(CLIPS_DIRECTORY, exist_ok=True)
+    base_name, extension = os.path.splitext(os.path.basename(audio_path))
+    clip_path = f"{CLIPS_DIRECTORY}/{base_name}-{int(start)}{extension}"
+    extract_segment(audio_path=audio_path, start=start, duration=duration, output_path=clip_path)
+    open_file(clip_path)
@@ -1,28 +1,112 @@
 import os
+import atexit
 import subprocess
+import threading
 import time
 import platform
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from helpers.fancy_prints import print_green
 from helpers.file_handler import (
-    write_to_file,
+    save_to_file,
     move_and_rename_file,
     txt_file_to_str,
     get_cut_path,
-    add_time_to_timestamps,
-    get_transcript_end_time
+    get_wav_duration,
+    split_wav_at_silence,
+    get_audio_fingerprint,
+    get_file_fingerprint,
+    stream_wav_16khz,
+    trim_wav_start
 )
-from helpers.input_safety import remove_timestamps, snake_to_title
+from helpers.input_safety import snake_to_title
+from helpers.timestamps import add_time_to_timestamps, remove_timestamps
 from helpers.openai_handler import summary_sheet_gpt
+from helpers.whisper_server import WhisperServer
+from helpers.vad import remove_silence, remap_timestamps
+from helpers.main_index import append_lecture
+from helpers.cache import DiskCache, make_cache_key
+from dotenv import dotenv_values
+
+# Load the .env file into a dictionary
+config = dotenv_values(".env")
+
+# Flags every transcription is made with, part of the cache key since they change the transcript
+WHISPER_FLAGS = "-np"
+
+# Past transcripts are reused when the same audio is transcribed with the same model again
+transcript_cache = DiskCache(
+    directory=".cache/transcripts",
+    max_bytes=int(config.get("TRANSCRIPT_CACHE_MAX_MB") or 200) * 1024 * 1024
+)
+
+# Most whisper/main processes transcribing chunks at once unless WHISPER_MAX_WORKERS is set in .env,
+# every process loads its own copy of the model
+DEFAULT_WHISPER_MAX_WORKERS = 4
+
+# Memory a whisper/main process uses compared to the size of its model file
+WHISPER_MEMORY_PER_MODEL_BYTE = 1.5
 
+# One whisper server per model shared by every transcription this session
+_whisper_servers = {}
+_whisper_servers_lock = threading.Lock()
 
-def transcribe_audio(wav_path, model_name="medium.en", timed=True):
+
+def get_whisper_server(model_name="medium.en"):
+    """
+    Returns the whisper server for this session, starting it the first time it's needed.
+    The model is loaded in the background so it can be warmed up before any audio is ready.
+
+    :param str model_name: Name of the model to use
+
+    :return WhisperServer: The running server or None if the server binary isn't installed
+    """
+    with _whisper_servers_lock:
+        if model_name not in _whisper_servers:
+            threads = config.get("WHISPER_THREADS")
+            server = WhisperServer(model_name=model_name, threads=int(threads) if threads else None)
+            if server.is_available():
+                server.start()
+                atexit.register(server.stop)
+            else:
+                server = None
+            _whisper_servers[model_name] = server
+
+        return _whisper_servers[model_name]
+
+
+def get_transcript_cache_key(wav_path, model_name, media_path=None):
+    """
+    Creates the cache key for a transcript from the audio, the model and the whisper flags.
+
+    :param Union[str, BinaryIO] wav_path: Path to the WAV file or an open WAV file
+    :param str model_name: Name of the model to use
+    :param str media_path: Path to an audio or video file that is decoded straight into the transcriber,
+    the whole file is hashed instead of wav_path
+
+    :return str: The cache key
+    """
+    if media_path is not None:
+        return make_cache_key(get_file_fingerprint(file_path=media_path), model_name, WHISPER_FLAGS)
+
+    return make_cache_key(get_audio_fingerprint(wav_path=wav_path), model_name, WHISPER_FLAGS)
+
+
+def transcribe_audio(wav_path=None, model_name="medium.en", timed=True, threads=None, use_cache=True, media_path=None):
     """
     Transcribes an audio file (.wav) using a specified model and returns the processed string.
+    Uses the session's whisper server when it's installed so the model is only loaded once,
+    otherwise runs whisper/main on the file.
+    Audio that was transcribed before with the same model is read from the cache instead.
 
-    :param str wav_path: Path to the WAV file
+    :param str wav_path: Path to the WAV file, not needed if media_path is given
     :param str model_name: Name of the model to use
     :param str timed: Weather or not to display the time it took to transcribe a file
+    :param int threads: Runs its own whisper/main with this many threads instead of using the shared server
+    :param bool use_cache: Weather or not to reuse and store transcripts in the cache
+    :param str media_path: Path to any audio or video file to decode straight into the transcriber instead of
+    wav_path, the audio is streamed in blocks so it's never all held in memory
 
     :return str: The transcript of the audio
 
@@ -31,16 +115,19 @@ def transcribe_audio(wav_path, model_name="medium.en", timed=True):
     if timed:
         start_time = time.time()
 
+    # whisper/main reads the audio from stdin when given -
+    input_path = wav_path if media_path is None else "-"
+
      # Detect the operating system
     os_name = platform.system()
 
     # Update the commands for different the OS systems
     if os_name == "Windows":
         model = f"whisper\\models\\ggml-{model_name}.bin"
-        full_command = f"whisper\\main.exe -m {model} -f {wav_path} -np"
+        full_command = f"whisper\\main.exe -m {model} -f {input_path} {WHISPER_FLAGS}"
     elif os_name == "Linux" or os_name == "Darwin":
         model = f"whisper/models/ggml-{model_name}.bin"
-        full_command = f"whisper/main -m {model} -f {wav_path} -np"
+        full_command = f"whisper/main -m {model} -f {input_path} {WHISPER_FLAGS}"
 
     # Check if the whisper model exists
     if not os.path.exists(model):
@@ -48,22 +135,77 @@ def transcribe_audio(wav_path, model_name="medium.en", timed=True):
             f"Model file not found: {model} \n\nDownload a model with this command:\n\n> bash ./models/download-ggml-model.sh {model_name}\n\n")
 
     # Check if the wav file exists
-    if not os.path.exists(wav_path):
+    if media_path is None and not os.path.exists(wav_path):
         raise FileNotFoundError(f"WAV file not found: {wav_path}")
 
-    # Execute the command
-    process = subprocess.Popen(full_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if use_cache:
+        cache_key = get_transcript_cache_key(wav_path=wav_path, model_name=model_name, media_path=media_path)
+        cached_transcript = transcript_cache.get(cache_key)
+        if cached_transcript is not None:
+            print("Reused a previous transcription of this audio")
+            return cached_transcript
+
+    # Sets how many CPU threads whisper/main uses
+    if threads is not None:
+        full_command += f" -t {threads}"
+
+    server = get_whisper_server(model_name=model_name) if threads is None else None
+    if server is not None:
+
+        # The model is already loaded so only the audio is processed
+        audio_stream = stream_wav_16khz(file_path=media_path) if media_path is not None else None
+        decoded_str = server.transcribe(wav_path=wav_path, audio_stream=audio_stream).strip()
+    elif media_path is not None:
+        _, blocks = stream_wav_16khz(file_path=media_path)
+
+        # Execute the command
+        process = subprocess.Popen(
+            full_command,
+            shell=True,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+        # The decoded audio is fed to whisper/main a block at a time while its output is read
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            feeding = executor.submit(feed_blocks, blocks=blocks, stream=process.stdin)
+            reading_error = executor.submit(process.stderr.read)
+            output = process.stdout.read()
+            error = reading_error.result()
+            process.wait()
+
+            # Raises ValueError if ffmpeg couldn't decode the file
+            feeding.result()
+
+        if error:
+            raise Exception(f"Error processing audio: {error.decode('utf-8')}")
+
+        decoded_str = output.decode('utf-8').strip()
+    else:
+
+        # Execute the command
+        process = subprocess.Popen(
+            full_command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+        # Get the output and error (if any)
+        output, error = process.communicate()
 
-    # Get the output and error (if any)
-    output, error = process.communicate()
+        if error:
+            raise Exception(f"Error processing audio: {error.decode('utf-8')}")
 
-    if error:
-        raise Exception(f"Error processing audio: {error.decode('utf-8')}")
+        decoded_str = output.decode('utf-8').strip()
 
     # Process and return the output string
-    decoded_str = output.decode('utf-8').strip()
     processed_str = decoded_str.replace('[BLANK_AUDIO]', '').strip()
 
+    if use_cache:
+        transcript_cache.set(cache_key, processed_str)
+
     if timed:
         end_time = time.time()
         elapsed_time = end_time - start_time
@@ -79,7 +221,190 @@ def transcribe_audio(wav_path, model_name="medium.en", timed=True):
     return processed_str
 
 
-def transcribe_to_file(course_code, lecture_num, finalize_transcription=True, cut_path_n=0):
+def feed_blocks(blocks, stream):
+    """
+    Writes blocks of audio to whisper/main's stdin then closes it so whisper knows the audio has ended.
+    Runs on its own thread so whisper's output can be read at the same time.
+
+    :param Iterator[bytes] blocks: The audio in blocks
+    :param BinaryIO stream: whisper/main's stdin
+
+    :return: None
+    """
+    try:
+        for block in blocks:
+            stream.write(block)
+    except BrokenPipeError:
+
+        # whisper/main exited early, its error is reported by the caller
+        pass
+    finally:
+        blocks.close()
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+
+def transcribe_media(file_path, model_name="medium.en"):
+    """
+    Transcribes any audio or video file by decoding it straight into the transcriber without writing a .wav file.
+
+    :param str file_path: Path to the audio or video file
+    :param str model_name: Name of the model to use
+
+    :return str: The transcript of the audio
+    """
+    return transcribe_audio(model_name=model_name, media_path=file_path)
+
+
+def get_available_memory():
+    """
+    Gets how much memory is free for new processes.
+
+    :return int: Free memory in bytes, half of all memory if the free amount can't be read, or None if neither can
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        pass
+
+    # macOS only reports the total
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def get_parallel_workers(model_name, threads_per_worker):
+    """
+    Works out how many whisper/main processes can transcribe at once without running out of CPU or memory.
+
+    :param str model_name: Name of the model every process loads
+    :param int threads_per_worker: CPU threads each whisper/main uses
+
+    :return int: How many processes to run
+    """
+    workers = min(
+        max(1, (os.cpu_count() or 1) // threads_per_worker),
+        int(config.get("WHISPER_MAX_WORKERS") or DEFAULT_WHISPER_MAX_WORKERS)
+    )
+
+    # Every process holds a whole copy of the model
+    model_path = os.path.join("whisper", "models", f"ggml-{model_name}.bin")
+    available_memory = get_available_memory()
+    if available_memory is not None and os.path.exists(model_path):
+        worker_memory = os.path.getsize(model_path) * WHISPER_MEMORY_PER_MODEL_BYTE
+        workers = min(workers, int(available_memory // worker_memory))
+
+    return max(1, workers)
+
+
+def transcribe_audio_parallel(wav_path, model_name="medium.en", min_chunk_seconds=120, threads_per_worker=2):
+    """
+    Transcribes a long audio file (.wav) by splitting it at silences and transcribing the chunks at the same time.
+    Uses as many whisper/main processes as the CPU and memory can run then stitches the chunks back together in order.
+    When the session's whisper server is running the file is sent to it instead since it already has the model
+    loaded and is started with every CPU thread (or WHISPER_THREADS from .env).
+
+    :param str wav_path: Path to the WAV file
+    :param str model_name: Name of the model to use
+    :param float min_chunk_seconds: Shortest chunk worth starting its own whisper/main for
+    :param int threads_per_worker: CPU threads each whisper/main uses
+
+    :return str: The transcript of the audio with timestamps from the start of the whole file
+    """
+    start_time = time.time()
+
+    if get_whisper_server(model_name=model_name) is not None:
+        return transcribe_audio(wav_path=wav_path, model_name=model_name)
+
+    with wave.open(wav_path, 'rb') as wav_file:
+        duration = wav_file.getnframes() / wav_file.getframerate()
+
+    # One chunk per worker the CPU and memory can run but never chunks too short to be worth it
+    max_workers = get_parallel_workers(model_name=model_name, threads_per_worker=threads_per_worker)
+    chunk_count = max(1, min(max_workers, int(duration // min_chunk_seconds)))
+
+    if chunk_count == 1:
+        return transcribe_audio(wav_path=wav_path, model_name=model_name)
+
+    # The whole file is cached rather than its chunks
+    cache_key = get_transcript_cache_key(wav_path=wav_path, model_name=model_name)
+    cached_transcript = transcript_cache.get(cache_key)
+    if cached_transcript is not None:
+        print("Reused a previous transcription of this audio")
+        return cached_transcript
+
+    print(f"Transcribing in {chunk_count} parallel chunks")
+    chunks = split_wav_at_silence(wav_path=wav_path, chunk_count=chunk_count)
+
+    def transcribe_chunk(chunk):
+        """
+        Transcribes one chunk and shifts its timestamps to where the chunk starts in the whole file.
+
+        :param Tuple[str, float] chunk: Path of the chunk and its start time in seconds
+
+        :return str: The transcript of the chunk
+        """
+        chunk_path, chunk_start = chunk
+        try:
+            transcript = transcribe_audio(
+                wav_path=chunk_path,
+                model_name=model_name,
+                timed=False,
+                threads=threads_per_worker,
+                use_cache=False
+            )
+        finally:
+            os.remove(chunk_path)
+
+        return add_time_to_timestamps(timestamped_transcript=transcript, time_to_add=chunk_start)
+
+    # Threads are enough here since the work is done by the whisper/main processes
+    with ThreadPoolExecutor(max_workers=chunk_count) as executor:
+        transcripts = list(executor.map(transcribe_chunk, chunks))
+
+    elapsed_time = time.time() - start_time
+    if elapsed_time >= 60:
+        print(f"Transcribed in {elapsed_time // 60} minutes and {elapsed_time % 60:.2f} seconds")
+    else:
+        print(f"Transcribed in {elapsed_time:.2f} seconds")
+
+    processed_str = "\n".join(transcript for transcript in transcripts if transcript)
+    transcript_cache.set(cache_key, processed_str)
+
+    return processed_str
+
+
+def transcribe_speech(wav_path, model_name="medium.en", parallel=False):
+    """
+    Transcribes only the parts of a .wav file with speech in them so long silences such as breaks
+    don't slow down transcription, then moves the timestamps back to where they are in the original audio.
+
+    :param str wav_path: Path to the WAV file
+    :param str model_name: Name of the model to use
+    :param bool parallel: Weather or not to split long audio into chunks and transcribe them at the same time
+
+    :return str: The transcript of the audio with timestamps from the start of the whole file
+    """
+    transcribe = transcribe_audio_parallel if parallel else transcribe_audio
+
+    speech_path = f"{os.path.splitext(wav_path)[0]}-_-SPEECH-_-.wav"
+    offset_map = remove_silence(wav_path=wav_path, output_path=speech_path)
+    if offset_map is None:
+        return transcribe(wav_path=wav_path, model_name=model_name)
+
+    try:
+        transcript = transcribe(wav_path=speech_path, model_name=model_name)
+    finally:
+        os.remove(speech_path)
+
+    return remap_timestamps(timestamped_transcript=transcript, offset_map=offset_map)
+
+
+def transcribe_to_file(course_code, lecture_num, finalize_transcription=True, cut_path_n=0, parallel=False,
+                       model_name="medium.en", source_path=None, skip_silence=True, start_seconds=0):
     """
     Transcribes a .wav file to a .txt file.
 
@@ -87,26 +412,56 @@ def transcribe_to_file(course_code, lecture_num, finalize_transcription=True, cu
     :param str course_code: Code of the lecture class
     :param int lecture_num: The nth lecture
     :param bool finalize_transcription: Weather or not to create the other transcript files and add a header
+    :param bool parallel: Weather or not to split long audio into chunks and transcribe them at the same time
+    :param str model_name: Name of the whisper model to use
+    :param str source_path: Transcribes this audio or video file directly instead of the cut .wav file
+    :param bool skip_silence: Weather or not to leave long silences out of the audio sent to Whisper
+    :param float start_seconds: Only transcribes the cut from this point, used when the start of a streamed
+    recording was already transcribed live
 
     :return: None
     """
     print_green("\nTranscribing...")
     wav_path = get_cut_path(current_class=course_code, lecture_num=lecture_num, n=cut_path_n)
-    transcript_raw = transcribe_audio(wav_path=wav_path) + "\n"
+    trimmed_path = None
+    if start_seconds > 0:
+        trimmed_path = trim_wav_start(wav_path=wav_path, start_seconds=start_seconds)
+        wav_path = trimmed_path
+
+    try:
+        if wav_path is None:
+
+            # Everything in the cut was already transcribed
+            transcript_raw = ""
+        elif source_path is not None:
+            transcript_raw = transcribe_media(file_path=source_path, model_name=model_name) + "\n"
+        elif skip_silence:
+            transcript_raw = transcribe_speech(wav_path=wav_path, model_name=model_name, parallel=parallel) + "\n"
+        elif parallel:
+            transcript_raw = transcribe_audio_parallel(wav_path=wav_path, model_name=model_name) + "\n"
+        else:
+            transcript_raw = transcribe_audio(wav_path=wav_path, model_name=model_name) + "\n"
+    finally:
+        if trimmed_path is not None:
+            os.remove(trimmed_path)
 
-    # If a previous cut exists adjust the timestamps on this cut to adjust for that
+    # Shifts the timestamps on this cut by the length of the cuts recorded before it, read from their headers
+    # since the last thing said in a cut is usually well before the cut ends
     previous_transcript = txt_file_to_str(f"notes/{course_code}/timestamped/{lecture_num}.txt")
-    if previous_transcript is not None:
-        previous_cut_duration = get_transcript_end_time(transcript_raw=previous_transcript)
-        transcript_raw = add_time_to_timestamps(
-            timestamped_transcript=transcript_raw,
-            time_to_add=previous_cut_duration
-        )
+    previous_cuts_duration = sum(
+        get_wav_duration(get_cut_path(current_class=course_code, lecture_num=lecture_num, n=n))
+        for n in range(cut_path_n)
+    )
+    transcript_raw = add_time_to_timestamps(
+        timestamped_transcript=transcript_raw,
+        time_to_add=previous_cuts_duration + start_seconds
+    )
 
-    # Writes transcript with timestamps to a timestamped .txt file
+    # Writes transcript with timestamps to a timestamped .txt file, replacing the file all at once
+    # with the cut added on the end so a crash never leaves a cut half written
     transcript_file_name = f"{lecture_num}.txt"
     timestamped_path = f"notes/{course_code}/timestamped/{transcript_file_name}"
-    write_to_file(file_path=timestamped_path, content=transcript_raw)
+    save_to_file(file_path=timestamped_path, content=(previous_transcript or "") + transcript_raw)
     print(f"Appended {transcript_file_name} in {timestamped_path}")
 
     if finalize_transcription:
@@ -140,7 +495,7 @@ def finish_transcription_to_file(course_code, lecture_num):
 
     # Appends timestamped transcript to the main timestamped transcript for the class including past lectures
     timestamped_main_path = f"notes/{course_code}/timestamped/main.txt"
-    write_to_file(file_path=timestamped_main_path, content=transcript_timestamped)
+    append_lecture(main_path=timestamped_main_path, lecture_num=lecture_num, content=transcript_timestamped)
     print(f"Appended to main.txt in {timestamped_main_path}")
 
     # Converts raw transcript to one without timestamps
@@ -148,12 +503,12 @@ def finish_transcription_to_file(course_code, lecture_num):
 
     # Writes transcript to .txt file
     transcript_path = f"notes/{course_code}/transcripts/{transcript_file_name}"
-    write_to_file(file_path=transcript_path, content=clean_transcript)
+    save_to_file(file_path=transcript_path, content=clean_transcript)
     print(f"Created {transcript_file_name} in {transcript_path}")
 
     # Appends transcript to the main transcript for the class including past lectures
     transcript_path_main_path = f"notes/{course_code}/transcripts/main.txt"
-    write_to_file(file_path=transcript_path_main_path, content=clean_transcript)
+    append_lecture(main_path=transcript_path_main_path, lecture_num=lecture_num, content=clean_transcript)
     print(f"Appended to main.txt in {transcript_path_main_path}")
 
     print_green("\nTranscription successful!")
@@ -180,20 +535,21 @@ def move_wav_to_lectures(original_path, course_code, current_lecture_num):
     return f"{new_directory}/{new_wav_name}"
 
 
-def summarize_lecture(transcript, course_code, lecture_num):
+def summarize_lecture(transcript, course_code, lecture_num, regenerate=False):
     """
     Summarizes the lecture from a transcript and creates a .md summary sheet.
 
     :param str transcript: Lecture transcript
     :param str course_code: Code of the lecture class
     :param number lecture_num: The nth lecture
+    :param bool regenerate: Weather or not to make a new sheet even if this transcript was summarized before
 
-    :return: None
+    :return str: Path of the summary sheet
     """
 
     # Creates a summary sheet and its title based on the transcript
     print_green("\nSummarizing...")
-    summary_sheet, sheet_title = summary_sheet_gpt(transcript=transcript)
+    summary_sheet, sheet_title = summary_sheet_gpt(transcript=transcript, regenerate=regenerate)
 
     # Get the current date and time
     current_date = datetime.now()
@@ -213,13 +569,15 @@ def summarize_lecture(transcript, course_code, lecture_num):
     # Writes summary_sheet to a .md (Markdown) file
     summary_file_name = f"{lecture_num}-{sheet_title.lower()}.md"
     summary_path = f"notes/{course_code}/summaries/{summary_file_name}"
-    write_to_file(file_path=summary_path, content=summary_sheet)
+    save_to_file(file_path=summary_path, content=summary_sheet)
     print(f"Created {summary_file_name} in {summary_path}")
 
     # Appends summary_sheet to the main summary_sheet for the class including past lectures
     summary_main_path = f"notes/{course_code}/summaries/main.md"
-    write_to_file(file_path=summary_main_path, content=summary_sheet)
+    append_lecture(main_path=summary_main_path, lecture_num=lecture_num, content=summary_sheet)
     print(f"Appended to main.md in {summary_main_path}")
 
     print_green("\nSummary sheet successful!")
 
+    return summary_path
+
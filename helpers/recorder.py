@@ -1,9 +1,12 @@
 import sounddevice as sd
+import numpy as np
 import wave
 import threading
-from pydub import AudioSegment
 from helpers.fancy_prints import print_red
 
+# Sample rate the recording is saved at since it's what Whisper reads
+TARGET_SAMPLE_RATE = 16000
+
 
 def get_supported_sample_rate():
     """
@@ -16,16 +19,73 @@ def get_supported_sample_rate():
     return int(sd.query_devices(device_info['index'], 'input')['default_samplerate'])
 
 
+class StreamResampler:
+    """
+    A class to resample audio as it arrives in blocks, carrying its position over so blocks join seamlessly.
+    """
+    def __init__(self, input_rate, output_rate):
+        """
+        Initializes the StreamResampler with the input and output sample rates.
+
+        :param int input_rate: Sample rate of the audio fed in
+        :param int output_rate: Sample rate of the audio returned
+
+        :return: None
+        """
+        self.step = input_rate / output_rate
+
+        # Position of the next output sample measured in samples from the start of pending
+        self._position = 0.0
+
+        # Input samples still needed to interpolate the next output samples
+        self._pending = np.zeros(0, dtype=np.float32)
+
+
+    def process(self, samples):
+        """
+        Resamples the next block of audio using linear interpolation.
+
+        :param numpy.ndarray samples: The next mono samples at the input rate
+
+        :return numpy.ndarray: int16 samples at the output rate
+        """
+        if self.step == 1:
+            return samples.astype(np.int16)
+
+        data = np.concatenate((self._pending, samples.astype(np.float32)))
+
+        # Only outputs samples that have an input sample on both sides
+        if len(data) - 1 < self._position:
+            self._pending = data
+            return np.zeros(0, dtype=np.int16)
+
+        count = int((len(data) - 1 - self._position) // self.step) + 1
+        positions = self._position + np.arange(count) * self.step
+        resampled = np.interp(positions, np.arange(len(data)), data)
+
+        # Keeps the samples the next output sample sits between
+        next_position = self._position + count * self.step
+        consumed = min(int(next_position), len(data))
+        self._pending = data[consumed:]
+        self._position = next_position - consumed
+
+        return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+
+
 class Recorder:
     """
     A class to handle audio recording from the microphone to a .wav file at a samplerate Whisper can read.
+    The microphone callback only copies audio into a preallocated ring buffer, a writer thread drains it,
+    resamples it to 16 kHz mono as it arrives and writes it to the .wav file.
     """
-    def __init__(self, file_path, channels=1):
+    def __init__(self, file_path, channels=1, stream_to=None, buffer_seconds=10):
         """
         Initializes the Recorder with the given file_path, channels, and sample rate.
 
         :param str file_path: The name of the output .wav file
         :param int channels: The channels, defaults to 1 as that's what Whisper supports
+        :param StreamingTranscriber stream_to: Optionally also feeds the 16 kHz audio to a live transcriber
+        :param float buffer_seconds: How much audio the ring buffer holds before the writer thread must drain it
 
         :return: None
         """
@@ -34,8 +94,16 @@ class Recorder:
         self.samplerate = get_supported_sample_rate()
         self.block_size = self.get_optimal_block_size(self.samplerate)
         self.is_recording = False
+        self.stream_to = stream_to
         self._stream = None
 
+        # Ring buffer shared by the callback (writes) and the writer thread (reads)
+        self._ring = np.zeros((int(self.samplerate * buffer_seconds), channels), dtype=np.int16)
+        self._frames_written = 0
+        self._frames_read = 0
+        self._data_ready = threading.Event()
+        self._stream_closed = threading.Event()
+
 
     def get_optimal_block_size(self, samplerate):
         """
@@ -62,31 +130,97 @@ class Recorder:
         Internal callback function to handle real-time audio data.
 
         This function is called automatically by the sounddevice.InputStream
-        to process and save the incoming audio data to the .wav file.
+        and only copies the incoming audio into the ring buffer, it never allocates or touches the disk.
 
-        Note: Frames and time are side effects of InputStream callback and not used
+        Note: Time is a side effect of InputStream callback and not used
 
         :param numpy.ndarray indata: Raw audio data captured from the mic as a chunk
+        :param int frames: Number of frames in indata
         :param sounddevice.CallbackFlags status: Status flags indicating the state of the stream (e.g., errors)
 
         :return: None
         """
         if status:
             print(status)
-        self._wav_file.writeframes(indata.copy())
+
+        ring_size = len(self._ring)
+        start = self._frames_written % ring_size
+        first_part = min(frames, ring_size - start)
+
+        # Copies in two parts when the block wraps around the end of the ring
+        self._ring[start:start + first_part] = indata[:first_part]
+        if first_part < frames:
+            self._ring[:frames - first_part] = indata[first_part:frames]
+
+        self._frames_written += frames
+        self._data_ready.set()
+
+
+    def _drain(self):
+        """
+        Moves every frame waiting in the ring buffer to the .wav file and the live transcriber.
+
+        :return: None
+        """
+        frames_written = self._frames_written
+        ring_size = len(self._ring)
+
+        # If the writer fell a full ring behind the oldest audio has been overwritten
+        if frames_written - self._frames_read > ring_size:
+            print_red("Recording buffer overflowed, some audio was lost")
+            self._frames_read = frames_written - ring_size
+
+        if frames_written == self._frames_read:
+            return
+
+        start = self._frames_read % ring_size
+        end = frames_written % ring_size
+        if start < end:
+            frames = self._ring[start:end]
+        else:
+            frames = np.concatenate((self._ring[start:], self._ring[:end]))
+        self._frames_read = frames_written
+
+        # Mixes down to mono then resamples to 16 kHz
+        if self.channels == 1:
+            mono = frames[:, 0]
+        else:
+            mono = frames.mean(axis=1)
+        resampled = self._resampler.process(mono)
+
+        self._wav_file.writeframes(resampled.tobytes())
+        if self.stream_to is not None:
+            self.stream_to.feed(resampled)
+
+
+    def _write(self):
+        """
+        Writer thread that drains the ring buffer until the stream is closed.
+
+        :return: None
+        """
+        while not self._stream_closed.is_set():
+            self._data_ready.wait(timeout=0.5)
+            self._data_ready.clear()
+            self._drain()
+
+        # Writes whatever arrived after the last drain
+        self._drain()
+        self._wav_file.close()
 
 
     def start_recording(self):
         """
-        Starts the audio recording and saves the data to the specified .wav file.
+        Starts the audio recording and saves the data to the specified .wav file at 16 kHz.
 
         :return: None
         """
         self.is_recording = True
+        self._resampler = StreamResampler(input_rate=self.samplerate, output_rate=TARGET_SAMPLE_RATE)
         self._wav_file = wave.open(self.file_path, 'wb')
-        self._wav_file.setnchannels(self.channels)
+        self._wav_file.setnchannels(1)
         self._wav_file.setsampwidth(2)
-        self._wav_file.setframerate(self.samplerate)
+        self._wav_file.setframerate(TARGET_SAMPLE_RATE)
 
         self._stream = sd.InputStream(
             samplerate=self.samplerate,
@@ -101,41 +235,30 @@ class Recorder:
         def record():
             with self._stream:
                 while self.is_recording:
-                    sd.sleep(1000)
+                    sd.sleep(100)
+
+            # No more audio can arrive so the writer can finish
+            self._stream_closed.set()
+            self._data_ready.set()
 
 
         self._recording_thread = threading.Thread(target=record)
         self._recording_thread.start()
+        self._writer_thread = threading.Thread(target=self._write)
+        self._writer_thread.start()
         print_red(f"\nRecording live...")
 
 
-    def convert_to_16khz(self):
-        """
-        Converts the recorded .wav file to a 16 kHz sample rate.
-
-        :return: None
-        """
-        audio = AudioSegment.from_wav(self.file_path)
-
-        # Resample to 16 kHz
-        if audio.frame_rate != 16000:
-            audio = audio.set_frame_rate(16000)
-
-        # Save the resampled audio back to the file
-        audio.export(self.file_path, format="wav")
-
-
     def stop_recording(self):
         """
         Stops recording audio and finalizes the .wav file.
+        Only the audio still in the ring buffer is left to write so stopping is instant for any length of lecture.
 
         :return: None
         """
         self.is_recording = False
 
-        # Wait for the recording thread to finish
+        # Wait for the stream to close then for the writer to drain the last audio
         self._recording_thread.join()
-        self._wav_file.close()
-        self.convert_to_16khz()
+        self._writer_thread.join()
         print_red("Recording stopped")
-
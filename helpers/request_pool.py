@@ -0,0 +1,149 @@
+import time
+import asyncio
+import threading
+from dotenv import dotenv_values
+
+# Load the .env file into a dictionary
+config = dotenv_values(".env")
+
+# How many requests can be waiting on OpenAI at once unless OPENAI_MAX_CONCURRENT is set in .env
+DEFAULT_MAX_CONCURRENT = 4
+
+# Tokens the account may use per minute unless OPENAI_TOKENS_PER_MINUTE is set in .env, once a response
+# says what the account's real limit is that is used instead
+DEFAULT_TOKENS_PER_MINUTE = 30000
+
+# Only this much of the limit is used so estimates that come in low don't trip it
+TOKEN_BUDGET_SHARE = 0.9
+
+# How long the token budget is measured over in seconds
+WINDOW_SECONDS = 60
+
+# How often a request waiting for a free slot checks again
+SLOT_POLL_SECONDS = 0.05
+
+# Longest a request waits before checking again if it can be sent
+MAX_POLL_SECONDS = 1.0
+
+
+class RequestPool:
+    """
+    A class to keep requests to OpenAI under a concurrency cap and a tokens per minute budget.
+    It's shared by every thread and event loop so lectures summarized at the same time share one budget.
+    """
+    def __init__(self, max_concurrent=None, tokens_per_minute=None):
+        """
+        Initializes the RequestPool.
+
+        :param int max_concurrent: How many requests can run at once, defaults to OPENAI_MAX_CONCURRENT in .env
+        :param int tokens_per_minute: The account's token limit, defaults to OPENAI_TOKENS_PER_MINUTE in .env
+
+        :return: None
+        """
+        self.max_concurrent = max_concurrent or int(config.get("OPENAI_MAX_CONCURRENT") or DEFAULT_MAX_CONCURRENT)
+
+        # A limit set by the user is kept, otherwise it's replaced by the limit OpenAI reports
+        configured_limit = tokens_per_minute or config.get("OPENAI_TOKENS_PER_MINUTE")
+        self.tokens_per_minute = int(configured_limit or DEFAULT_TOKENS_PER_MINUTE)
+        self._learn_limit = not configured_limit
+
+        self._lock = threading.Lock()
+        self._running = 0
+        self._paused_until = 0.0
+
+        # Every request sent in the last minute as [sent at, tokens]
+        self._window = []
+
+
+    def _used_tokens(self, now):
+        """
+        Counts the tokens sent in the last minute. Must be called while holding the lock.
+
+        :param float now: The current time
+
+        :return int: Tokens used in the window
+        """
+        while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+            self._window.pop(0)
+
+        return sum(tokens for _, tokens in self._window)
+
+
+    async def acquire(self, tokens):
+        """
+        Waits until a request of a given size can be sent without going over the concurrency cap or the budget.
+
+        :param int tokens: Estimated tokens of the prompt and response
+
+        :return list: The request's entry in the window, pass it to release once the request is done
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                used = self._used_tokens(now)
+                budget = int(self.tokens_per_minute * TOKEN_BUDGET_SHARE)
+
+                # A request bigger than the whole budget is still sent once nothing else is using it
+                fits = used + tokens <= budget or not self._window
+                if now >= self._paused_until and self._running < self.max_concurrent and fits:
+                    self._running += 1
+                    entry = [now, tokens]
+                    self._window.append(entry)
+                    return entry
+
+                # Waits for a pause to end or the oldest request to leave the window
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif not fits:
+                    wait = self._window[0][0] + WINDOW_SECONDS - now
+                else:
+                    wait = SLOT_POLL_SECONDS
+
+            await asyncio.sleep(min(max(wait, SLOT_POLL_SECONDS), MAX_POLL_SECONDS))
+
+
+    def release(self, entry, used_tokens=None):
+        """
+        Frees a request's slot once it's done.
+
+        :param list entry: What acquire returned
+        :param int used_tokens: Tokens OpenAI says the request used, replaces the estimate if given
+
+        :return: None
+        """
+        with self._lock:
+            self._running -= 1
+            if used_tokens is not None:
+                entry[1] = used_tokens
+
+
+    def pause(self, seconds):
+        """
+        Stops every request from being sent for a while, used when OpenAI says to slow down.
+
+        :param float seconds: How long to wait
+
+        :return: None
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+
+
+    def update_limit(self, headers):
+        """
+        Uses the token limit OpenAI reports in a response's headers so throughput matches the account's limit.
+
+        :param Mapping headers: Headers of the response
+
+        :return: None
+        """
+        limit = headers.get("x-ratelimit-limit-tokens")
+        if not self._learn_limit or not limit or not limit.isdigit():
+            return
+
+        with self._lock:
+            self.tokens_per_minute = int(limit)
+
+
+# One pool shared by the whole program
+request_pool = RequestPool()
@@ -0,0 +1,380 @@
+import sys
+import time
+import threading
+import traceback
+from dotenv import dotenv_values
+
+# Load the .env file into a dictionary
+config = dotenv_values(".env")
+
+# Lower numbers run first, cuts of a lecture being recorded, then lectures that were just added, then backfills
+PRIORITY_LIVE = 0
+PRIORITY_LECTURE = 1
+PRIORITY_BACKFILL = 2
+
+# How many jobs run at once unless JOB_WORKERS is set in .env
+DEFAULT_JOB_WORKERS = 2
+
+# Lines of output kept for every job
+JOB_LOG_LINES = 200
+
+# The job the current thread is running, None on the main thread
+_current = threading.local()
+
+
+class Job:
+    """
+    A class to hold a piece of work run by the JobScheduler along with its status, progress and output.
+    """
+    def __init__(self, job_id, name, function, kwargs, priority, group):
+        """
+        Initializes the Job as queued.
+
+        :param int job_id: Number of the job, jobs are numbered in the order they're submitted
+        :param str name: What the job is shown as in the status view
+        :param Callable function: The work to do
+        :param dict kwargs: The arguments function is called with
+        :param int priority: One of the PRIORITY_ values, lower runs first
+        :param str group: Jobs in the same group run one at a time in the order they were submitted
+
+        :return: None
+        """
+        self.id = job_id
+        self.name = name
+        self.function = function
+        self.kwargs = kwargs
+        self.priority = priority
+        self.group = group
+        self.status = "queued"
+        self.progress = ""
+        self.error = None
+        self.result = None
+        self.output = []
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._partial_line = ""
+
+
+    def log(self, text):
+        """
+        Saves text the job printed, the last line printed is shown as its progress unless it set its own.
+
+        :param str text: The printed text
+
+        :return: None
+        """
+        lines = (self._partial_line + text).split("\n")
+        self._partial_line = lines.pop()
+        for line in lines:
+            if line.strip():
+                self.output.append(line)
+        del self.output[:-JOB_LOG_LINES]
+
+
+    def get_elapsed(self):
+        """
+        Gets how long the job has been running or how long it ran for.
+
+        :return float: Seconds since it started or 0 if it hasn't started
+        """
+        if self.started_at is None:
+            return 0.0
+
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobOutput:
+    """
+    A class that stands in for sys.stdout so what jobs print is saved to the job instead of
+    being printed over the menu. Anything printed outside of a job is printed as normal.
+    """
+    def __init__(self, stream):
+        """
+        Initializes the JobOutput.
+
+        :param TextIO stream: Where text printed outside of jobs goes
+
+        :return: None
+        """
+        self.stream = stream
+
+
+    def write(self, text):
+        """
+        Writes text to the running job or to the stream.
+
+        :param str text: The text to write
+
+        :return int: How many characters were written
+        """
+        job = getattr(_current, "job", None)
+        if job is None:
+            return self.stream.write(text)
+
+        job.log(text)
+        return len(text)
+
+
+    def flush(self):
+        """
+        Flushes the stream.
+
+        :return: None
+        """
+        self.stream.flush()
+
+
+    def __getattr__(self, name):
+        """
+        Passes everything else such as isatty and encoding on to the stream.
+
+        :param str name: Name of the attribute
+
+        :return: The stream's attribute
+        """
+        return getattr(self.stream, name)
+
+
+class JobScheduler:
+    """
+    A class to run jobs on a pool of worker threads so the menu stays usable while lectures are processed.
+    The highest priority job runs first and jobs in the same group never run at the same time.
+    """
+    def __init__(self, max_workers=None):
+        """
+        Initializes the JobScheduler. Worker threads are only started once a job is submitted.
+
+        :param int max_workers: How many jobs can run at once, defaults to JOB_WORKERS in .env
+
+        :return: None
+        """
+        self.max_workers = max_workers or int(config.get("JOB_WORKERS") or DEFAULT_JOB_WORKERS)
+        self._jobs = []
+        self._next_id = 1
+        self._condition = threading.Condition()
+        self._workers = []
+        self._reported = set()
+
+
+    def submit(self, name, function, priority=PRIORITY_LECTURE, group=None, **kwargs):
+        """
+        Queues a job and returns straight away.
+
+        :param str name: What the job is shown as in the status view
+        :param Callable function: The work to do
+        :param int priority: One of the PRIORITY_ values, lower runs first
+        :param str group: Jobs in the same group run one at a time in the order they were submitted
+        :param kwargs: The arguments function is called with
+
+        :return Job: The queued job
+        """
+        with self._condition:
+            job = Job(
+                job_id=self._next_id,
+                name=name,
+                function=function,
+                kwargs=kwargs,
+                priority=priority,
+                group=group
+            )
+            self._next_id += 1
+            self._jobs.append(job)
+
+            # Workers are started as they're needed up to max_workers
+            if len(self._workers) < self.max_workers:
+                if not isinstance(sys.stdout, JobOutput):
+                    sys.stdout = JobOutput(sys.stdout)
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+            self._condition.notify_all()
+
+        return job
+
+
+    def track(self, name, future, on_done=None):
+        """
+        Shows work running outside of the scheduler, such as in a process pool, as a running job
+        so it's reported when it finishes and what on_done prints is saved to the job instead of
+        being printed over the menu.
+
+        :param str name: What the job is shown as in the status view
+        :param concurrent.futures.Future future: The work being run
+        :param Callable on_done: Called with the finished future, its return value is the job's result
+        and an exception fails the job, defaults to future.result
+
+        :return Job: The running job
+        """
+        with self._condition:
+            job = Job(
+                job_id=self._next_id,
+                name=name,
+                function=None,
+                kwargs={},
+                priority=PRIORITY_LECTURE,
+                group=None
+            )
+            self._next_id += 1
+            job.status = "running"
+            job.started_at = time.time()
+            self._jobs.append(job)
+
+            if not isinstance(sys.stdout, JobOutput):
+                sys.stdout = JobOutput(sys.stdout)
+
+        future.add_done_callback(lambda done: self._finish_tracked(job, done, on_done))
+
+        return job
+
+
+    def _finish_tracked(self, job, future, on_done):
+        """
+        Marks a tracked job as finished or failed once its future is done.
+
+        :param Job job: The tracked job
+        :param concurrent.futures.Future future: The finished work
+        :param Callable on_done: Called with the finished future, None to use the future's result
+
+        :return: None
+        """
+
+        # The callback can run on a worker that's in the middle of its own job if the future was already done
+        previous_job = getattr(_current, "job", None)
+        _current.job = job
+        try:
+            job.result = on_done(future) if on_done is not None else future.result()
+            status = "finished"
+        except BaseException as e:
+            job.error = str(e) or type(e).__name__
+            job.log(traceback.format_exc())
+            status = "failed"
+        finally:
+            _current.job = previous_job
+
+        with self._condition:
+            job.status = status
+            job.finished_at = time.time()
+            self._condition.notify_all()
+
+
+    def _next_job(self):
+        """
+        Picks the job to run next. Must be called while holding the condition.
+
+        :return Job: The queued job with the highest priority whose group is free or None if none can run
+        """
+        running_groups = {job.group for job in self._jobs if job.status == "running" and job.group is not None}
+        queued = [job for job in self._jobs if job.status == "queued"]
+
+        for job in sorted(queued, key=lambda queued_job: (queued_job.priority, queued_job.id)):
+            if job.group is None:
+                return job
+
+            # A group's jobs run in the order they were submitted whatever their priority
+            first_in_group = min(
+                (queued_job for queued_job in queued if queued_job.group == job.group),
+                key=lambda queued_job: queued_job.id
+            )
+            if job.group not in running_groups and first_in_group is job:
+                return job
+
+        return None
+
+
+    def _work(self):
+        """
+        Worker thread that runs jobs until the program exits.
+
+        :return: None
+        """
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+
+                job.status = "running"
+                job.started_at = time.time()
+
+            _current.job = job
+            try:
+                job.result = job.function(**job.kwargs)
+                status = "finished"
+            except BaseException as e:
+                job.error = str(e) or type(e).__name__
+                job.log(traceback.format_exc())
+                status = "failed"
+            finally:
+                _current.job = None
+
+            with self._condition:
+                job.status = status
+                job.finished_at = time.time()
+                self._condition.notify_all()
+
+
+    def get_jobs(self):
+        """
+        Gets every job that has been submitted.
+
+        :return List[Job]: The jobs in the order they were submitted
+        """
+        with self._condition:
+            return list(self._jobs)
+
+
+    def pop_completed(self):
+        """
+        Gets the jobs that finished or failed since this was last called, so the user can be told about them.
+
+        :return List[Job]: The newly completed jobs
+        """
+        with self._condition:
+            completed = [
+                job for job in self._jobs
+                if job.status in ["finished", "failed"] and job.id not in self._reported
+            ]
+            self._reported.update(job.id for job in completed)
+
+        return completed
+
+
+    def count_unfinished(self):
+        """
+        Counts the jobs that are queued or running.
+
+        :return int: How many jobs haven't finished yet
+        """
+        with self._condition:
+            return sum(1 for job in self._jobs if job.status in ["queued", "running"])
+
+
+    def wait(self):
+        """
+        Blocks until every job is done.
+
+        :return: None
+        """
+        with self._condition:
+            while any(job.status in ["queued", "running"] for job in self._jobs):
+                self._condition.wait()
+
+
+def set_progress(text):
+    """
+    Shows how far the job running on this thread has got in the status view. Does nothing outside of a job.
+
+    :param str text: The progress such as transcribe (2/5)
+
+    :return: None
+    """
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.progress = text
+
+
+# One scheduler shared by the whole program
+scheduler = JobScheduler()
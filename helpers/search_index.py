@@ -0,0 +1,456 @@
+import os
+import re
+import sqlite3
+import threading
+from helpers.fancy_prints import print_red
+from helpers.timestamps import iter_segments, MS_PER_SECOND
+
+# Full-text index of every transcript and summary sheet in notes
+SEARCH_DB_PATH = "notes/.search.db"
+
+# Raised whenever the tables change so older indexes are rebuilt from the notes
+SEARCH_SCHEMA_VERSION = 2
+
+# Folders of each course that are searched
+SEARCHED_MEDIA_TYPES = ["timestamped", "transcripts", "summaries"]
+
+# Paths look like notes/COURSE/MEDIA/FILE or notes/archived_classes/COURSE/MEDIA/FILE
+NOTES_PATH_PATTERN = re.compile(
+    r'^notes/(archived_classes/)?([^/]+)/(timestamped|transcripts|summaries)/([^/]+)$'
+)
+LECTURE_NUM_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)')
+
+# Only one thread writes to the index at a time
+_index_lock = threading.Lock()
+
+
+def connect(db_path=SEARCH_DB_PATH):
+    """
+    Opens the search index, creating it from what's in the notes folder the first time.
+
+    :param str db_path: Path to the search index
+
+    :return sqlite3.Connection: Connection to the search index or None if there is no notes folder yet
+    """
+    if not os.path.isdir(os.path.dirname(db_path)):
+        return None
+
+    # Background jobs index files at the same time so writers wait for each other instead of failing
+    connection = sqlite3.connect(db_path, timeout=30)
+
+    # Older indexes are dropped and filled again from the notes folder
+    if connection.execute("PRAGMA user_version").fetchone()[0] < SEARCH_SCHEMA_VERSION:
+        connection.executescript(
+            """
+            DROP TABLE IF EXISTS segments;
+            DROP TABLE IF EXISTS indexed_files;
+            CREATE VIRTUAL TABLE segments USING fts5(
+                text,
+                course UNINDEXED,
+                archived UNINDEXED,
+                lecture UNINDEXED,
+                media_type UNINDEXED,
+                start UNINDEXED,
+                end UNINDEXED,
+                path UNINDEXED,
+                tokenize = 'porter unicode61'
+            );
+            CREATE TABLE indexed_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                modified INTEGER NOT NULL
+            );
+            """
+        )
+        with connection:
+            for path in find_searched_files(root_directory=os.path.dirname(db_path)):
+                reindex_file(connection=connection, file_path=path, info=get_file_info(path))
+            connection.execute(f"PRAGMA user_version = {SEARCH_SCHEMA_VERSION}")
+
+    return connection
+
+
+def get_file_info(file_path):
+    """
+    Works out which course, lecture and media type a file in notes belongs to.
+
+    :param str file_path: Path to the file
+
+    :return dict: The course, archived flag, lecture and media type or None if the file isn't searched
+    """
+    match = NOTES_PATH_PATTERN.match(file_path.replace(os.sep, "/"))
+    if not match:
+        return None
+
+    filename = match.group(4)
+    lecture_match = LECTURE_NUM_PATTERN.match(filename)
+    if filename.startswith(".") or not lecture_match:
+        return None
+
+    lecture = float(lecture_match.group(1))
+
+    return {
+        "course": match.group(2),
+        "archived": int(match.group(1) is not None),
+        "lecture": int(lecture) if lecture.is_integer() else lecture,
+        "media_type": match.group(3)
+    }
+
+
+def split_segments(content, media_type):
+    """
+    Splits text into the pieces that are searched, each timestamped line or each paragraph of a summary sheet.
+
+    :param str content: The text to split
+    :param str media_type: The folder the text is from
+
+    :return List[Tuple[str, float, float]]: The text of every segment and its start and end time in seconds
+    if it has them
+    """
+    segments = []
+    if media_type == "summaries":
+        for paragraph in re.split(r'\n\s*\n', content):
+            if paragraph.strip():
+                segments.append((paragraph.strip(), None, None))
+    else:
+        for start, end, text in iter_segments(content.splitlines()):
+            if not text.strip():
+                continue
+            if start is None:
+                segments.append((text.strip(), None, None))
+            else:
+                segments.append((text.strip(), start / MS_PER_SECOND, end / MS_PER_SECOND))
+
+    return segments
+
+
+def insert_segments(connection, file_path, info, content):
+    """
+    Adds text from a file to the index.
+
+    :param sqlite3.Connection connection: Connection to the search index
+    :param str file_path: Path to the file the text is from
+    :param dict info: The course, archived flag, lecture and media type of the file
+    :param str content: The text to add
+
+    :return: None
+    """
+    connection.executemany(
+        "INSERT INTO segments (text, course, archived, lecture, media_type, start, end, path) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (text, info["course"], info["archived"], info["lecture"], info["media_type"], start, end, file_path)
+            for text, start, end in split_segments(content=content, media_type=info["media_type"])
+        ]
+    )
+
+
+def reindex_file(connection, file_path, info):
+    """
+    Replaces everything in the index from a file with the file's current text.
+
+    :param sqlite3.Connection connection: Connection to the search index
+    :param str file_path: Path to the file
+    :param dict info: The course, archived flag, lecture and media type of the file
+
+    :return: None
+    """
+    connection.execute("DELETE FROM segments WHERE path = ?", (file_path,))
+    with open(file_path, 'r', encoding='utf-8') as file:
+        insert_segments(connection=connection, file_path=file_path, info=info, content=file.read())
+
+    stat = os.stat(file_path)
+    connection.execute(
+        "INSERT OR REPLACE INTO indexed_files (path, size, modified) VALUES (?, ?, ?)",
+        (file_path, stat.st_size, stat.st_mtime_ns)
+    )
+
+
+def index_append(file_path, content):
+    """
+    Adds text that was just appended to a file to the index without reading the rest of the file again.
+    If the index didn't have everything before the append the whole file is indexed instead.
+
+    :param str file_path: Path to the file that was appended to
+    :param str content: The text that was appended
+
+    :return: None
+    """
+    file_path = file_path.replace(os.sep, "/")
+    info = get_file_info(file_path)
+    if info is None:
+        return
+
+    with _index_lock:
+        try:
+            connection = connect()
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+            return
+        if connection is None:
+            return
+
+        try:
+            with connection:
+                stat = os.stat(file_path)
+                previous_size = stat.st_size - len(content.encode('utf-8'))
+                row = connection.execute("SELECT size FROM indexed_files WHERE path = ?", (file_path,)).fetchone()
+
+                if (row is None and previous_size == 0) or (row is not None and row[0] == previous_size):
+                    insert_segments(connection=connection, file_path=file_path, info=info, content=content)
+                    connection.execute(
+                        "INSERT OR REPLACE INTO indexed_files (path, size, modified) VALUES (?, ?, ?)",
+                        (file_path, stat.st_size, stat.st_mtime_ns)
+                    )
+                else:
+                    reindex_file(connection=connection, file_path=file_path, info=info)
+
+        # Running 'python main.py catalog' catches up on anything that couldn't be indexed now
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+        finally:
+            connection.close()
+
+
+def index_file(file_path):
+    """
+    Indexes the whole of a file again after it was replaced.
+
+    :param str file_path: Path to the file that was replaced
+
+    :return: None
+    """
+    file_path = file_path.replace(os.sep, "/")
+    info = get_file_info(file_path)
+    if info is None:
+        return
+
+    with _index_lock:
+        try:
+            connection = connect()
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+            return
+        if connection is None:
+            return
+
+        try:
+            with connection:
+                reindex_file(connection=connection, file_path=file_path, info=info)
+
+        # Running 'python main.py catalog' catches up on anything that couldn't be indexed now
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+        finally:
+            connection.close()
+
+
+def find_searched_files(root_directory="notes"):
+    """
+    Finds every file in notes that is searched, including archived classes.
+
+    :param str root_directory: The notes folder
+
+    :return dict: The size and modified time of every searched file by path
+    """
+    course_directories = []
+    for parent in [root_directory, f"{root_directory}/archived_classes"]:
+        if not os.path.isdir(parent):
+            continue
+        for entry in os.listdir(parent):
+            if entry != "archived_classes" and not entry.startswith(".") and os.path.isdir(f"{parent}/{entry}"):
+                course_directories.append(f"{parent}/{entry}")
+
+    files = {}
+    for course_directory in course_directories:
+        for media_type in SEARCHED_MEDIA_TYPES:
+            media_directory = f"{course_directory}/{media_type}"
+            if not os.path.isdir(media_directory):
+                continue
+            for entry in os.scandir(media_directory):
+                path = f"{media_directory}/{entry.name}"
+                if entry.is_file() and get_file_info(path) is not None:
+                    stat = entry.stat()
+                    files[path] = (stat.st_size, stat.st_mtime_ns)
+
+    return files
+
+
+def remove_from_index(file_paths):
+    """
+    Removes files that were deleted or moved away from the index.
+
+    :param List[str] file_paths: Paths of the files
+
+    :return: None
+    """
+    file_paths = [path.replace(os.sep, "/") for path in file_paths if get_file_info(path) is not None]
+    if not file_paths:
+        return
+
+    with _index_lock:
+        try:
+            connection = connect()
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+            return
+        if connection is None:
+            return
+
+        try:
+            with connection:
+                for path in file_paths:
+                    connection.execute("DELETE FROM segments WHERE path = ?", (path,))
+                    connection.execute("DELETE FROM indexed_files WHERE path = ?", (path,))
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+        finally:
+            connection.close()
+
+
+def move_course_index(original_path, new_path):
+    """
+    Records that a course folder was archived, restored or renamed without reading any of its files again.
+
+    :param str original_path: Where the course folder was such as notes/CLASS101
+    :param str new_path: Where the course folder is now such as notes/archived_classes/CLASS101
+
+    :return: None
+    """
+    original_prefix = original_path.replace(os.sep, "/").rstrip("/") + "/"
+    new_prefix = new_path.replace(os.sep, "/").rstrip("/") + "/"
+    new_info = get_file_info(f"{new_prefix}summaries/0.md")
+    if new_info is None:
+        return
+
+    with _index_lock:
+        try:
+            connection = connect()
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+            return
+        if connection is None:
+            return
+
+        try:
+            with connection:
+                prefix_length = len(original_prefix)
+                connection.execute(
+                    "UPDATE indexed_files SET path = ? || substr(path, ?) WHERE substr(path, 1, ?) = ?",
+                    (new_prefix, prefix_length + 1, prefix_length, original_prefix)
+                )
+                connection.execute(
+                    "UPDATE segments SET path = ? || substr(path, ?), course = ?, archived = ? "
+                    "WHERE substr(path, 1, ?) = ?",
+                    (new_prefix, prefix_length + 1, new_info["course"], new_info["archived"],
+                     prefix_length, original_prefix)
+                )
+        except sqlite3.Error as e:
+            print_red(f"Couldn't update the search index: {e}")
+        finally:
+            connection.close()
+
+
+def sync_index(root_directory="notes"):
+    """
+    Brings the index up to date with files that were added, changed, moved or deleted by hand.
+    Every searched file is checked but only those that changed are read. Files written by Noter are
+    indexed as they're written so this is only run by 'python main.py catalog'.
+
+    :param str root_directory: The notes folder
+
+    :return int: How many files were indexed again
+    """
+    with _index_lock:
+        connection = connect(db_path=f"{root_directory}/{os.path.basename(SEARCH_DB_PATH)}")
+        if connection is None:
+            return 0
+
+        files = find_searched_files(root_directory=root_directory)
+        try:
+            with connection:
+                indexed = {
+                    path: (size, modified)
+                    for path, size, modified in connection.execute("SELECT path, size, modified FROM indexed_files")
+                }
+
+                for path in indexed.keys() - files.keys():
+                    connection.execute("DELETE FROM segments WHERE path = ?", (path,))
+                    connection.execute("DELETE FROM indexed_files WHERE path = ?", (path,))
+
+                changed = [path for path, stat in files.items() if indexed.get(path) != stat]
+                for path in changed:
+                    reindex_file(connection=connection, file_path=path, info=get_file_info(path))
+        finally:
+            connection.close()
+
+    return len(changed)
+
+
+def to_match_query(query):
+    """
+    Turns what the user typed into an FTS5 query that finds segments containing every word.
+
+    :param str query: The words to search for
+
+    :return str: The FTS5 query
+    """
+    words = query.split()
+
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def search(query, course_code=None, media_types=None, limit=20):
+    """
+    Searches every transcript and summary sheet, best matches first.
+
+    :param str query: The words to search for
+    :param str course_code: Only search this course if given
+    :param List[str] media_types: Only search these folders, defaults to timestamped transcripts and summaries
+    :param int limit: Most results to return
+
+    :return List[dict]: The course, archived flag, lecture, media type, start and end time, snippet and path
+    of every result
+    """
+    if media_types is None:
+        media_types = ["timestamped", "summaries"]
+
+    match_query = to_match_query(query)
+    if not match_query:
+        return []
+
+    sql = (
+        "SELECT course, archived, lecture, media_type, start, end, snippet(segments, 0, '[', ']', '...', 16), path "
+        "FROM segments WHERE segments MATCH ?"
+        f" AND media_type IN ({', '.join('?' for _ in media_types)})"
+    )
+    parameters = [match_query] + list(media_types)
+    if course_code is not None:
+        sql += " AND course = ?"
+        parameters.append(course_code)
+    sql += " ORDER BY rank LIMIT ?"
+    parameters.append(limit)
+
+    # Files are indexed as they're written so searching never has to look through the notes folder
+    connection = connect()
+    if connection is None:
+        return []
+
+    try:
+        rows = connection.execute(sql, parameters).fetchall()
+    finally:
+        connection.close()
+
+    return [
+        {
+            "course": course,
+            "archived": bool(archived),
+            "lecture": lecture,
+            "media_type": media_type,
+            "start": start,
+            "end": end,
+            "snippet": snippet,
+            "path": path
+        }
+        for course, archived, lecture, media_type, start, end, snippet, path in rows
+    ]
@@ -0,0 +1,218 @@
+import re
+
+# Timestamps in the format [hh:mm:ss.sss --> hh:mm:ss.sss] printed by whisper/main
+TIMESTAMP_PATTERN = re.compile(r'\[(\d{2,}):(\d{2}):(\d{2})\.(\d{3})\s*-->\s*(\d{2,}):(\d{2}):(\d{2})\.(\d{3})\]')
+
+# A timestamp and the whitespace after it, which is what's removed to get the plain transcript
+STRIP_PATTERN = re.compile(TIMESTAMP_PATTERN.pattern + r'\s*')
+
+# A line that starts with a timestamp
+LINE_PATTERN = re.compile(r'\s*' + TIMESTAMP_PATTERN.pattern + r'\s*(.*)')
+
+# Just the end time of every timestamp
+END_TIME_PATTERN = re.compile(r'-->\s*(\d{2,}:\d{2}:\d{2}\.\d{3})\]')
+
+# A segment of an .srt transcript, returned by the whisper server
+SRT_SEGMENT_PATTERN = re.compile(
+    r'(\d{2}:\d{2}:\d{2}),(\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}),(\d{3})\s*\n(.*?)(?:\n\s*\n|\Z)',
+    re.DOTALL
+)
+
+MS_PER_HOUR = 3600000
+MS_PER_MINUTE = 60000
+MS_PER_SECOND = 1000
+
+# Zero padded numbers looked up instead of formatted since formatting is the slowest part of shifting timestamps
+TWO_DIGITS = [f"{i:02d}" for i in range(100)]
+THREE_DIGITS = [f"{i:03d}" for i in range(1000)]
+
+
+def match_to_milliseconds(match, first_group=1):
+    """
+    Converts the hours, minutes, seconds and milliseconds captured by a pattern to milliseconds.
+
+    :param re.Match match: A match of TIMESTAMP_PATTERN or LINE_PATTERN
+    :param int first_group: The group the hours are in, 1 for the start time and 5 for the end time
+
+    :return int: The time in milliseconds
+    """
+    return parts_to_milliseconds(*match.group(first_group, first_group + 1, first_group + 2, first_group + 3))
+
+
+def parts_to_milliseconds(hours, minutes, seconds, milliseconds):
+    """
+    Converts the parts of a time to milliseconds.
+
+    :param str hours: The hours as written in the timestamp
+    :param str minutes: The minutes as written in the timestamp
+    :param str seconds: The seconds as written in the timestamp
+    :param str milliseconds: The milliseconds as written in the timestamp
+
+    :return int: The time in milliseconds
+    """
+    return int(hours) * MS_PER_HOUR + int(minutes) * MS_PER_MINUTE + int(seconds) * MS_PER_SECOND + int(milliseconds)
+
+
+def format_time(milliseconds):
+    """
+    Formats a time as hh:mm:ss.sss, times before the start are shown as 0.
+
+    :param int milliseconds: The time in milliseconds
+
+    :return str: The formatted time
+    """
+    hours, remainder = divmod(max(0, milliseconds), MS_PER_HOUR)
+    minutes, remainder = divmod(remainder, MS_PER_MINUTE)
+    seconds, milliseconds = divmod(remainder, MS_PER_SECOND)
+    hours_text = TWO_DIGITS[hours] if hours < 100 else str(hours)
+
+    return f"{hours_text}:{TWO_DIGITS[minutes]}:{TWO_DIGITS[seconds]}.{THREE_DIGITS[milliseconds]}"
+
+
+def format_clock(seconds):
+    """
+    Formats a time in a lecture as hh:mm:ss for people to read.
+
+    :param float seconds: Seconds from the start of the lecture
+
+    :return str: The time as hh:mm:ss
+    """
+    hours, remainder = divmod(max(0, int(seconds)), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    hours_text = TWO_DIGITS[hours] if hours < 100 else str(hours)
+
+    return f"{hours_text}:{TWO_DIGITS[minutes]}:{TWO_DIGITS[seconds]}"
+
+
+def parse_clock(text):
+    """
+    Parses a time typed as hh:mm:ss, mm:ss or seconds.
+
+    :param str text: The time as typed
+
+    :return float: The time in seconds
+
+    :raises: ValueError if the text isn't a time
+    """
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+
+    return seconds
+
+
+def format_timestamp(start, end):
+    """
+    Formats a segment's start and end time the way whisper/main prints them.
+
+    :param int start: Start time in milliseconds
+    :param int end: End time in milliseconds
+
+    :return str: The timestamp in the format [hh:mm:ss.sss --> hh:mm:ss.sss]
+    """
+    return f"[{format_time(start)} --> {format_time(end)}]"
+
+
+def add_time_to_timestamps(timestamped_transcript, time_to_add):
+    """
+    Adds a constant amount of time to all timestamps in the format [hh:mm:ss.sss --> hh:mm:ss.sss] within a str.
+
+    :param str timestamped_transcript: The input string containing the timestamps and dialogue
+    :param float time_to_add: The amount of time in seconds to add to each timestamp
+
+    :return str: The modified string with updated timestamps
+    """
+    offset = round(time_to_add * MS_PER_SECOND)
+
+    # Splitting once gives the text between timestamps followed by the 8 numbers of the next timestamp,
+    # which is much faster than calling back into Python for every match
+    parts = TIMESTAMP_PATTERN.split(timestamped_transcript)
+    shifted = []
+    for i in range(0, len(parts) - 1, 9):
+        start = parts_to_milliseconds(*parts[i + 1:i + 5]) + offset
+        end = parts_to_milliseconds(*parts[i + 5:i + 9]) + offset
+        shifted.append(parts[i])
+        shifted.append(f"[{format_time(start)} --> {format_time(end)}]")
+    shifted.append(parts[-1])
+
+    return "".join(shifted)
+
+
+def get_transcript_end_time(transcript_raw):
+    """
+    Extracts the latest end time from a timestamped transcript.
+
+    :param str transcript_raw: The input string containing the timestamps and dialogue
+
+    :return float: The latest end time in seconds
+    """
+    end_times = END_TIME_PATTERN.findall(transcript_raw)
+    if not end_times:
+        return 0.0
+
+    # Zero padded times of the same length sort the same as text so only the latest one is converted
+    latest_end = max(end_times, key=lambda end_time: (len(end_time), end_time))
+    hours, minutes, seconds = latest_end.split(":")
+
+    return parts_to_milliseconds(hours, minutes, *seconds.split(".")) / MS_PER_SECOND
+
+
+def srt_to_timestamped(srt):
+    """
+    Converts an .srt transcript into the [hh:mm:ss.sss --> hh:mm:ss.sss] format printed by whisper/main.
+
+    :param str srt: The .srt transcript
+
+    :return str: The timestamped transcript
+    """
+    lines = []
+    for match in SRT_SEGMENT_PATTERN.finditer(srt):
+        text = " ".join(match.group(5).split())
+        lines.append(f"[{match.group(1)}.{match.group(2)} --> {match.group(3)}.{match.group(4)}]   {text}")
+
+    return "\n".join(lines)
+
+
+def remove_timestamps(transcript):
+    """
+    Takes a transcript with timestamps and removes them.
+
+    :param str transcript: The transcript with timestamps
+
+    :return str: The transcript without the timestamps
+    """
+    return STRIP_PATTERN.sub('', transcript)
+
+
+def get_segment_times(line):
+    """
+    Gets the start and end time of a timestamped line in the format [hh:mm:ss.sss --> hh:mm:ss.sss].
+
+    :param str line: A single line of a timestamped transcript
+
+    :return float: Start time in seconds or None if the line has no timestamp
+    :return float: End time in seconds or None if the line has no timestamp
+    """
+    match = LINE_PATTERN.match(line)
+    if not match:
+        return None, None
+
+    return match_to_milliseconds(match, 1) / MS_PER_SECOND, match_to_milliseconds(match, 5) / MS_PER_SECOND
+
+
+def iter_segments(lines):
+    """
+    Reads a timestamped transcript one line at a time so files of any size can be processed without loading them.
+
+    :param Iterable[str] lines: Lines of the transcript, such as an open file
+
+    :return Iterator[Tuple[int, int, str]]: The start and end time in milliseconds and the text of every line,
+    the times are None for lines without a timestamp
+    """
+    for line in lines:
+        match = LINE_PATTERN.match(line)
+        if match:
+            groups = match.groups()
+            yield parts_to_milliseconds(*groups[0:4]), parts_to_milliseconds(*groups[4:8]), groups[8].rstrip()
+        else:
+            yield None, None, line.rstrip("\r\n")
@@ -0,0 +1,133 @@
+import wave
+from bisect import bisect_right
+from helpers.timestamps import add_time_to_timestamps, get_segment_times
+
+
+def detect_speech(wav_path, frame_seconds=0.03, margin_db=12, min_silence_seconds=2, padding_seconds=0.5):
+    """
+    Finds the parts of a .wav file with speech in them by comparing the loudness of every frame to the noise floor.
+    Short pauses between words and sentences are kept so only long silent stretches are left out.
+
+    :param str wav_path: Path to the 16-bit .wav file
+    :param float frame_seconds: Length of the frames loudness is measured over
+    :param float margin_db: How much louder than the noise floor a frame must be to count as speech
+    :param float min_silence_seconds: Shortest silence worth leaving out
+    :param float padding_seconds: Audio kept either side of speech so the start and end of words aren't cut
+
+    :return List[Tuple[int, int]]: The start and end frame of every part with speech or None if it can't be measured
+    """
+    # Imported here so the menu starts without loading heavy audio libraries
+    import numpy as np
+
+    with wave.open(wav_path, 'rb') as wav_file:
+        params = wav_file.getparams()
+        if params.sampwidth != 2 or params.nframes == 0:
+            return None
+
+        frame_size = max(1, int(params.framerate * frame_seconds))
+
+        # Measures the loudness of every frame in blocks so long lectures aren't held in memory
+        loudness = []
+        block_frames = frame_size * 1000
+        while True:
+            data = wav_file.readframes(block_frames)
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype=np.int16).reshape(-1, params.nchannels).mean(axis=1)
+
+            # Pads the last frame with silence so every frame is the same length
+            samples = np.pad(samples, (0, -len(samples) % frame_size))
+            rms = np.sqrt(np.mean(np.square(samples.reshape(-1, frame_size)), axis=1))
+            loudness.append(20 * np.log10(rms / 32768 + 1e-10))
+
+    loudness = np.concatenate(loudness)
+
+    # The noise floor is how loud the quietest parts are, capped below the speech so a lecture with
+    # hardly any silence isn't mistaken for noise
+    noise_floor = np.percentile(loudness, 10)
+    speech_level = np.percentile(loudness, 95)
+    threshold = min(noise_floor + margin_db, speech_level - 20)
+    is_speech = loudness > threshold
+
+    # Pads every loud frame then finds where each run of speech starts and ends
+    padding = int(padding_seconds / frame_seconds)
+    is_speech = np.convolve(is_speech, np.ones(2 * padding + 1), mode='same') > 0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+
+    # Joins runs separated by short silences so only long silent stretches are left out
+    min_silence = int(min_silence_seconds / frame_seconds)
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    return [(int(start) * frame_size, min(int(end) * frame_size, params.nframes)) for start, end in regions]
+
+
+def remove_silence(wav_path, output_path, min_saved_seconds=30):
+    """
+    Writes only the parts of a .wav file with speech in them to a new .wav file.
+
+    :param str wav_path: Path to the 16-bit .wav file
+    :param str output_path: Where the .wav file without silence is written
+    :param float min_saved_seconds: Least silence worth writing a new file for
+
+    :return List[Tuple[float, float]]: Where each part starts in the new file and in the original file in seconds,
+    or None if there wasn't enough silence to remove and no file was written
+    """
+    regions = detect_speech(wav_path=wav_path)
+    if regions is None:
+        return None
+
+    with wave.open(wav_path, 'rb') as wav_file:
+        params = wav_file.getparams()
+        speech_frames = sum(end - start for start, end in regions)
+        if params.nframes - speech_frames < min_saved_seconds * params.framerate:
+            return None
+
+        offset_map = []
+        output_frames = 0
+        with wave.open(output_path, 'wb') as output_file:
+            output_file.setparams(params)
+            for start, end in regions:
+                offset_map.append((output_frames / params.framerate, start / params.framerate))
+                wav_file.setpos(start)
+                remaining = end - start
+                while remaining > 0:
+                    data = wav_file.readframes(min(remaining, params.framerate * 10))
+                    if not data:
+                        break
+                    output_file.writeframes(data)
+                    remaining -= len(data) // (params.sampwidth * params.nchannels)
+                output_frames += end - start
+
+    skipped_seconds = (params.nframes - speech_frames) / params.framerate
+    print(f"Skipping {skipped_seconds / 60:.1f} minutes of silence")
+
+    return offset_map
+
+
+def remap_timestamps(timestamped_transcript, offset_map):
+    """
+    Moves the timestamps of a transcript made without silence back to where they are in the original audio.
+    Each line is shifted by the offset of the part it starts in.
+
+    :param str timestamped_transcript: The transcript of the audio without silence
+    :param List[Tuple[float, float]] offset_map: Where each part starts in the new file and in the original file
+
+    :return str: The transcript with timestamps in the original audio
+    """
+    output_starts = [output_start for output_start, _ in offset_map]
+
+    lines = []
+    for line in timestamped_transcript.splitlines():
+        start, _ = get_segment_times(line)
+        if start is not None:
+            output_start, original_start = offset_map[max(0, bisect_right(output_starts, start) - 1)]
+            line = add_time_to_timestamps(timestamped_transcript=line, time_to_add=original_start - output_start)
+        lines.append(line)
+
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+import os
+import time
+import uuid
+import socket
+import platform
+import subprocess
+import urllib.request
+import urllib.error
+from helpers.timestamps import srt_to_timestamped
+
+
+class WhisperServer:
+    """
+    A class to manage a long-lived whisper.cpp server so the model is only loaded once per session.
+    """
+    def __init__(self, model_name="medium.en", host="127.0.0.1", port=None, threads=None):
+        """
+        Initializes the WhisperServer with the model it should load.
+
+        :param str model_name: Name of the model to use
+        :param str host: Host the server listens on
+        :param int port: Port the server listens on, picks a free port if None
+        :param int threads: CPU threads the server transcribes with, uses every CPU thread if None
+
+        :return: None
+        """
+        self.model_name = model_name
+        self.host = host
+        self.port = port if port is not None else get_free_port()
+        self.threads = threads or os.cpu_count() or 4
+        self._process = None
+
+        if platform.system() == "Windows":
+            self.server_path = "whisper\\server.exe"
+            self.model_path = f"whisper\\models\\ggml-{model_name}.bin"
+        else:
+            self.server_path = "whisper/server"
+            self.model_path = f"whisper/models/ggml-{model_name}.bin"
+
+
+    def is_available(self):
+        """
+        Checks if the whisper.cpp server binary and the model exist.
+
+        :return bool: Weather or not the server can be started
+        """
+        return os.path.exists(self.server_path) and os.path.exists(self.model_path)
+
+
+    def start(self):
+        """
+        Starts loading the model in the background without waiting for it to finish.
+
+        :return: None
+        """
+        if self._process is not None and self._process.poll() is None:
+            return
+
+        self._process = subprocess.Popen(
+            [self.server_path, "-m", self.model_path, "--host", self.host, "--port", str(self.port),
+             "-t", str(self.threads)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+
+    def wait_until_ready(self, timeout=600):
+        """
+        Blocks until the server has loaded the model and accepts requests.
+
+        :param float timeout: Max seconds to wait for the model to load
+
+        :return: None
+
+        :raises: Exception if the server exits or doesn't become ready in time
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self._process.poll() is not None:
+                raise Exception(f"Whisper server exited with code {self._process.returncode}")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.25)
+
+        raise Exception("Whisper server took too long to load the model")
+
+
+    def transcribe(self, wav_path=None, audio_stream=None):
+        """
+        Sends a .wav file to the server and returns the transcript in the same format as whisper/main.
+        The audio is uploaded in blocks so it's never all held in memory.
+
+        :param str wav_path: Path to the WAV file, not needed if audio_stream is given
+        :param Tuple[int, Iterator[bytes]] audio_stream: Size of a .wav and its blocks to send instead of reading wav_path
+
+        :return str: The timestamped transcript of the audio
+
+        :raises: Exception if the server returns an error
+        """
+        self.start()
+        self.wait_until_ready()
+
+        if audio_stream is None:
+            audio_stream = (os.path.getsize(wav_path), read_blocks(file_path=wav_path))
+        audio_size, blocks = audio_stream
+        file_name = os.path.basename(wav_path) if wav_path is not None else "audio.wav"
+
+        # Builds a multipart form the same way a browser upload would
+        boundary = uuid.uuid4().hex
+        form_start = (
+            f"--{boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"file\"; filename=\"{file_name}\"\r\n"
+            f"Content-Type: audio/wav\r\n\r\n"
+        ).encode('utf-8')
+        form_end = (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"response_format\"\r\n\r\n"
+            f"srt\r\n"
+            f"--{boundary}--\r\n"
+        ).encode('utf-8')
+
+        def body():
+            yield form_start
+            yield from blocks
+            yield form_end
+
+        # The length is known up front so the form is sent as it's read instead of being built in memory
+        request = urllib.request.Request(
+            url=f"http://{self.host}:{self.port}/inference",
+            data=body(),
+            headers={
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+                "Content-Length": str(len(form_start) + audio_size + len(form_end))
+            }
+        )
+
+        try:
+            with urllib.request.urlopen(request) as response:
+                srt = response.read().decode('utf-8')
+        except urllib.error.URLError as e:
+            raise Exception(f"Error processing audio: {e}")
+        finally:
+            blocks.close()
+
+        return srt_to_timestamped(srt)
+
+
+    def stop(self):
+        """
+        Stops the server and frees the model.
+
+        :return: None
+        """
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+
+def get_free_port():
+    """
+    Asks the operating system for a free local port.
+
+    :return int: A free port
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_blocks(file_path, block_size=1024 * 1024):
+    """
+    Reads a file a block at a time.
+
+    :param str file_path: Path to the file
+    :param int block_size: Most bytes read at a time
+
+    :return Iterator[bytes]: The file in blocks
+    """
+    with open(file_path, 'rb') as file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            yield block
@@ -1,6 +1,8 @@
 import os
-import subprocess
-import platform
+import sys
+import time
+import shutil
+import argparse
 import helpers.menu as menu
 from helpers.file_handler import (
     create_folder,
@@ -9,9 +11,6 @@ from helpers.file_handler import (
     txt_file_to_str,
     get_lecture_num,
     get_cut_path,
-    merge_cut_audio_files,
-    compress_wav_to_mp3,
-    rename_wav_file,
     get_files_in_directory,
     move_directory,
     convert_to_wav_16khz
@@ -19,13 +18,17 @@ from helpers.file_handler import (
 from helpers.input_safety import (
     get_path,
     get_positive_number,
-    remove_timestamps,
     get_int,
-    select_course_code
+    get_char,
+    select_course_code,
+    SUPPORTED_FILE_EXTENSIONS
 )
-from helpers.process_audio import transcribe_to_file, move_wav_to_lectures, summarize_lecture
-from helpers.recorder import Recorder
-from helpers.fancy_prints import print_title, print_yellow, print_green
+from helpers.timestamps import remove_timestamps, format_clock, parse_clock
+from helpers.playback import open_file
+from helpers.catalog import add_file, rebuild_catalog
+from helpers.main_index import flush_appends
+from helpers.scheduler import scheduler, PRIORITY_LIVE, PRIORITY_LECTURE, PRIORITY_BACKFILL
+from helpers.fancy_prints import print_title, print_yellow, print_green, print_red
 
 
 def main():
@@ -35,66 +38,134 @@ def main():
     :return: None
     """
     print_title()
-    course_codes = []
-    archived_course_codes = []
 
     # If the notes folder didn't exist create it and populate it with classes
     note_root_path = "notes"
     if create_folder(note_root_path):
         create_folder(path=f"{note_root_path}/archived_classes")
-        course_codes += create_class_folders(prompt="How many classes do you have this semester?\n")
+        create_class_folders(prompt="How many classes do you have this semester?\n")
 
         # Adds a blank line spacer
         print()
 
     # If notes folder exists but there are only archived classes
     elif len(get_course_codes(root_directory="notes")) == 0:
-        course_codes += create_class_folders(prompt="How many classes do you have this semester?\n")
+        create_class_folders(prompt="How many classes do you have this semester?\n")
+
+        # Adds a blank line spacer
+        print()
+
+    resume_compression()
+    offer_to_resume_lectures()
+
+    # Keeps showing the menu so more can be done while lectures are processed in the background
+    while True:
+        course_codes = get_course_codes(root_directory="notes")
+        archived_course_codes = get_course_codes(root_directory="notes/archived_classes")
+        report_completed_jobs()
+
+        # Display menu
+        choice = menu.main(unfinished_jobs=scheduler.count_unfinished())
+
+        match choice:
+            case 1:
+                record_now(course_codes=course_codes)
+            case 2:
+                transcribe_from_recording(course_codes=course_codes)
+            case 3:
+                summarize_from_transcript(course_codes=course_codes)
+            case 4:
+                view_file(course_codes=course_codes, archived_course_codes=archived_course_codes)
+            case 5:
+                edit_classes(course_codes=course_codes, archived_course_codes=archived_course_codes)
+            case 6:
+                view_jobs()
+            case 7:
+                finish_jobs()
+                print("Goodbye")
+                return
 
         # Adds a blank line spacer
         print()
-    else:
-        course_codes += get_course_codes(root_directory="notes")
-        archived_course_codes += get_course_codes(root_directory="notes/archived_classes")
-
-    # Display menu
-    choice = menu.main()
-
-    match choice:
-        case 1:
-            record_now(course_codes=course_codes)
-        case 2:
-            transcribe_from_recording(course_codes=course_codes)
-        case 3:
-            summarize_from_transcript(course_codes=course_codes)
-        case 4:
-            view_file(course_codes=course_codes, archived_course_codes=archived_course_codes)
-        case 5:
-            edit_classes(course_codes=course_codes, archived_course_codes=archived_course_codes)
-        case 6:
-            print("Goodbye")
 
 
 def record_now(course_codes):
     """
     Records lecture live then transcribes the audio and creates a summary sheet.
-    Has the option to partly transcribe the lecture while the lecture is happening to speed up the process.
+    Has the option to stream the transcription while the lecture is happening or to partly transcribe it at
+    any point to speed up the process.
 
     :param List[str] course_codes: All the user's course codes
 
     :return: None
     """
     current_class, _ = menu.choose_class(course_codes=course_codes)
+    recording_mode = menu.choose_recording_mode()
+
+    record_lecture(course_code=current_class, recording_mode=recording_mode, background=True)
+
+
+def record_lecture(course_code, recording_mode="stream", model_name="medium.en", minutes=None, background=False):
+    """
+    Records a lecture live then transcribes the audio, compresses it and creates a summary sheet.
+
+    :param str course_code: Code of the lecture class
+    :param str recording_mode: Either stream to transcribe while recording or cuts to transcribe when asked
+    :param str model_name: Name of the whisper model to use
+    :param float minutes: Stops recording after this many minutes instead of asking the user, if None asks
+    :param bool background: Weather or not to process the recording in background jobs and return once it's stopped
+
+    :return int: The lecture number
+    """
+    from helpers.process_audio import get_whisper_server
+    from helpers.recorder import Recorder, TARGET_SAMPLE_RATE
+    from helpers.live_transcriber import StreamingTranscriber
+    from helpers.pipeline import start_pipeline, mark_cuts_transcribed, transcribe_cuts, run_lecture, get_pipeline_key
+
+    current_class = course_code
+
+    # Loads the whisper model in the background while the lecture is recorded
+    get_whisper_server(model_name=model_name)
 
     # Sets up mic to record audio to correct path
     i = 0
     lecture_num = get_lecture_num(current_class)
-    mic = Recorder(file_path=get_cut_path(current_class=current_class, lecture_num=lecture_num, n=i))
+
+    # Saves the lecture's progress so it can be resumed if the program stops before it's done
+    start_pipeline(course_code=current_class, lecture_num=lecture_num, model_name=model_name)
+
+    # When streaming the audio is also transcribed in windows while the lecture is happening
+    live_transcriber = None
+    if recording_mode == "stream":
+        live_transcriber = StreamingTranscriber(
+            course_code=current_class,
+            lecture_num=lecture_num,
+            samplerate=TARGET_SAMPLE_RATE,
+            model_name=model_name
+        )
+
+    mic = Recorder(
+        file_path=get_cut_path(current_class=current_class, lecture_num=lecture_num, n=i),
+        stream_to=live_transcriber
+    )
     mic.start_recording()
+    add_file(mic.file_path)
+
+    # Records for a set time when there is no one to press stop
+    if minutes is not None:
+        print(f"Recording for {minutes} minutes (Ctrl+C to stop early)")
+        try:
+            time.sleep(minutes * 60)
+        except KeyboardInterrupt:
+            pass
 
     while True:
         # Gets users choice from recording menu
-        user_input = menu.manage_live_recording()
+        if minutes is not None:
+            user_input = "s"
+        else:
+            user_input = menu.manage_live_recording(allow_cuts=live_transcriber is None)
+
         match user_input:
 
             # Cut recording and transcribe
@@ -108,49 +179,53 @@ def record_now(course_codes):
                 wav_path = get_cut_path(current_class=current_class, lecture_num=lecture_num, n=i)
                 mic = Recorder(file_path=wav_path)
                 mic.start_recording()
-
-                # Transcribe audio up to this point
-                transcribe_to_file(
-                    course_code=current_class,
-                    lecture_num=lecture_num,
-                    finalize_transcription=False,
-                    cut_path_n=i-1,
-                )
+                add_file(wav_path)
+
+                # Transcribe audio up to this point, in the background the recording can be stopped straight away
+                if background:
+                    scheduler.submit(
+                        name=f"Transcribe {current_class} lecture {lecture_num} cut {i}",
+                        function=transcribe_cuts,
+                        priority=PRIORITY_LIVE,
+                        group=get_pipeline_key(course_code=current_class, lecture_num=lecture_num),
+                        course_code=current_class,
+                        lecture_num=lecture_num,
+                        cut_count=i
+                    )
+                else:
+                    transcribe_cuts(course_code=current_class, lecture_num=lecture_num, cut_count=i)
 
             case "s":
 
                 # Stop recording finalize .wav
                 mic.stop_recording()
 
-                # Transcribe the remaining audio
-                transcribe_to_file(
-                    course_code=current_class,
-                    lecture_num=lecture_num,
-                    finalize_transcription=True,
-                    cut_path_n=i
-                )
-
-                # Merge all cut .wav files into one .wav file
-                merged_wav_path = merge_cut_audio_files(course_code=current_class, lecture_num=lecture_num)
-
-                # Compress .wav file to an .mp3 file
-                compress_wav_to_mp3(wav_file_path=merged_wav_path)
-
-                # Create a summary sheet
-                transcript_path = f"notes/{current_class}/transcripts/{lecture_num}.txt"
-                transcript_clean_no_header = remove_timestamps(
-                    transcript=txt_file_to_str(file_path=transcript_path)
-                )
-                summarize_lecture(
-                    transcript=transcript_clean_no_header,
-                    course_code=current_class,
-                    lecture_num=lecture_num
-                )
-
-                print(f"You're recording has been transcribed and summarised in notes/{current_class}")
+                # The live transcriber has already transcribed the whole recording except the last few seconds
+                if live_transcriber is not None:
+                    print_green("\nTranscribing the last few seconds...")
+                    if live_transcriber.finish():
+                        mark_cuts_transcribed(course_code=current_class, lecture_num=lecture_num, cut_count=1)
+                    else:
+                        print_red("Part of the recording couldn't be transcribed live, it will be transcribed again")
+
+                # Transcribes the remaining audio, merges the cuts, compresses the .wav file in the background
+                # and creates a summary sheet, after any cuts still being transcribed
+                if background:
+                    scheduler.submit(
+                        name=f"Process {current_class} lecture {lecture_num}",
+                        function=run_lecture,
+                        priority=PRIORITY_LECTURE,
+                        group=get_pipeline_key(course_code=current_class, lecture_num=lecture_num),
+                        course_code=current_class,
+                        lecture_num=lecture_num
+                    )
+                    print_green(f"\nLecture {lecture_num} is being transcribed and summarised in the background")
+                else:
+                    run_lecture(course_code=current_class, lecture_num=lecture_num)
+                    print(f"You're recording has been transcribed and summarised in notes/{current_class}")
 
                 # Ends loop when user exits
-                return
+                return lecture_num
 
 
 def transcribe_from_recording(course_codes):
@@ -175,48 +250,70 @@ def transcribe_from_recording(course_codes):
             # Breaks after successful conversion
             break
         except Exception as e:
-            supported_file_extensions = [
-                # Audio formats
-                '.mp3', '.wav', '.flac', '.ogg', '.aac',
-                '.m4a', '.wma', '.aiff', '.opus',
-
-                # Video formats
-                '.mp4', '.mkv', '.avi', '.mov',
-                '.wmv', '.flv', '.webm'
-            ]
 
             # Tells user to use one of the supported file types
             print_yellow("\nError processing file!")
             print("Please use one of the following file extensions:", end=" ")
-            for extension in supported_file_extensions:
+            for extension in SUPPORTED_FILE_EXTENSIONS:
                 print(extension, end=" ")
 
             # Adds newline
             print()
 
+    lecture_num = process_recording(course_code=current_class, wav_path=wav_path, background=True)
+    print_green(f"\nLecture {lecture_num} is being transcribed and summarised in the background")
+
+
+def process_recording(course_code, wav_path, lecture_num=None, model_name="medium.en", summarize=True,
+                      skip_silence=True, background=False):
+    """
+    Transcribes, compresses and creates a summary sheet for a .wav file of a lecture at 16khz.
+
+    :param str course_code: Code of the lecture class
+    :param str wav_path: Path of the .wav file, it's moved into the class' lectures folder
+    :param Union[int, float] lecture_num: The nth lecture, if None the next lecture number is used
+    :param str model_name: Name of the whisper model to use
+    :param bool summarize: Weather or not to create a summary sheet
+    :param bool skip_silence: Weather or not to leave long silences out of the audio sent to Whisper
+    :param bool background: Weather or not to process the recording in a background job and return straight away
+
+    :return Union[int, float]: The lecture number
+    """
+    from helpers.process_audio import move_wav_to_lectures
+    from helpers.pipeline import start_pipeline, run_lecture, get_pipeline_key
+
+    current_class = course_code
+
     # Moves the .wav file to lectures
-    lecture_num = get_lecture_num(current_class)
-    new_path = move_wav_to_lectures(original_path=wav_path, course_code=current_class, current_lecture_num=lecture_num)
+    if lecture_num is None:
+        lecture_num = get_lecture_num(current_class)
+    move_wav_to_lectures(original_path=wav_path, course_code=current_class, current_lecture_num=lecture_num)
 
-    # Transcribes the file
-    transcribe_to_file(
+    # Saves the lecture's progress so it can be resumed if the program stops before it's done
+    start_pipeline(
         course_code=current_class,
         lecture_num=lecture_num,
-        finalize_transcription=True
+        stage="transcribe",
+        model_name=model_name,
+        parallel=True,
+        skip_silence=skip_silence,
+        summarize=summarize
     )
 
-    # Compresses lecture file
-    clean_wav_path = rename_wav_file(original_path=new_path, new_name=f"{lecture_num}")
-    compress_wav_to_mp3(wav_file_path=clean_wav_path)
+    # Transcribes the file in chunks across every CPU core, compresses it and creates a summary sheet
+    if background:
+        scheduler.submit(
+            name=f"Process {current_class} lecture {lecture_num}",
+            function=run_lecture,
+            priority=PRIORITY_LECTURE,
+            group=get_pipeline_key(course_code=current_class, lecture_num=lecture_num),
+            course_code=current_class,
+            lecture_num=lecture_num
+        )
+    else:
+        run_lecture(course_code=current_class, lecture_num=lecture_num)
 
-    # Creates a summary sheet
-    transcript_path = f"notes/{current_class}/transcripts/{lecture_num}.txt"
-    transcript_clean_no_header = remove_timestamps(transcript=txt_file_to_str(file_path=transcript_path))
-    summarize_lecture(
-        transcript=transcript_clean_no_header,
-        course_code=current_class,
-        lecture_num=lecture_num
-    )
+    return lecture_num
 
 
 def summarize_from_transcript(course_codes):
@@ -234,8 +331,43 @@ def summarize_from_transcript(course_codes):
     )
     lecture_num = get_positive_number(prompt="Lecture #: ")
 
-    transcript = txt_file_to_str(transcript_path)
-    summarize_lecture(transcript=transcript, course_code=course_code, lecture_num=lecture_num)
+    # Summarizing the same transcript again reuses the previous sheet unless the user wants a new one
+    regenerate = get_char(valid_chars="yn", prompt="Create a new sheet if this transcript was summarized before? (y/n): ")
+
+    scheduler.submit(
+        name=f"Summarize {course_code} lecture {lecture_num}",
+        function=summarize_transcript_file,
+        priority=PRIORITY_LECTURE,
+        transcript_path=transcript_path,
+        course_code=course_code,
+        lecture_num=lecture_num,
+        regenerate=regenerate == "y"
+    )
+    print_green(f"\nLecture {lecture_num} is being summarised in the background")
+
+
+def summarize_transcript_file(transcript_path, course_code, lecture_num, regenerate=False):
+    """
+    Creates a summary sheet from a transcript file and adds it to the class' main summary sheet.
+
+    :param str transcript_path: Path to the transcript
+    :param str course_code: Code of the lecture class
+    :param Union[int, float] lecture_num: The nth lecture
+    :param bool regenerate: Weather or not to make a new sheet even if this transcript was summarized before
+
+    :return str: Path of the summary sheet
+    """
+    from helpers.process_audio import summarize_lecture
+
+    summary_path = summarize_lecture(
+        transcript=txt_file_to_str(transcript_path),
+        course_code=course_code,
+        lecture_num=lecture_num,
+        regenerate=regenerate
+    )
+    flush_appends()
+
+    return summary_path
 
 
 def view_file(course_codes, archived_course_codes):
@@ -275,16 +407,9 @@ def view_file(course_codes, archived_course_codes):
     else:
         file_path = f"notes/{current_class}/{media_type}/{files_in_folder[file_num_picked - 1]}"
 
-    system = platform.system()
-
-    if system == "Windows":
-        os.startfile(file_path)
-    elif system == "Darwin":
-        subprocess.run(["open", file_path], check=True)
-    elif system == "Linux":
-        subprocess.run(["xdg-open", file_path], check=True)
-    else:
-        print(f"Unsupported operating system: {system}")
+    # Lectures still queued for the main files are written so they show up
+    flush_appends()
+    open_file(file_path=file_path)
 
 
 def edit_classes(course_codes, archived_course_codes):
@@ -296,6 +421,11 @@ def edit_classes(course_codes, archived_course_codes):
 
     :return: None
     """
+    # Moving a class while its lectures are being processed would lose their files
+    if scheduler.count_unfinished() > 0:
+        print_yellow("\nClasses can't be edited while lectures are processed in the background, check Background jobs")
+        return
+
     edit_type = menu.edit_class_options()
 
     match edit_type:
@@ -364,5 +494,495 @@ def edit_classes(course_codes, archived_course_codes):
             print_green("Restore successful!")
 
 
-main()
+def resume_compression():
+    """
+    Restarts compressing any lectures that were still being compressed when Noter was last closed.
+
+    :return: None
+    """
+    from helpers.compression_queue import compression_queue
+
+    resumed = compression_queue.resume()
+    if resumed > 0:
+        print_yellow(f"Resuming compression of {resumed} lecture(s) in the background")
+
+
+def offer_to_resume_lectures():
+    """
+    Lets the user finish lectures that stopped partway, for example because Noter crashed while summarizing.
+
+    :return: None
+    """
+    from helpers.pipeline import get_unfinished_lectures, run_lecture, get_pipeline_key
+
+    unfinished = get_unfinished_lectures()
+    if not unfinished:
+        return
+
+    print_yellow(f"{len(unfinished)} lecture(s) didn't finish processing:")
+    for state in unfinished:
+        print(f"  {state['course']} lecture {state['lecture']} stopped at {state['stage']}")
+
+    # Unfinished lectures are backfilled after anything the user starts now
+    if get_char(valid_chars="yn", prompt="Finish them in the background? (y/n): ") == "y":
+        for state in unfinished:
+            scheduler.submit(
+                name=f"Resume {state['course']} lecture {state['lecture']}",
+                function=run_lecture,
+                priority=PRIORITY_BACKFILL,
+                group=get_pipeline_key(course_code=state["course"], lecture_num=state["lecture"]),
+                course_code=state["course"],
+                lecture_num=state["lecture"]
+            )
+
+    # Adds a blank line spacer
+    print()
+
+
+def report_completed_jobs():
+    """
+    Tells the user about background jobs that finished or failed since the menu was last shown.
+
+    :return: None
+    """
+    for job in scheduler.pop_completed():
+        if job.status == "finished":
+            print_green(f"Finished: {job.name}")
+        else:
+            print_red(f"Failed: {job.name}: {job.error}")
+
+
+def view_jobs():
+    """
+    Shows every background job with its progress and lets the user read what a job printed.
+
+    :return: None
+    """
+    jobs = scheduler.get_jobs()
+    job_id = menu.view_jobs(jobs=jobs)
+    if job_id == 0:
+        return
+
+    job = next(job for job in jobs if job.id == job_id)
+    print(f"\nOutput of {job.name}:")
+    for line in job.output[-30:]:
+        print(line)
+
+
+def finish_jobs():
+    """
+    Waits for background jobs to finish before the program exits. If the user stops waiting
+    the lectures are picked up where they stopped next time.
+
+    :return: None
+    """
+    unfinished = scheduler.count_unfinished()
+    if unfinished == 0:
+        return
+
+    print_green(f"\nWaiting for {unfinished} background job(s) to finish (Ctrl+C to finish them next time)...")
+    try:
+        scheduler.wait()
+    except KeyboardInterrupt:
+        print_yellow("\nUnfinished lectures will be resumed next time")
+        return
+
+    report_completed_jobs()
+
+
+def finish_compression():
+    """
+    Waits for lectures being compressed in the background to finish.
+
+    :return: None
+    """
+    from helpers.compression_queue import compression_queue
+
+    if compression_queue.is_busy():
+        print_green("\nWaiting for compression to finish...")
+    compression_queue.wait()
+
+
+def storage_report(course_directories):
+    """
+    Prints how much space compressing lectures saved for each course compared to keeping the .wav files.
+
+    :param List[str] course_directories: Paths to the courses to report on
+
+    :return: None
+    """
+    from helpers.file_handler import get_archive_savings, format_size
+
+    total_archived = 0
+    total_wav = 0
+    for course_directory in course_directories:
+        lectures_directory = f"{course_directory}/lectures"
+        if not os.path.isdir(lectures_directory):
+            continue
+
+        count, archived_bytes, wav_bytes = get_archive_savings(lectures_directory=lectures_directory)
+        if count == 0:
+            continue
+
+        total_archived += archived_bytes
+        total_wav += wav_bytes
+        print(
+            f"{os.path.basename(course_directory)}: {count} lecture(s), {format_size(archived_bytes)} "
+            f"instead of {format_size(wav_bytes)}, saved {format_size(wav_bytes - archived_bytes)}"
+        )
+
+    if total_wav == 0:
+        print("There are no compressed lectures yet")
+        return
+
+    print_green(
+        f"\nTotal: {format_size(total_archived)} instead of {format_size(total_wav)} "
+        f"({total_wav / max(total_archived, 1):.1f}x smaller)"
+    )
+
+
+def play_lecture(course_directory, lecture_num, start, seconds):
+    """
+    Plays part of a lecture's recording by seeking straight to it.
+
+    :param str course_directory: Path to the class such as notes/CLASS101
+    :param Union[int, float] lecture_num: The nth lecture
+    :param float start: Seconds from the start of the lecture
+    :param float seconds: How many seconds to play
+
+    :return: None
+    """
+    from helpers.playback import find_lecture_audio, play_segment
+
+    audio_path = find_lecture_audio(course_directory=course_directory, lecture_num=lecture_num)
+    if audio_path is None:
+        print_yellow(f"Lecture {lecture_num} has no recording in {course_directory}/lectures")
+        return
+
+    print_green(f"Playing {audio_path} from {format_clock(start)}")
+    play_segment(audio_path=audio_path, start=start, duration=seconds)
+
+
+def lecture_number(text):
+    """
+    Parses a lecture number from the command line keeping whole numbers as ints so file names don't end in .0
+
+    :param str text: The lecture number as typed
+
+    :return Union[int, float]: The lecture number
+    """
+    number = float(text)
+    if number < 0:
+        raise argparse.ArgumentTypeError("Lecture number must be 0 or greater")
+
+    return int(number) if number.is_integer() else number
+
+
+def cli(args):
+    """
+    Runs a command without any prompts so lectures can be processed from a script.
+
+    :param List[str] args: The command line arguments after the program name
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(prog="noter", description="Turns lecture audio into summary sheets.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    transcribe_parser = subparsers.add_parser(
+        "transcribe",
+        help="Transcribe, compress and summarize an audio or video recording"
+    )
+    transcribe_parser.add_argument("path", help="Path of the audio or video file")
+    transcribe_parser.add_argument("--course", required=True, help="Course code the lecture belongs to")
+    transcribe_parser.add_argument("--lecture", type=lecture_number, help="Lecture number, defaults to the next lecture")
+    transcribe_parser.add_argument("--model", default="medium.en", help="Whisper model to use")
+    transcribe_parser.add_argument("--output", help="Also copy the transcript to this path")
+    transcribe_parser.add_argument("--no-summary", action="store_true", help="Only transcribe, don't summarize")
+    transcribe_parser.add_argument(
+        "--keep-silence",
+        action="store_true",
+        help="Send the whole recording to Whisper instead of leaving out long silences"
+    )
+    transcribe_parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="Transcribe straight from the file without keeping a copy of the audio in the lectures folder"
+    )
+
+    summarize_parser = subparsers.add_parser("summarize", help="Create a summary sheet from a transcript")
+    summarize_parser.add_argument("path", help="Path of the transcript .txt file")
+    summarize_parser.add_argument("--course", required=True, help="Course code the lecture belongs to")
+    summarize_parser.add_argument("--lecture", type=lecture_number, required=True, help="Lecture number")
+    summarize_parser.add_argument("--output", help="Also copy the summary sheet to this path")
+    summarize_parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="Create a new sheet even if this transcript was summarized before"
+    )
+
+    record_parser = subparsers.add_parser("record", help="Record a lecture live then transcribe and summarize it")
+    record_parser.add_argument("--course", required=True, help="Course code the lecture belongs to")
+    record_parser.add_argument("--minutes", type=float, help="Stop after this many minutes, otherwise asks")
+    record_parser.add_argument("--mode", choices=["stream", "cuts"], default="stream", help="Recording mode")
+    record_parser.add_argument("--model", default="medium.en", help="Whisper model to use")
+
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Transcribe, compress and summarize every recording in a directory or matching a glob"
+    )
+    batch_parser.add_argument("path", help="Directory of recordings or a glob pattern such as 'recordings/*.mp4'")
+    batch_parser.add_argument("--course", required=True, help="Course code the lectures belong to")
+    batch_parser.add_argument("--model", default="medium.en", help="Whisper model to use")
+
+    search_parser = subparsers.add_parser("search", help="Search every transcript and summary sheet")
+    search_parser.add_argument("query", help="Words to search for")
+    search_parser.add_argument("--course", help="Only search this course, defaults to every course including archived")
+    search_parser.add_argument(
+        "--in",
+        dest="media_types",
+        action="append",
+        choices=["timestamped", "transcripts", "summaries"],
+        help="Only search these folders, defaults to timestamped transcripts and summaries"
+    )
+    search_parser.add_argument("--limit", type=int, default=20, help="Most results to show")
+    search_parser.add_argument(
+        "--play",
+        type=int,
+        metavar="N",
+        help="Play the recording where the Nth result was said"
+    )
+
+    play_parser = subparsers.add_parser("play", help="Play part of a lecture recording without scrubbing to it")
+    play_parser.add_argument("--course", required=True, help="Course code the lecture belongs to")
+    play_parser.add_argument("--lecture", type=lecture_number, required=True, help="Lecture number")
+    play_parser.add_argument("--at", type=parse_clock, default=0, help="Where to start as hh:mm:ss or mm:ss")
+    play_parser.add_argument("--seconds", type=float, default=30, help="How many seconds to play")
+
+    tidy_parser = subparsers.add_parser(
+        "tidy",
+        help="Rewrite a course's main transcripts and summary sheet in lecture order with one copy of each lecture"
+    )
+    tidy_parser.add_argument("--course", required=True, help="Course code to tidy")
+    tidy_parser.add_argument("--keep-duplicates", action="store_true", help="Keep every copy of repeated lectures")
+    tidy_parser.add_argument("--keep-order", action="store_true", help="Keep lectures in the order they were added")
+
+    storage_parser = subparsers.add_parser("storage", help="Show how much space compressing lectures saved")
+    storage_parser.add_argument("--course", help="Only show this course, defaults to every course")
+
+    resume_parser = subparsers.add_parser(
+        "resume",
+        help="Finish lectures that stopped partway from the stage they stopped at"
+    )
+    resume_parser.add_argument("--course", help="Only resume this course, defaults to every course")
+    resume_parser.add_argument("--lecture", type=lecture_number, help="Only resume this lecture")
+
+    catalog_parser = subparsers.add_parser(
+        "catalog",
+        help="Rebuild the catalog of classes and lectures and update the search index after changing the notes "
+             "folder by hand"
+    )
+    catalog_parser.set_defaults(course=None)
+
+    parsed = parser.parse_args(args)
+
+    if parsed.course is not None and not os.path.isdir(f"notes/{parsed.course}"):
+
+        # Archived classes can still be searched
+        archived = os.path.isdir(f"notes/archived_classes/{parsed.course}")
+        if parsed.command not in ["search", "play"] or not archived:
+            parser.error(f"Unknown course code: {parsed.course}")
+
+    resume_compression()
+
+    match parsed.command:
+        case "transcribe":
+            if not os.path.isfile(parsed.path):
+                parser.error(f"File not found: {parsed.path}")
+
+            if parsed.no_archive:
+                from helpers.process_audio import transcribe_to_file, summarize_lecture
+
+                # Decodes the recording straight into the transcriber without writing any audio files
+                lecture_num = parsed.lecture if parsed.lecture is not None else get_lecture_num(parsed.course)
+                transcribe_to_file(
+                    course_code=parsed.course,
+                    lecture_num=lecture_num,
+                    finalize_transcription=True,
+                    model_name=parsed.model,
+                    source_path=parsed.path
+                )
+
+                if not parsed.no_summary:
+                    transcript_path = f"notes/{parsed.course}/transcripts/{lecture_num}.txt"
+                    summarize_lecture(
+                        transcript=remove_timestamps(transcript=txt_file_to_str(file_path=transcript_path)),
+                        course_code=parsed.course,
+                        lecture_num=lecture_num
+                    )
+            else:
+                wav_path = convert_to_wav_16khz(file_path=parsed.path)
+                lecture_num = process_recording(
+                    course_code=parsed.course,
+                    wav_path=wav_path,
+                    lecture_num=parsed.lecture,
+                    model_name=parsed.model,
+                    summarize=not parsed.no_summary,
+                    skip_silence=not parsed.keep_silence
+                )
+
+            if parsed.output:
+                shutil.copyfile(f"notes/{parsed.course}/transcripts/{lecture_num}.txt", parsed.output)
+
+        case "summarize":
+            from helpers.process_audio import summarize_lecture
+
+            transcript = txt_file_to_str(parsed.path)
+            if transcript is None:
+                parser.error(f"File not found: {parsed.path}")
+
+            summary_path = summarize_lecture(
+                transcript=transcript,
+                course_code=parsed.course,
+                lecture_num=parsed.lecture,
+                regenerate=parsed.regenerate
+            )
+
+            if parsed.output:
+                shutil.copyfile(summary_path, parsed.output)
+
+        case "record":
+            record_lecture(
+                course_code=parsed.course,
+                recording_mode=parsed.mode,
+                model_name=parsed.model,
+                minutes=parsed.minutes
+            )
+
+        case "batch":
+            from helpers.batch import batch_ingest, find_lecture_files
+
+            file_paths = find_lecture_files(path=parsed.path)
+            if len(file_paths) == 0:
+                parser.error(f"No supported recordings found in {parsed.path}")
+
+            batch_ingest(file_paths=file_paths, course_code=parsed.course, model_name=parsed.model)
+
+        case "search":
+            from helpers.search_index import search
+
+            start_time = time.time()
+            results = search(
+                query=parsed.query,
+                course_code=parsed.course,
+                media_types=parsed.media_types,
+                limit=parsed.limit
+            )
+            elapsed_ms = (time.time() - start_time) * 1000
+
+            for i, result in enumerate(results):
+                location = f"{i + 1}. {result['course']} lecture {result['lecture']}"
+                if result["start"] is not None:
+                    location += f" at {format_clock(result['start'])}"
+                if result["archived"]:
+                    location += " (archived)"
+                print_green(location)
+                print(f"  {result['snippet']}")
+                print(f"  {result['path']}\n")
+
+            print(f"{len(results)} result(s) in {elapsed_ms:.0f} ms")
+
+            if parsed.play is not None:
+                if not 1 <= parsed.play <= len(results):
+                    parser.error(f"There is no result {parsed.play}")
+
+                result = results[parsed.play - 1]
+                if result["start"] is None:
+                    parser.error(f"Result {parsed.play} has no timestamp, search timestamped transcripts to play it")
+
+                # The text file is in notes/COURSE/MEDIA so the course folder is two levels up
+                course_directory = os.path.dirname(os.path.dirname(result["path"]))
+                play_lecture(
+                    course_directory=course_directory,
+                    lecture_num=result["lecture"],
+                    start=result["start"],
+                    seconds=result["end"] - result["start"]
+                )
+
+        case "play":
+            course_directory = f"notes/{parsed.course}"
+            if not os.path.isdir(course_directory):
+                course_directory = f"notes/archived_classes/{parsed.course}"
+
+            play_lecture(
+                course_directory=course_directory,
+                lecture_num=parsed.lecture,
+                start=parsed.at,
+                seconds=parsed.seconds
+            )
+
+        case "tidy":
+            from helpers.main_index import rewrite_main
+
+            for main_path in [
+                f"notes/{parsed.course}/transcripts/main.txt",
+                f"notes/{parsed.course}/timestamped/main.txt",
+                f"notes/{parsed.course}/summaries/main.md"
+            ]:
+                if os.path.exists(main_path):
+                    lecture_count = rewrite_main(
+                        main_path=main_path,
+                        dedupe=not parsed.keep_duplicates,
+                        reorder=not parsed.keep_order
+                    )
+                    print(f"Rewrote {main_path} with {lecture_count} lecture(s)")
+
+        case "storage":
+            if parsed.course is not None:
+                course_directories = [f"notes/{parsed.course}"]
+            else:
+                course_directories = [
+                    f"notes/{course_code}" for course_code in get_course_codes(root_directory="notes")
+                ] + [
+                    f"notes/archived_classes/{course_code}"
+                    for course_code in get_course_codes(root_directory="notes/archived_classes")
+                ]
+
+            storage_report(course_directories=course_directories)
+
+        case "resume":
+            from helpers.pipeline import get_unfinished_lectures, resume_lectures
+
+            unfinished = [
+                state for state in get_unfinished_lectures(course_code=parsed.course)
+                if parsed.lecture is None or state["lecture"] == parsed.lecture
+            ]
+            if not unfinished:
+                print("No unfinished lectures")
+                return
+
+            finished = resume_lectures(course_code=parsed.course, lecture_num=parsed.lecture)
+            print_green(f"\nFinished {finished} of {len(unfinished)} lecture(s)")
+
+        case "catalog":
+            from helpers.search_index import sync_index
+
+            file_count = rebuild_catalog()
+            print_green(f"Catalog rebuilt with {file_count} file(s)")
+
+            # Searches only see files Noter wrote itself so files changed by hand are indexed here
+            reindexed_count = sync_index()
+            print_green(f"Search index updated with {reindexed_count} changed file(s)")
+
+
+if __name__ == "__main__":
+
+    # Runs a command if one was given otherwise opens the menu
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
 
+    # Writes lectures still queued for the main files then lets background compression finish before exiting
+    flush_appends()
+    finish_compression()